@@ -2,7 +2,7 @@ import pandas as pd
 import networkx as nx
 import scipy.sparse
 import os
-from CitNet import GraphCN, Utils
+from CitNet import GraphCN, PageRank, Utils
 
 
 #####################################################################
@@ -11,6 +11,7 @@ from CitNet import GraphCN, Utils
 # Input: attrs_nos.csv
 # Output: AdjMat_Auth.npz - Sparse weighted adjacency mat of
 #                           co-authorship
+#         AuthorsPR.csv   - PageRank of authors
 #####################################################################
 
 #####################################################################
@@ -60,18 +61,33 @@ del auths_nos
 authors_graph = nx.Graph(nx_dict)
 # Add the nodes that have no edges (ie w single authors)
 authors_graph.add_nodes_from(nodes_list)
-# NB: these so-called "dangling" nodes will be excluded from PageRank
+# NB: these so-called "dangling" nodes spread their score uniformly in PageRank
 #####################################################################
 # Get adjacency matrix
 # Extract the adjacency matrix as a scipy sparse matrix /!\ Weighted
-adjacency_matrix = nx.to_scipy_sparse_matrix(authors_graph)
+# (compact: int32 indices, float32 weights - co-authorship counts are exact)
+# Rows and columns ordered by author number
+adjacency_matrix = GraphCN.get_adjacency_matrix(authors_graph, nodelist=sorted(nodes_list), compact=True)
 # print(adjacency_matrix[:10])
 # save as .npz
 scipy.sparse.save_npz(path + '/AdjMat_Auth.npz', adjacency_matrix)
 # scipy.sparse.load_npz(path + '/AdjMat_Auth.npz') # to load
 
 
+#####################################################################
+# Section 3. Authors PageRank
+#####################################################################
+# Computed straight from the stored weighted (undirected) matrix
+adjacency_matrix = scipy.sparse.load_npz(path + '/AdjMat_Auth.npz')
+authors_pr = PageRank.get_undirected_pagerank(adjacency_matrix, compact=True)
+authors_pr_df = pd.DataFrame(index=sorted(nodes_list))
+authors_pr_df["pr_score"] = authors_pr
+authors_pr_df["pr_rank"] = authors_pr_df["pr_score"].rank(ascending=False, method="first").astype(int) - 1
+authors_pr_df.to_csv(path + '/AuthorsPR.csv')
+
+
 #####################################################################
 # Output : AdjMat_Auth.npz - Sparse weighted adjacency mat of
 #                            co-authorship
+#          AuthorsPR.csv   - PageRank of authors
 #####################################################################
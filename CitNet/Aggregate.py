@@ -0,0 +1,186 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides citation flows between groups of articles (journals, years, authors...)
+
+Groups are encoded as sparse indicator matrices S (n articles x k groups, S[i, g] = 1 if
+article i belongs to group g). With A the citation adjacency matrix (A[i, j] = 1 if i cites j),
+the flows between groups are a product of sparse matrices:
+    F = S_citing^T . A . S_cited,    F[g, h] = number of citations from group g to group h
+so that journal x journal or year x journal tables take one pass over the edges. Authors are
+groups that overlap: the authorship matrix P (articles x authors) may give each author of an
+article the full credit or 1/number of authors, and P^T.A.P is the author citation graph.
+
+# Example
+flows, journals = journal_flows(adj_mat, attrs)           # k x k, citing journal x cited journal
+ranks = rank_journals(flows, journals)                    # PageRank and HITS of the journals
+authorship = get_authorship(attrs["authors_nos"].apply(Utils.str_to_list), fractional=True)
+ranks = rank_authors(aggregate_flows(adj_mat, authorship))
+"""
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+from CitNet import HubsAuths, PageRank, TimeGraph
+
+
+def get_indicator(labels, n=None):
+    """
+    Sparse indicator matrix of the groups of the articles
+
+    :param labels: (array-like) label (journal, year...) of each article number, articles
+    with a missing label (nan, None) belong to no group
+    :param n: (int) number of articles (rows), len(labels) if None
+    :return: (scipy.sparse.csr.csr_matrix) n x k, (numpy.ndarray) k labels ordering used for the columns
+    """
+    if n is None:
+        n = len(labels)
+    codes, categories = pd.factorize(np.asarray(labels)[:n], sort=True)
+    known = np.flatnonzero(codes >= 0)
+    indicator = sparse.csr_matrix((np.ones(len(known)), (known, codes[known])), shape=(n, len(categories)))
+    return indicator, np.asarray(categories)
+
+
+def aggregate_flows(adj_mat, citing_ind, cited_ind=None):
+    """
+    Citation flows between groups of articles: citing_ind^T . adj_mat . cited_ind
+
+    :param adj_mat: (scipy.sparse matrix) n x n, adj_mat[i, j] = 1 if i cites j
+    :param citing_ind: (scipy.sparse matrix) n x k, groups of the citing articles (see get_indicator)
+    :param cited_ind: (scipy.sparse matrix) n x l, groups of the cited articles, citing_ind if None
+    :return: (scipy.sparse.csr.csr_matrix) k x l, number of citations from each group to each group
+    """
+    if cited_ind is None:
+        cited_ind = citing_ind
+    adj_mat = sparse.csr_matrix(adj_mat, dtype=np.float64)
+    return sparse.csr_matrix(citing_ind.T.tocsr().dot(adj_mat.dot(cited_ind)))
+
+
+def journal_flows(adj_mat, attrs, col="journal"):
+    """
+    Journal x journal citation flows
+
+    :param adj_mat: (scipy.sparse matrix) n x n citation adjacency matrix (rows by article number)
+    :param attrs: (pandas.core.frame.DataFrame) articles attributes indexed by article number
+    :param col: (str) column of attrs holding the journal
+    :return: (scipy.sparse.csr.csr_matrix) k x k citing journal x cited journal,
+    (numpy.ndarray) k journals ordering
+    """
+    n = adj_mat.shape[0]
+    journal_ind, journals = get_indicator(attrs[col].reindex(np.arange(n)).values)
+    return aggregate_flows(adj_mat, journal_ind), journals
+
+
+def journal_year_flows(adj_mat, attrs, col="journal", by="citing"):
+    """
+    Year x journal citation flows: citations received by the articles of each journal, by year of
+    the citing articles (by="citing") or by year of publication of the cited articles (by="cited")
+
+    :param adj_mat: (scipy.sparse matrix) n x n citation adjacency matrix (rows by article number)
+    :param attrs: (pandas.core.frame.DataFrame) articles attributes indexed by article number,
+    with a "date" (YYYY-MM) column
+    :param col: (str) column of attrs holding the journal
+    :param by: (str) "citing" or "cited"
+    :return: (pandas.core.frame.DataFrame) years x journals number of citations
+    """
+    valid = {"citing", "cited"}
+    if by not in valid:
+        raise ValueError("results: by must be one of %r." % valid)
+    n = adj_mat.shape[0]
+    journal_ind, journals = get_indicator(attrs[col].reindex(np.arange(n)).values)
+    year_ind, years = get_indicator(TimeGraph.get_years(attrs, n=n))
+    if by == "citing":
+        flows = aggregate_flows(adj_mat, year_ind, journal_ind)
+    else:
+        # citations received (column sums of A) by the articles of each (year, journal)
+        in_degree = np.asarray(sparse.csr_matrix(adj_mat).sum(axis=0)).ravel()
+        flows = year_ind.T.dot(sparse.diags(in_degree).dot(journal_ind))
+    return pd.DataFrame(flows.toarray(), index=years.astype(int), columns=journals)
+
+
+def get_authorship(auths_nos, n=None, n_authors=None, fractional=False):
+    """
+    Sparse authorship matrix P, P[i, a] = 1 (or 1/number of authors of i) if a is an author of i
+
+    :param auths_nos: (pandas.core.series.Series) lists of author numbers, indexed by article number
+    (see Utils.str_to_list)
+    :param n: (int) number of articles (rows), max article number + 1 if None
+    :param n_authors: (int) number of authors (columns), max author number + 1 if None
+    :param fractional: (bool) split the credit of an article between its authors
+    :return: (scipy.sparse.csr.csr_matrix) n x n_authors
+    """
+    lengths = auths_nos.apply(len).values
+    rows = np.repeat(auths_nos.index.values.astype(np.int64), lengths)
+    cols = np.fromiter((no for nos in auths_nos.values for no in nos), dtype=np.int64, count=lengths.sum())
+    if n is None:
+        n = int(auths_nos.index.max()) + 1 if len(auths_nos) else 0
+    if n_authors is None:
+        n_authors = int(cols.max()) + 1 if len(cols) else 0
+    # an author listed twice on an article counts once
+    keys = np.unique(rows * n_authors + cols)
+    rows, cols = keys // n_authors, keys % n_authors
+    data = np.ones(len(keys))
+    if fractional:
+        data /= np.bincount(rows, minlength=n)[rows]
+    return sparse.csr_matrix((data, (rows, cols)), shape=(n, n_authors))
+
+
+def rank_groups(flows, groups=None, name="group", self_citations=False, theta=.85, epsilon=1e-08,
+                max_iter=1000, hits_iter=100):
+    """
+    PageRank and HITS scores of groups of articles on their weighted citation graph
+
+    :param flows: (scipy.sparse.csr.csr_matrix) k x k citing group x cited group (see aggregate_flows)
+    :param groups: (array-like) k groups ordering, 0..k-1 if None
+    :param name: (str) name of the index of the result
+    :param self_citations: (bool) keep the citations within a group (the diagonal)
+    :param theta: (numeric) damping factor
+    :param epsilon: (numeric) PageRank tolerance on the l1 residual
+    :param max_iter: (int) maximum number of PageRank iterations
+    :param hits_iter: (int) number of HITS iterations
+    :return: (pandas.core.frame.DataFrame) indexed by group, columns "cits_made", "cits_received",
+    "self_cits", "pr_score", "xauth_0", "xhub_0", sorted by decreasing PageRank
+    """
+    flows = sparse.csr_matrix(flows, dtype=np.float64)
+    if groups is None:
+        groups = np.arange(flows.shape[0])
+    self_cits = flows.diagonal()
+    if not self_citations:
+        flows = (flows - sparse.diags(self_cits)).tocsr()
+        flows.eliminate_zeros()
+    ranks_df = pd.DataFrame(index=pd.Index(groups, name=name))
+    ranks_df["cits_made"] = np.asarray(flows.sum(axis=1)).ravel()
+    ranks_df["cits_received"] = np.asarray(flows.sum(axis=0)).ravel()
+    ranks_df["self_cits"] = self_cits
+    ranks_df["pr_score"] = PageRank.get_pagerank(flows, theta, epsilon, max_iter)
+    auths, hubs = HubsAuths.iterate_hubs_auths_sparse(flows, hits_iter)
+    ranks_df["xauth_0"] = auths
+    ranks_df["xhub_0"] = hubs
+    return ranks_df.sort_values(by="pr_score", ascending=False)
+
+
+def rank_journals(flows, journals, self_citations=False, **kwargs):
+    """
+    PageRank and HITS scores of the journals (see rank_groups)
+
+    :param flows: (scipy.sparse.csr.csr_matrix) k x k citing journal x cited journal (see journal_flows)
+    :param journals: (array-like) k journals ordering
+    :param self_citations: (bool) keep the citations within a journal (the diagonal)
+    :param kwargs: other arguments passed to rank_groups (theta, epsilon, max_iter, hits_iter)
+    :return: (pandas.core.frame.DataFrame) indexed by journal (see rank_groups)
+    """
+    return rank_groups(flows, journals, "journal", self_citations, **kwargs)
+
+
+def rank_authors(flows, authors=None, self_citations=False, **kwargs):
+    """
+    PageRank and HITS scores of the authors on the author citation graph P^T.A.P
+
+    :param flows: (scipy.sparse.csr.csr_matrix) m x m citing author x cited author
+    (aggregate_flows(adj_mat, get_authorship(...)))
+    :param authors: (array-like) m author numbers, 0..m-1 if None
+    :param self_citations: (bool) keep the citations of an author to their own articles
+    :param kwargs: other arguments passed to rank_groups (theta, epsilon, max_iter, hits_iter)
+    :return: (pandas.core.frame.DataFrame) indexed by author number (see rank_groups)
+    """
+    return rank_groups(flows, authors, "author", self_citations, **kwargs)
@@ -0,0 +1,331 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides a benchmark suite of the CitNet stages on synthetic corpora
+
+The generator mimics the IDEAS tables written by DbScrap.py:
+- attrs: url ("https://ideas.repec.org/a/ed/journ/art.html"), title, authors ("Name, Surname;..."),
+  date, jel_code, keywords, editor, journal, article_id,
+- refs and cits: (referring, referred_to) url ids ("ed/journ/art.html"), a share of them pointing
+  outside of the corpus (dead links),
+with authors names variants ("Surname, Name", "Name Surname", "N. Surname", typos) and power-law
+citations (a few articles receive most of the citations).
+
+Each stage (disambiguation, article matching, graph building, HITS, PageRank, queries) is timed
+on the generated corpus, the results are saved as JSON so that runs can be compared with
+compare_runs. The quadratic stages (disambiguation, matching) are timed on a sample whose size is
+recorded with the timing.
+
+# Example
+corpus = make_corpus(10 ** 5, seed=0)
+run = run_benchmark(corpus)
+save_run(run, "Tables/bench_100000.json")
+compare_runs(load_run("Tables/bench_ref.json"), run)
+"""
+
+import json
+import platform
+import time
+import numpy as np
+import pandas as pd
+import scipy
+from CitNet import GraphCN, HubsAuths, InvIndex, PageRank, Query, Utils
+
+# Root of the articles urls
+ROOT = "https://ideas.repec.org/a/"
+# Corpus sizes (number of citation edges) of the suite
+SIZES = (10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7)
+# Stages of the suite, in order
+STAGES = ("disambiguation", "matching", "graph", "hits", "pagerank", "query")
+# Vocabulary of the titles and keywords (Zipf distributed)
+WORDS = ("market", "price", "trading", "asymmetry", "information", "risk", "equity", "bond", "growth",
+         "labor", "wage", "policy", "monetary", "fiscal", "inflation", "credit", "bank", "firm",
+         "contract", "auction", "game", "equilibrium", "volatility", "liquidity", "return", "portfolio",
+         "household", "consumption", "investment", "trade", "tax", "welfare", "insurance", "education",
+         "health", "migration", "innovation", "productivity", "competition", "regulation")
+LETTERS = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+
+
+def random_words(rng, n, length, alphabet=LETTERS):
+    """
+    n random lowercase words of the given length
+    """
+    chars = rng.choice(alphabet, size=(n, length))
+    return np.array(["".join(word) for word in chars])
+
+
+def name_variant(rng, first, last, variant_rate):
+    """
+    A spelling of the author (first, last), as found in the authors field of the attributes
+    """
+    u = rng.random_sample()
+    if u > variant_rate:
+        return last + ", " + first
+    u = u / variant_rate
+    if u < .3:
+        return first + " " + last
+    if u < .6:
+        return last + ", " + first[0].upper() + "."
+    if u < .8 and len(last) > 3:
+        pos = rng.randint(1, len(last) - 1)
+        return last[:pos] + last[pos + 1] + last[pos] + last[pos + 2:] + ", " + first
+    return last + ", " + first + " " + LETTERS[rng.randint(26)].upper() + "."
+
+
+def make_citations(rng, n_articles, n_edges, alpha=2.1):
+    """
+    Citation edges with a power-law in-degree distribution: the cited article is drawn with
+    probability proportional to a Pareto(alpha - 1) popularity, the citing one uniformly.
+    Self-citations are removed, duplicates are kept (as in the scraped tables).
+
+    :param rng: (numpy.random.RandomState) the generator
+    :param n_articles: (int) number of articles
+    :param n_edges: (int) number of edges
+    :param alpha: (float) exponent of the in-degree distribution
+    :return: (numpy.ndarray) citing articles, (numpy.ndarray) cited articles
+    """
+    popularity = rng.pareto(alpha - 1, n_articles) + 1
+    cited = rng.choice(n_articles, size=n_edges, p=popularity / popularity.sum())
+    citing = rng.randint(n_articles, size=n_edges)
+    keep = citing != cited
+    return citing[keep], cited[keep]
+
+
+def make_corpus(n_edges, n_articles=None, n_journals=30, authors_per_article=2.2, variant_rate=.2,
+                dead_rate=.3, alpha=2.1, seed=0):
+    """
+    Synthetic IDEAS-like corpus
+
+    :param n_edges: (int) number of citation edges between articles of the corpus
+    :param n_articles: (int) number of articles (n_edges / 8 if None, as in the IDEAS tables)
+    :param n_journals: (int) number of journals
+    :param authors_per_article: (float) mean number of authors per article
+    :param variant_rate: (float) share of the authors names that are spelled differently
+    :param dead_rate: (float) share of the references pointing outside of the corpus
+    :param alpha: (float) exponent of the in-degree distribution
+    :param seed: (int) seed of the generator
+    :return: (dict) {"attrs": attributes table, "refs": references (referring, referred_to url ids),
+    "cits": citations (referred_to, referring url ids), "authors": original/uniformat authors table,
+    "edges": (referring, referred_to) article numbers of the refs, "params": generation parameters}
+    """
+    rng = np.random.RandomState(seed)
+    n_articles = n_articles or max(n_edges // 8, 10)
+    params = {"n_edges": n_edges, "n_articles": n_articles, "n_journals": n_journals,
+              "authors_per_article": authors_per_article, "variant_rate": variant_rate,
+              "dead_rate": dead_rate, "alpha": alpha, "seed": seed}
+
+    # Articles urls: ed/journ/vVVyYYYYiIpPPP.html
+    editors = random_words(rng, n_journals, 3)
+    journals = random_words(rng, n_journals, 6)
+    journal = rng.randint(n_journals, size=n_articles)
+    years = rng.randint(1970, 2018, size=n_articles)
+    url_ids = pd.Series(editors[journal]) + "/" + pd.Series(journals[journal]) + "/v" + \
+        pd.Series(years - 1960).astype(str) + "y" + pd.Series(years).astype(str) + "i" + \
+        pd.Series(rng.randint(1, 5, size=n_articles)).astype(str) + "p" + \
+        pd.Series(np.arange(n_articles)).astype(str) + ".html"
+
+    # Titles and keywords from a Zipf distributed vocabulary
+    word_p = 1 / np.arange(1, len(WORDS) + 1)
+    words = np.array(WORDS)[rng.choice(len(WORDS), size=(n_articles, 8), p=word_p / word_p.sum())]
+    titles = [" ".join(row[:5]).capitalize() for row in words]
+    keywords = ["; ".join(row[5:]) for row in words]
+
+    # Authors: a pool of people, each article picks 1 + Poisson authors, spelled with variants
+    n_people = max(int(n_articles * authors_per_article / 3), 1)
+    firsts = [name.capitalize() for name in random_words(rng, n_people, 6)]
+    lasts = [name.capitalize() for name in random_words(rng, n_people, 8)]
+    n_auth = 1 + rng.poisson(authors_per_article - 1, size=n_articles)
+    people = rng.randint(n_people, size=n_auth.sum())
+    spelled = [name_variant(rng, firsts[p], lasts[p], variant_rate) for p in people]
+    bounds = np.concatenate([[0], np.cumsum(n_auth)])
+    authors = [";".join(spelled[bounds[i]:bounds[i + 1]]) for i in range(n_articles)]
+
+    attrs = pd.DataFrame({"url": ROOT + url_ids,
+                          "title": titles,
+                          "authors": authors,
+                          "date": pd.Series(years).astype(str) + "-" +
+                          pd.Series(rng.randint(1, 13, size=n_articles)).astype(str).str.zfill(2),
+                          "jel_code": ["G" + str(code) for code in rng.randint(10, 40, size=n_articles)],
+                          "keywords": keywords})
+    attrs["editor"] = editors[journal]
+    attrs["journal"] = journals[journal]
+    attrs["article_id"] = url_ids.str.split("/").str[-1]
+
+    # Citations, plus references to articles outside of the corpus
+    citing, cited = make_citations(rng, n_articles, n_edges, alpha)
+    n_dead = int(len(citing) * dead_rate / (1 - dead_rate))
+    dead = pd.Series(random_words(rng, n_dead, 3)) + "/" + pd.Series(random_words(rng, n_dead, 6)) + \
+        "/v" + pd.Series(rng.randint(1, 60, size=n_dead)).astype(str) + ".html"
+    refs = pd.DataFrame({"referring": np.concatenate([url_ids.values[citing],
+                                                      url_ids.values[rng.randint(n_articles, size=n_dead)]]),
+                         "referred_to": np.concatenate([url_ids.values[cited], dead.values])})
+    refs = refs.sample(frac=1, random_state=rng).reset_index(drop=True)
+    cits = pd.DataFrame({"referred_to": url_ids.values[cited], "referring": url_ids.values[citing]})
+
+    original = pd.Series(sorted(set(spelled)))
+    authors_df = pd.DataFrame({"original": original,
+                               "uniformat": original.apply(lambda x: x.split(", ")[1] + " " + x.split(", ")[0]
+                                                           if ", " in x else x)})
+    return {"attrs": attrs, "refs": refs, "cits": cits, "authors": authors_df,
+            "edges": pd.DataFrame({"referring": citing, "referred_to": cited}), "params": params}
+
+
+def time_stage(func, repeat=1):
+    """
+    Best wall time of func() over repeat runs
+
+    :return: (float) time in seconds, result of the last run
+    """
+    best = np.inf
+    result = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_benchmark(corpus, stages=STAGES, repeat=1, disamb_sample=2000, match_sample=20000,
+                  hits_iter=20, queries=(("trading", "asymmetry"), ("monetary", ), ("auction", "game")),
+                  d=1000):
+    """
+    Time the CitNet stages on a corpus generated by make_corpus. A stage that fails is recorded
+    with its error and the following stages still run.
+
+    :param corpus: (dict) the corpus (see make_corpus)
+    :param stages: (tuple) the stages to run (see STAGES)
+    :param repeat: (int) the best time over repeat runs is kept
+    :param disamb_sample: (int) number of authors names disambiguated (quadratic stage)
+    :param match_sample: (int) number of references matched (quadratic stage)
+    :param hits_iter: (int) number of HITS iterations
+    :param queries: (tuple) topic queries (tuples of keywords)
+    :param d: (int) number of predecessors sampled per root in the queries
+    :return: (dict) {"meta": environment and corpus parameters, "stages": list of
+    {"stage", "size", "time", ...} records}
+    """
+    valid = set(STAGES)
+    if not set(stages) <= valid:
+        raise ValueError("results: stages must be in %r." % valid)
+    attrs, edges = corpus["attrs"], corpus["edges"]
+    n = len(attrs)
+    results = []
+    state = dict()
+
+    def disambiguation():
+        from CitNet import DisambName as DN
+        sample = corpus["authors"].iloc[:disamb_sample]
+        t, cleaned = time_stage(lambda: DN.map_authors(sample, 0.12), repeat)
+        return {"size": len(sample), "time": t, "names_out": len(cleaned)}
+
+    def matching():
+        id_series = attrs["url"].apply(lambda x: Utils.parse_url(x, ROOT))
+        sample = corpus["refs"].iloc[:match_sample]
+        t, matched = time_stage(lambda: GraphCN.match_articles(sample, id_series), repeat)
+        return {"size": len(sample), "time": t, "matched": len(matched)}
+
+    def graph():
+        t, adj_mat = time_stage(lambda: GraphCN.edgesdf_to_csr(edges, n=n), repeat)
+        state["adj_mat"] = adj_mat
+        return {"size": len(edges), "time": t, "nnz": int(adj_mat.nnz)}
+
+    def get_adj_mat():
+        if "adj_mat" not in state:
+            state["adj_mat"] = GraphCN.edgesdf_to_csr(edges, n=n)
+        return state["adj_mat"]
+
+    def hits():
+        adj_mat = get_adj_mat()
+        t, result = time_stage(lambda: HubsAuths.iterate_hubs_auths_sparse(adj_mat, hits_iter), repeat)
+        return {"size": int(adj_mat.nnz), "time": t, "iterations": hits_iter}
+
+    def pagerank():
+        adj_mat = get_adj_mat()
+        t, (pr_vec, info) = time_stage(lambda: PageRank.get_pagerank(adj_mat, return_info=True), repeat)
+        return {"size": int(adj_mat.nnz), "time": t, "iterations": info["iterations"],
+                "converged": bool(info["converged"])}
+
+    def query():
+        adj_mat = get_adj_mat()
+        adj_csc = adj_mat.tocsc()
+        t_index, index = time_stage(lambda: InvIndex.build_index(attrs), repeat)
+
+        def run_queries():
+            sizes = []
+            for query_list in queries:
+                nodes, sub_adj = Query.topic_query_submatrix(adj_mat, d, attrs, list(query_list), index=index,
+                                                             seed=0, adj_csc=adj_csc)
+                if len(nodes):
+                    HubsAuths.iterate_hubs_auths_sparse(sub_adj, hits_iter)
+                sizes.append(len(nodes))
+            return sizes
+        t, sizes = time_stage(run_queries, repeat)
+        return {"size": len(queries), "time": t, "index_time": t_index, "subgraph_sizes": sizes}
+
+    funcs = {"disambiguation": disambiguation, "matching": matching, "graph": graph,
+             "hits": hits, "pagerank": pagerank, "query": query}
+    for stage in stages:
+        try:
+            record = funcs[stage]()
+        except Exception as e:
+            record = {"time": None, "error": repr(e)}
+        record["stage"] = stage
+        results.append(record)
+        print("{0}: {1}".format(stage, record))
+    meta = {"python": platform.python_version(), "numpy": np.__version__, "scipy": scipy.__version__,
+            "pandas": pd.__version__, "machine": platform.machine(), "platform": platform.platform(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": repeat, "corpus": corpus["params"]}
+    return {"meta": meta, "stages": results}
+
+
+def save_run(run, file):
+    """
+    Save a benchmark run as JSON
+
+    :param run: (dict) the run (see run_benchmark)
+    :param file: (str) path of the .json file
+    """
+    with open(file, "w") as f:
+        json.dump(run, f, indent=1, default=lambda x: x.item() if hasattr(x, "item") else str(x))
+
+
+def load_run(file):
+    """
+    Load a benchmark run saved with save_run
+    """
+    with open(file) as f:
+        return json.load(f)
+
+
+def failed_stages(run):
+    """
+    Stages of a run that failed (recorded with an error or without a time)
+
+    :param run: (dict) the run (see run_benchmark)
+    :return: (list) names of the failed stages
+    """
+    return [record["stage"] for record in run["stages"] if record.get("error") or record.get("time") is None]
+
+
+def compare_runs(reference, run, tolerance=1.2):
+    """
+    Compare the stages timings of two runs (made on corpora of the same size). A stage that
+    failed in the new run is a regression, whatever the reference.
+
+    :param reference: (dict) the reference run
+    :param run: (dict) the new run
+    :param tolerance: (float) a stage is a regression when it is tolerance times slower
+    :return: (pandas.core.frame.DataFrame) per stage reference time, time, ratio, error and regression flag
+    """
+    ref_times = {record["stage"]: record["time"] for record in reference["stages"]}
+    failed = set(failed_stages(run))
+    rows = []
+    for record in run["stages"]:
+        ref_time = ref_times.get(record["stage"])
+        if ref_time and record.get("time"):
+            ratio = record["time"] / ref_time
+        else:
+            ratio = np.nan
+        rows.append({"stage": record["stage"], "reference": ref_time, "time": record.get("time"),
+                     "ratio": ratio, "error": record.get("error"),
+                     "regression": record["stage"] in failed or bool(ratio > tolerance)})
+    return pd.DataFrame(rows, columns=["stage", "reference", "time", "ratio", "error", "regression"])
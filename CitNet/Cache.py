@@ -0,0 +1,300 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides a bounded LRU cache for topic and similarity queries
+
+Entries are keyed on (normalized query, search columns, how, d, graph version, attributes hash,
+seed, HITS parameters) and hold the expanded nodes and the authorities/hubs vectors.
+The least recently used entries are evicted once the memory budget is exceeded, entries can
+also be written to an on-disk tier that survives restarts, bounded the same way (least recently
+used files are deleted beyond the disk budget).
+The cache is bound to one graph version: when a query is made on another snapshot of the graph,
+all the entries computed on the previous one are dropped.
+The graph version and the attributes hash are computed once per object (the graph or the attributes
+table given to the queries): an object modified in place must be given with an explicit version,
+or forgotten with QueryCache.forget."""
+
+import hashlib
+import os
+import pickle
+import weakref
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+from CitNet import HubsAuths as HA
+from CitNet import InvIndex
+from CitNet import Query as Q
+
+
+def graph_version(graph):
+    """
+    Fingerprint of a graph snapshot, hashed on its content: sparse matrices on their CSR arrays,
+    networkx graphs (integer nodes) on their sorted nodes and sorted edges, so that an in-place
+    rewiring changes the version and two graphs with the same edges share it.
+
+    :param graph: (networkx.classes.digraph.DiGraph or scipy.sparse matrix) the graph
+    :return: (str) the version
+    """
+    fingerprint = hashlib.blake2b(digest_size=16)
+    if sparse.issparse(graph):
+        graph = sparse.csr_matrix(graph)
+        arrays = (graph.indptr, graph.indices, graph.data)
+    else:
+        nodes = np.fromiter(graph.nodes(), dtype=np.int64, count=graph.number_of_nodes())
+        edges = np.fromiter((node for edge in graph.edges() for node in edge), dtype=np.int64,
+                            count=2 * graph.number_of_edges()).reshape(-1, 2)
+        edges = edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+        fingerprint.update(b"directed" if graph.is_directed() else b"undirected")
+        arrays = (np.sort(nodes), edges)
+    for array in arrays:
+        fingerprint.update(np.ascontiguousarray(array).tobytes())
+    return fingerprint.hexdigest()
+
+
+def normalize_query(query_list, case_sensitive=True):
+    """
+    Normalized form of a list of keywords (order and duplicates do not matter)
+
+    :param query_list: (list) list of keywords
+    :param case_sensitive: (bool) keep the case of the keywords
+    :return: (tuple) sorted keywords
+    """
+    query_list = [query.strip() if case_sensitive else query.strip().lower() for query in query_list]
+    return tuple(sorted(set(query_list)))
+
+
+def entry_nbytes(value):
+    """
+    Memory size of a cache entry
+
+    :param value: (dict) entry of numpy arrays
+    :return: (int) number of bytes
+    """
+    return sum(array.nbytes for array in value.values())
+
+
+class QueryCache(object):
+    """
+    Bounded LRU cache of query results, with an optional on-disk tier
+
+    :param max_bytes: (int) memory budget of the entries
+    :param cache_dir: (str) directory of the on-disk tier, no disk tier if None
+    :param max_disk_bytes: (int) budget of the on-disk tier (size of the files)
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20, cache_dir=None, max_disk_bytes=2 ** 30):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.version = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.fingerprints = dict()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def set_version(self, version):
+        """
+        Bind the cache to a graph version, dropping the entries of the previous one
+        """
+        if version != self.version:
+            self.clear()
+            self.version = version
+
+    def fingerprint(self, obj, name, compute):
+        """
+        Fingerprint of an object (graph version, attributes hash), computed once per object
+        and per name, the stored value is dropped when the object is garbage collected
+
+        :param obj: the object (networkx graph, sparse matrix or dataframe)
+        :param name: (hashable) what is fingerprinted (e.g. the hashed columns)
+        :param compute: (function) computes the fingerprint of obj
+        :return: (str) the fingerprint
+        """
+        key = (id(obj), name)
+        if key in self.fingerprints:
+            ref, value = self.fingerprints[key]
+            if ref() is obj:
+                return value
+        value = compute(obj)
+        fingerprints = self.fingerprints
+
+        def drop(ref):
+            # a new object may reuse the id of a collected one, its value must be kept
+            if fingerprints.get(key, (None, None))[0] is ref:
+                del fingerprints[key]
+
+        self.fingerprints[key] = (weakref.ref(obj, drop), value)
+        return value
+
+    def forget(self, obj):
+        """
+        Drop the fingerprints of an object, to be called after modifying it in place
+        """
+        for key in [key for key in self.fingerprints if key[0] == id(obj)]:
+            del self.fingerprints[key]
+
+    def clear(self):
+        """
+        Drop all the entries in memory (the on-disk tier is keyed on the graph version)
+        """
+        self.entries.clear()
+        self.nbytes = 0
+
+    def disk_path(self, key):
+        """
+        Path of the on-disk file of an entry
+        """
+        return os.path.join(self.cache_dir, hashlib.sha1(repr(key).encode()).hexdigest() + ".pkl")
+
+    def get(self, key):
+        """
+        Returns the entry stored under key (and marks it as recently used), None if missing
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        if self.cache_dir is not None and os.path.exists(self.disk_path(key)):
+            with open(self.disk_path(key), "rb") as file:
+                value = pickle.load(file)
+            # the modification time orders the files for the disk LRU
+            os.utime(self.disk_path(key))
+            self.disk_hits += 1
+            self.put(key, value, to_disk=False)
+            return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value, to_disk=True):
+        """
+        Store an entry, evicting the least recently used ones beyond the memory budget
+        """
+        if key in self.entries:
+            self.nbytes -= entry_nbytes(self.entries.pop(key))
+        self.entries[key] = value
+        self.nbytes += entry_nbytes(value)
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            old_key, old_value = self.entries.popitem(last=False)
+            self.nbytes -= entry_nbytes(old_value)
+            self.evictions += 1
+        if to_disk and self.cache_dir is not None:
+            with open(self.disk_path(key), "wb") as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.evict_disk()
+
+    def evict_disk(self):
+        """
+        Delete the least recently used files of the on-disk tier beyond the disk budget
+        (the most recent file is always kept)
+        """
+        files = sorted((entry.stat().st_mtime_ns, entry.stat().st_size, entry.path)
+                       for entry in os.scandir(self.cache_dir) if entry.name.endswith(".pkl"))
+        disk_bytes = sum(size for _, size, _ in files)
+        for _, size, path in files[:-1]:
+            if disk_bytes <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            disk_bytes -= size
+            self.disk_evictions += 1
+
+    def stats(self):
+        """
+        Returns the hit/miss counters and the memory used
+        """
+        return {"hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "entries": len(self.entries),
+                "nbytes": self.nbytes}
+
+
+def hits_entry(subgraph, k):
+    """
+    Cache entry of a query: expanded nodes and authorities/hubs vectors
+    (iterative HITS, see HubsAuths.iterate_hubs_auths)
+    """
+    hubs_auths_df = HA.iterate_hubs_auths(subgraph, k=k)
+    return {"nodes": hubs_auths_df.index.values,
+            "xauth_0": hubs_auths_df["xauth_0"].values,
+            "xhubs_0": hubs_auths_df["xhubs_0"].values}
+
+
+def entry_to_df(value):
+    """
+    Hubs and authorities dataframe of a cache entry, as returned by HubsAuths.iterate_hubs_auths
+    """
+    results_df = pd.DataFrame(index=value["nodes"])
+    results_df["xauth_0"] = value["xauth_0"]
+    results_df["xhubs_0"] = value["xhubs_0"]
+    return results_df
+
+
+def cached_topic_hits(cache, graph, d, df, query_list, search_in=("title", "keywords"), how="union",
+                      index=None, seed=0, k=20, version=None):
+    """
+    Hubs and authorities of the expanded subgraph of a topic query (see Query.topic_query_subgraph),
+    served from the cache when the same query was made on the same graph
+
+    :param cache: (QueryCache) the cache
+    :param graph: (networkx.classes.digraph.DiGraph) the graph
+    :param d: how many predecessors to include at most ?
+    :param df: (pandas.core.frame.DataFrame) Dataframe on which to perform the query
+    :param query_list: (list) List of keywords
+    :param search_in: (tuple) The columns to include for the query
+    :param how: (str) How to join the indexes in the list ?
+    :param index: (dict) inverted index (see InvIndex.build_index)
+    :param seed: (int) seed of the predecessors sampling, must be set for results to be reusable
+    :param k: (int) number of HITS iterations
+    :param version: (str) graph version, computed with graph_version if None (once per graph object,
+    give e.g. a hash of the edges files to skip it)
+    :return: (pandas.core.frame.DataFrame) authorities and hubs coefs indexed by node
+    """
+    cache.set_version(version or cache.fingerprint(graph, "graph", graph_version))
+    # the roots depend on the searched columns of the attributes table (crawl appending articles)
+    source = cache.fingerprint(df, tuple(search_in), lambda df: InvIndex.source_hash(df, tuple(search_in)))
+    # the inverted index matches tokens case insensitively, the substring search does not:
+    # the two modes must not share entries
+    mode = "substring" if index is None else "index"
+    key = ("topic", mode, normalize_query(query_list, case_sensitive=index is None), tuple(search_in), how,
+           d, cache.version, source, seed, k)
+    value = cache.get(key)
+    if value is None:
+        subgraph = Q.topic_query_subgraph(graph, d, df, query_list, search_in, how, index, seed)
+        value = hits_entry(subgraph, k)
+        cache.put(key, value)
+    return entry_to_df(value)
+
+
+def cached_similarity_hits(cache, graph, d, nodes_list, seed=0, k=20, version=None):
+    """
+    Hubs and authorities of the expanded subgraph of a similarity query
+    (see Query.similarity_query_subgraph), served from the cache when the same query
+    was made on the same graph
+
+    :param cache: (QueryCache) the cache
+    :param graph: (networkx.classes.digraph.DiGraph) the graph
+    :param d: how many predecessors to include at most ?
+    :param nodes_list: the list of articles of our similar to request
+    :param seed: (int) seed of the predecessors sampling, must be set for results to be reusable
+    :param k: (int) number of HITS iterations
+    :param version: (str) graph version, computed with graph_version if None (once per graph object,
+    give e.g. a hash of the edges files to skip it)
+    :return: (pandas.core.frame.DataFrame) authorities and hubs coefs indexed by node
+    """
+    cache.set_version(version or cache.fingerprint(graph, "graph", graph_version))
+    key = ("similarity", tuple(sorted(set(nodes_list))), d, cache.version, seed, k)
+    value = cache.get(key)
+    if value is None:
+        subgraph = Q.similarity_query_subgraph(nodes_list, graph, d, seed)
+        value = hits_entry(subgraph, k)
+        cache.put(key, value)
+    return entry_to_df(value)
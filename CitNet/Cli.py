@@ -0,0 +1,342 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides the `citnet` command line interface
+
+    citnet rank            PageRank (and HITS) scores of the citation or co-authorship graph
+    citnet query           topic query, optionally ranked by HITS
+    citnet build-graph     adjacency matrices from the edges / attributes tables
+    citnet disambiguate    authors names disambiguation
+    citnet journals        journal citation flows and journal rankings (see Aggregate)
+    citnet authors         author citation graph and author rankings (see Aggregate)
+    citnet structure       components, k-cores, degree distributions and triangles (see Structure)
+    citnet serve           local query server (see Server)
+    citnet bench           benchmark of the stages on synthetic corpora (see Bench)
+    citnet pipeline        run the stale scripts of the pipeline (see Pipeline)
+    citnet startup         check the cold start time against COLD_START_BUDGET
+
+Only the standard library is imported at start, each command imports what it needs."""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Cold start budget (seconds) of `citnet --help`, checked by `citnet startup`
+COLD_START_BUDGET = 0.5
+# Modules that must not be imported by the scoring code (plotting and networkx)
+LAZY_MODULES = ("networkx", "matplotlib", "seaborn")
+# Modules used by batch jobs, which must not pull LAZY_MODULES at import
+CORE_MODULES = ("CitNet.GraphCN", "CitNet.HubsAuths", "CitNet.PageRank", "CitNet.Query", "CitNet.InvIndex")
+
+
+def cmd_rank(args):
+    """
+    Compute PageRank (and HITS) scores from a stored adjacency matrix and save them as csv
+    """
+    import numpy as np
+    import pandas as pd
+    import scipy.sparse
+    from CitNet import HubsAuths, PageRank
+    adj_mat = scipy.sparse.load_npz(os.path.join(args.path, args.matrix))
+    if args.undirected:
+        pr_vec, info = PageRank.get_undirected_pagerank(adj_mat, args.theta, args.epsilon, args.max_iter,
+                                                        compact=args.compact, solver=args.solver,
+                                                        return_info=True)
+    else:
+        pr_vec, info = PageRank.get_pagerank(adj_mat, args.theta, args.epsilon, args.max_iter,
+                                             compact=args.compact, solver=args.solver, return_info=True)
+    print(info)
+    ranks_df = pd.DataFrame(index=np.arange(adj_mat.shape[0]))
+    ranks_df["pr_score"] = pr_vec
+    if args.hits:
+        auths, hubs = HubsAuths.iterate_hubs_auths_sparse(adj_mat, args.hits, compact=args.compact)
+        ranks_df["xauth_0"] = auths
+        ranks_df["xhub_0"] = hubs
+    ranks_df.to_csv(os.path.join(args.path, args.out))
+
+
+def cmd_query(args):
+    """
+    Topic query on the attributes table, optionally ranked by HITS on the expanded subgraph
+    """
+    import pandas as pd
+    from CitNet import GraphCN, HubsAuths, InvIndex, Query
+    attrs = pd.read_csv(os.path.join(args.path, "attrs_nos.csv"), index_col=0)
+    inv_index = InvIndex.get_index(attrs, os.path.join(args.path, "InvIndex.npz"))
+    if not args.hits:
+        roots = Query.topic_subgraph_root(attrs, args.terms, tuple(args.search_in), args.how, inv_index)
+        print(attrs.loc[roots[:args.k], ["title", "authors"]].to_string())
+        return
+    edges_df = pd.concat([pd.read_csv(os.path.join(args.path, "cits_edges.csv")),
+                          pd.read_csv(os.path.join(args.path, "refs_edges.csv"))])
+    adj_mat = GraphCN.edgesdf_to_csr(edges_df, n=max(attrs.index.max(), edges_df.values.max()) + 1)
+    nodes, sub_adj = Query.topic_query_submatrix(adj_mat, args.hits, attrs, args.terms, tuple(args.search_in),
+                                                 args.how, inv_index, args.seed)
+    if len(nodes) == 0:
+        return
+    auths, hubs = HubsAuths.iterate_hubs_auths_sparse(sub_adj, 100)
+    top_auths = nodes[auths.argsort()[::-1][:args.k]]
+    print(attrs.loc[attrs.index.intersection(top_auths), ["title", "authors"]].reindex(top_auths).to_string())
+
+
+def cmd_build_graph(args):
+    """
+    Build the citation (AdjMat_CitsRefs.npz) or co-authorship (AdjMat_Auth.npz) adjacency matrix
+    """
+    import pandas as pd
+    import scipy.sparse
+    from CitNet import GraphCN, Utils
+    if args.kind == "citations":
+        edges_df = pd.concat([pd.read_csv(os.path.join(args.path, "cits_edges.csv")),
+                              pd.read_csv(os.path.join(args.path, "refs_edges.csv"))])
+        adj_mat = GraphCN.compact_matrix(GraphCN.edgesdf_to_csr(edges_df))
+        scipy.sparse.save_npz(os.path.join(args.path, "AdjMat_CitsRefs.npz"), adj_mat)
+    else:
+        import networkx as nx
+        attrs_nos = pd.read_csv(os.path.join(args.path, "attrs_nos.csv"), encoding="ISO-8859-1", index_col=0)
+        auths_nos = attrs_nos["authors_nos"].apply(Utils.str_to_list)
+        nx_dict = GraphCN.weighted_edges_list(GraphCN.sort_edges(GraphCN.get_edges_list(auths_nos)))
+        nodes_list = GraphCN.get_nodes_list(auths_nos)
+        authors_graph = nx.Graph(nx_dict)
+        authors_graph.add_nodes_from(nodes_list)
+        adj_mat = GraphCN.get_adjacency_matrix(authors_graph, nodelist=sorted(nodes_list), compact=True)
+        scipy.sparse.save_npz(os.path.join(args.path, "AdjMat_Auth.npz"), adj_mat)
+    print(adj_mat.shape, adj_mat.nnz)
+
+
+def cmd_disambiguate(args):
+    """
+    Disambiguate authors names of attrs.csv into authors.csv (see DisambAuth.py section 1)
+    """
+    import pandas as pd
+    from CitNet import DisambName as DN
+    attrs = pd.read_csv(os.path.join(args.path, "attrs.csv"))
+    authors = set()
+    for author_list in attrs["authors"].dropna().apply(DN.authors_parser):
+        authors.update(author_list)
+    df_authors = pd.DataFrame(sorted(authors), columns=["original"])
+    df_authors["uniformat"] = df_authors["original"].apply(DN.uniformize_names)
+    cleaned = DN.map_authors(df_authors, args.thresh)
+    cleaned = cleaned.sort_values(by="uniformat").reset_index(drop=True)
+    cleaned.to_csv(os.path.join(args.path, "authors.csv"), index=False)
+    print("len was {0}, it is now {1}".format(len(df_authors), len(cleaned)))
+
+
+def cmd_journals(args):
+    """
+    Journal x journal and year x journal citation flows, and PageRank / HITS of the journals
+    """
+    import pandas as pd
+    import scipy.sparse
+    from CitNet import Aggregate
+    attrs = pd.read_csv(os.path.join(args.path, "attrs_nos.csv"), encoding="ISO-8859-1", index_col=0)
+    adj_mat = scipy.sparse.load_npz(os.path.join(args.path, args.matrix))
+    flows, journals = Aggregate.journal_flows(adj_mat, attrs)
+    pd.DataFrame(flows.toarray(), index=journals, columns=journals).to_csv(
+        os.path.join(args.path, "JournalFlows.csv"))
+    Aggregate.journal_year_flows(adj_mat, attrs, by=args.by).to_csv(os.path.join(args.path, "JournalYearFlows.csv"))
+    ranks_df = Aggregate.rank_journals(flows, journals, self_citations=args.self_citations, theta=args.theta)
+    print(ranks_df.to_string())
+    ranks_df.to_csv(os.path.join(args.path, args.out))
+
+
+def cmd_authors(args):
+    """
+    Author citation graph P^T.A.P (AdjMat_AuthCits.npz), and PageRank / HITS of the authors
+    """
+    import pandas as pd
+    import scipy.sparse
+    from CitNet import Aggregate, Utils
+    attrs = pd.read_csv(os.path.join(args.path, "attrs_nos.csv"), encoding="ISO-8859-1", index_col=0)
+    adj_mat = scipy.sparse.load_npz(os.path.join(args.path, args.matrix))
+    authors_file = os.path.join(args.path, "authors.csv")
+    authors = pd.read_csv(authors_file, encoding="ISO-8859-1") if os.path.exists(authors_file) else None
+    authorship = Aggregate.get_authorship(attrs["authors_nos"].apply(Utils.str_to_list), n=adj_mat.shape[0],
+                                          n_authors=len(authors) if authors is not None else None,
+                                          fractional=args.fractional)
+    flows = Aggregate.aggregate_flows(adj_mat, authorship)
+    scipy.sparse.save_npz(os.path.join(args.path, "AdjMat_AuthCits.npz"), flows)
+    ranks_df = Aggregate.rank_authors(flows, self_citations=args.self_citations, theta=args.theta)
+    if authors is not None:
+        ranks_df.insert(0, "name", authors["uniformat"].reindex(ranks_df.index).values)
+    print(ranks_df.head(args.k).to_string())
+    ranks_df.to_csv(os.path.join(args.path, args.out))
+
+
+def cmd_structure(args):
+    """
+    Structure of an undirected graph from its stored adjacency matrix, with timings
+    """
+    import scipy.sparse
+    from CitNet import Structure
+    adj_mat = scipy.sparse.load_npz(os.path.join(args.path, args.matrix))
+    summary, details, timings = Structure.structure_report(adj_mat)
+    print(summary)
+    print({name: round(value, 4) for name, value in timings.items()})
+    details["histograms"].to_csv(os.path.join(args.path, args.out))
+
+
+def cmd_serve(args):
+    """
+    Run the local query server
+    """
+    from CitNet import Server
+    Server.serve(args.path, args.host, args.port, args.workers, args.executor)
+
+
+def cmd_bench(args):
+    """
+    Run the benchmark suite on synthetic corpora and save one JSON per size,
+    compared to a reference run if given, exit with status 1 if a stage failed or regressed
+    """
+    from CitNet import Bench
+    regression = False
+    for n_edges in args.sizes:
+        corpus = Bench.make_corpus(n_edges, seed=args.seed)
+        run = Bench.run_benchmark(corpus, stages=args.stages, repeat=args.repeat)
+        failed = Bench.failed_stages(run)
+        if failed:
+            print("failed stages: " + ", ".join(failed))
+            regression = True
+        if args.reference:
+            reference = Bench.load_run(args.reference.format(n_edges))
+            comparison = Bench.compare_runs(reference, run, args.tolerance)
+            print(comparison.to_string(index=False))
+            regression |= bool(comparison["regression"].any())
+        Bench.save_run(run, os.path.join(args.path, "bench_{0}.json".format(n_edges)))
+    if regression:
+        sys.exit(1)
+
+
+def cmd_pipeline(args):
+    """
+    Run the stale stages of the pipeline (scripts of the current directory)
+    """
+    from CitNet import Pipeline
+    results = Pipeline.run_pipeline(os.getcwd(), targets=args.targets, force=args.force,
+                                    workers=args.workers, dry_run=args.dry_run)
+    if any(result["status"] in ("failed", "blocked") for result in results):
+        sys.exit(1)
+
+
+def cmd_startup(args):
+    """
+    Measure the cold start of the CLI and check that the core modules do not import
+    plotting or networkx, exit with status 1 if the budget is exceeded or a lazy module is loaded
+    """
+    timings = []
+    for i in range(args.repeat):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, "-m", "CitNet", "--help"], stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    cold_start = min(timings)
+    code = "import sys\nimport {0}\nprint(','.join(m for m in {1!r} if m in sys.modules))".format(
+        ", ".join(CORE_MODULES), LAZY_MODULES)
+    loaded = subprocess.check_output([sys.executable, "-c", code]).decode().strip()
+    print("cold start: {0:.3f}s (budget {1:.3f}s)".format(cold_start, args.budget))
+    print("lazy modules loaded by the core modules: {0}".format(loaded or "none"))
+    if cold_start > args.budget or loaded:
+        sys.exit(1)
+
+
+def get_parser():
+    """
+    Returns the argument parser of the CLI
+    """
+    parser = argparse.ArgumentParser(prog="citnet", description="Citation network tools")
+    parser.add_argument("--path", default=os.path.join(os.getcwd(), "Tables"), help="path to the Tables")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    rank = commands.add_parser("rank", help="PageRank (and HITS) scores of a stored adjacency matrix")
+    rank.add_argument("--matrix", default="AdjMat_CitsRefs.npz")
+    rank.add_argument("--undirected", action="store_true", help="undirected weighted graph (co-authorship)")
+    rank.add_argument("--theta", type=float, default=.85)
+    rank.add_argument("--epsilon", type=float, default=1e-06)
+    rank.add_argument("--max-iter", type=int, default=1000)
+    rank.add_argument("--solver", default="power")
+    rank.add_argument("--compact", action="store_true", help="int32 indices and float32 values")
+    rank.add_argument("--hits", type=int, default=0, help="number of HITS iterations (no HITS if 0)")
+    rank.add_argument("--out", default="Ranks.csv")
+    rank.set_defaults(func=cmd_rank)
+
+    query = commands.add_parser("query", help="topic query")
+    query.add_argument("terms", nargs="+")
+    query.add_argument("--how", default="union", choices=["union", "inter"])
+    query.add_argument("--search-in", nargs="+", default=["title", "keywords"])
+    query.add_argument("--hits", type=int, default=0, help="rank by HITS with at most HITS predecessors per root")
+    query.add_argument("--seed", type=int, default=0)
+    query.add_argument("-k", type=int, default=10)
+    query.set_defaults(func=cmd_query)
+
+    build = commands.add_parser("build-graph", help="adjacency matrices")
+    build.add_argument("--kind", default="citations", choices=["citations", "authors"])
+    build.set_defaults(func=cmd_build_graph)
+
+    disamb = commands.add_parser("disambiguate", help="authors names disambiguation")
+    disamb.add_argument("--thresh", type=float, default=0.12)
+    disamb.set_defaults(func=cmd_disambiguate)
+
+    journals = commands.add_parser("journals", help="journal citation flows and rankings")
+    journals.add_argument("--matrix", default="AdjMat_CitsRefs.npz")
+    journals.add_argument("--by", default="citing", choices=["citing", "cited"],
+                          help="year of the citing or of the cited articles in JournalYearFlows.csv")
+    journals.add_argument("--self-citations", action="store_true", help="keep citations within a journal")
+    journals.add_argument("--theta", type=float, default=.85)
+    journals.add_argument("--out", default="Journals.csv")
+    journals.set_defaults(func=cmd_journals)
+
+    authors = commands.add_parser("authors", help="author citation graph and rankings")
+    authors.add_argument("--matrix", default="AdjMat_CitsRefs.npz")
+    authors.add_argument("--fractional", action="store_true", help="1/number of authors credit per article")
+    authors.add_argument("--self-citations", action="store_true", help="keep citations of an author to themselves")
+    authors.add_argument("--theta", type=float, default=.85)
+    authors.add_argument("-k", type=int, default=20)
+    authors.add_argument("--out", default="AuthorsCitsRanks.csv")
+    authors.set_defaults(func=cmd_authors)
+
+    structure = commands.add_parser("structure", help="structure of an undirected graph")
+    structure.add_argument("--matrix", default="AdjMat_Auth.npz")
+    structure.add_argument("--out", default="AuthStructure.csv", help="degree, strength and weight histograms")
+    structure.set_defaults(func=cmd_structure)
+
+    serve = commands.add_parser("serve", help="local query server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--workers", type=int, default=4)
+    serve.add_argument("--executor", default="thread", choices=["thread", "process"])
+    serve.set_defaults(func=cmd_serve)
+
+    bench = commands.add_parser("bench", help="benchmark of the stages on synthetic corpora")
+    bench.add_argument("--sizes", type=int, nargs="+", default=[10 ** 4, 10 ** 5, 10 ** 6],
+                       help="numbers of citation edges (up to 10 ** 7)")
+    bench.add_argument("--stages", nargs="+", default=["disambiguation", "matching", "graph", "hits",
+                                                       "pagerank", "query"])
+    bench.add_argument("--repeat", type=int, default=3)
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--reference", help="reference runs, e.g. Tables/ref/bench_{}.json")
+    bench.add_argument("--tolerance", type=float, default=1.2)
+    bench.set_defaults(func=cmd_bench)
+
+    pipeline = commands.add_parser("pipeline", help="run the stale scripts of the pipeline")
+    pipeline.add_argument("targets", nargs="*", help="stages to bring up to date (all if none)")
+    pipeline.add_argument("--force", nargs="+", default=[], help="stages to run even if up to date")
+    pipeline.add_argument("--workers", type=int, default=2)
+    pipeline.add_argument("--dry-run", action="store_true", help="only show the stale stages")
+    pipeline.set_defaults(func=cmd_pipeline)
+
+    startup = commands.add_parser("startup", help="check the cold start time")
+    startup.add_argument("--budget", type=float, default=COLD_START_BUDGET)
+    startup.add_argument("--repeat", type=int, default=3)
+    startup.set_defaults(func=cmd_startup)
+    return parser
+
+
+def main(argv=None):
+    """
+    Entry point of the `citnet` console script
+    """
+    args = get_parser().parse_args(argv)
+    args.func(args)
@@ -5,6 +5,7 @@
 
 import pandas as pd
 import jellyfish
+from CitNet import Metrics
 
 
 def authors_parser(authors_string, sep=";"):
@@ -129,23 +130,15 @@ def map_authors(auths_df, thresh):
         for ind in ind_search:
             potential_match = cleaned_df["uniformat"][ind]
             similar = author_comparison(potential_match, author, thresh)
+            Metrics.count("comparisons")
             if similar:
                 cleaned_df["equivalent"][ind].append(
                     author_original)
                 exists_similar = True
         if not exists_similar:
-            df = pd.DataFrame(
-                columns=[
-                    "original",
-                    "uniformat",
-                    "equivalent"],
-                index=[0])
-            df.set_value(0, "original", author_original)
-            df.set_value(0, "uniformat", author)
-            df.set_value(0, "equivalent", [author_original])
-            cleaned_df = cleaned_df.append(df, ignore_index=True)
+            cleaned_df.loc[len(cleaned_df)] = [author_original, author, [author_original]]
         if i % 1000 == 0:
-            print(i)
+            Metrics.emit("progress", stage="map_authors", rows=i, names=len(cleaned_df))
     return cleaned_df
 
 
@@ -175,7 +168,7 @@ def unpack_authors_list(authors_df):
         authors_df["equivalent_" + str(i)] = ""
     for i in authors_df.index:
         for j in range(0, n_eqs[i]):
-            authors_df.set_value(i, "equivalent_" + str(j), authors_df.loc[i, "equivalent"][j])
+            authors_df.at[i, "equivalent_" + str(j)] = authors_df.loc[i, "equivalent"][j]
     return authors_df
 
 
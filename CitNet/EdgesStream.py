@@ -0,0 +1,323 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides out-of-core processing of the refs/cits edge files
+
+The edge files written by DbScrap.py (one "['eja', 'eja_ref']" row per edge) are read in chunks
+of fixed size. Each chunk is parsed, its urls are mapped to article numbers, and the matched
+edges are written to disk as int64 keys (referring * n + referred_to), partitioned by ranges of
+referring articles. Each partition is then sorted and deduplicated in memory on its own and
+appended to the output, so that the output is sorted and the memory used is bounded by the
+chunk size and the partition size, whatever the size of the crawl.
+
+parallel_match_edges does the same work on a process pool: the file is cut into byte-range
+shards (aligned on lines), each worker parses and matches its shards against a sorted table of
+url hashes -> article numbers, memory mapped read-only by all the workers, and writes its own
+partition files, which are merged at the end.
+
+# Example
+id_series = attrs["url"].apply(lambda x: Utils.parse_url(x, "https://ideas.repec.org/a/"))
+stats = stream_edges("Tables/refs.csv", id_series, "Tables/refs_edges.csv")
+stats = parallel_match_edges("Tables/refs.csv", id_series, "Tables/refs_edges.csv", n_jobs=8)
+"""
+
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from CitNet import Metrics
+
+# Pattern of a row of the edge files
+ROW_PATTERN = r"\['(.*)', '(.*)'\]"
+# Url table of the worker processes (see init_worker)
+WORKER_TABLE = {}
+
+
+def get_id_map(id_series):
+    """
+    Lookup table of the articles urls. As in GraphCN.article_matching, a url shared by
+    several articles matches none of them.
+
+    :param id_series: (pandas.core.series.Series) series which index is the article number
+    and which field is its url
+    :return: (pandas.core.indexes.base.Index) unique urls, (numpy.ndarray) their article numbers
+    """
+    unique = ~id_series.duplicated(keep=False)
+    return pd.Index(id_series[unique].values), id_series.index.values[unique.values].astype(np.int64)
+
+
+def parse_edges_chunk(chunk, first="referring"):
+    """
+    Parse a chunk of rows "['eja', 'eja_other']" of an edge file
+
+    :param chunk: (pandas.core.series.Series) the rows
+    :param first: (str) column of the first url, "referring" for refs and "referred_to" for cits
+    :return: (pandas.core.frame.DataFrame) "referring" and "referred_to" urls
+    """
+    valid = {"referring", "referred_to"}
+    if first not in valid:
+        raise ValueError("results: first must be one of %r." % valid)
+    urls = chunk.str.extract(ROW_PATTERN)
+    second = "referred_to" if first == "referring" else "referring"
+    return pd.DataFrame({first: urls[0].values, second: urls[1].values})
+
+
+def map_edges_chunk(edges_df, id_index, id_numbers):
+    """
+    Article numbers of the edges of a chunk, edges with an unmatched url are dropped
+
+    :param edges_df: (pandas.core.frame.DataFrame) "referring" and "referred_to" urls
+    :param id_index: (pandas.core.indexes.base.Index) unique urls (see get_id_map)
+    :param id_numbers: (numpy.ndarray) their article numbers
+    :return: (numpy.ndarray) referring article numbers, (numpy.ndarray) referred_to article numbers
+    """
+    referring = id_index.get_indexer(edges_df["referring"])
+    referred_to = id_index.get_indexer(edges_df["referred_to"])
+    matched = (referring >= 0) & (referred_to >= 0)
+    return id_numbers[referring[matched]], id_numbers[referred_to[matched]]
+
+
+def get_n_partitions(file, memory):
+    """
+    Number of partitions such that a partition fits in memory. A row of the edge files takes
+    more than 16 bytes, its key 8 bytes (and as much again for the sort).
+
+    :param file: (str) path of the edge file
+    :param memory: (int) memory budget in bytes
+    :return: (int) number of partitions
+    """
+    return max(1, int(np.ceil(os.path.getsize(file) / memory)))
+
+
+def partition_keys(referring, referred_to, n, width, part_files):
+    """
+    Write the keys (referring * n + referred_to) of a batch of edges to the partition files,
+    partition i holding the edges whose referring article is in [i * width, (i + 1) * width)
+
+    :param referring: (numpy.ndarray) int64 referring article numbers
+    :param referred_to: (numpy.ndarray) int64 referred_to article numbers
+    :param n: (int) number of articles
+    :param width: (int) number of referring articles per partition
+    :param part_files: (list) partition files, opened in binary append mode
+    """
+    keys = referring * n + referred_to
+    part = referring // width
+    order = np.argsort(part, kind="stable")
+    bounds = np.searchsorted(part[order], np.arange(len(part_files) + 1))
+    for i, part_file in enumerate(part_files):
+        keys[order[bounds[i]:bounds[i + 1]]].tofile(part_file)
+
+
+def merge_partitions(part_paths, n, out_file):
+    """
+    Sort and deduplicate each partition in order and write the edges to a csv file
+
+    :param part_paths: (list) for each partition, the list of its files
+    :param n: (int) number of articles
+    :param out_file: (str) path of the output csv file
+    :return: (int) number of edges written
+    """
+    n_edges = 0
+    with open(out_file, "w") as out:
+        out.write("referring,referred_to\n")
+        for paths in part_paths:
+            keys = np.unique(np.concatenate([np.fromfile(path, dtype=np.int64) for path in paths]))
+            pd.DataFrame({"referring": keys // n, "referred_to": keys % n}).to_csv(out, header=False, index=False)
+            n_edges += len(keys)
+    return n_edges
+
+
+def stream_edges(file, id_series, out_file, first="referring", chunksize=100000, memory=256 * 2 ** 20,
+                 tmp_dir=None):
+    """
+    Match the edges of an edge file chunk by chunk and write the sorted, deduplicated
+    article numbers edges to a csv file ("referring", "referred_to" columns, as read by
+    GraphCN.edgesdf_to_csr)
+
+    :param file: (str) path of the edge file (refs.csv or cits.csv)
+    :param id_series: (pandas.core.series.Series) series which index is the article number
+    and which field is its url
+    :param out_file: (str) path of the output csv file
+    :param first: (str) column of the first url, "referring" for refs and "referred_to" for cits
+    :param chunksize: (int) number of rows read at once
+    :param memory: (int) memory budget of a partition in bytes
+    :param tmp_dir: (str) directory of the partitions files (system temporary directory if None)
+    :return: (dict) number of rows read, of edges matched, of edges written, of chunks and of partitions
+    """
+    id_index, id_numbers = get_id_map(id_series)
+    n = int(id_numbers.max()) + 1 if len(id_numbers) else 1
+    n_partitions = get_n_partitions(file, memory)
+    width = -(-n // n_partitions)
+    stats = {"rows": 0, "matched": 0, "edges": 0, "chunks": 0, "partitions": n_partitions}
+    part_dir = tempfile.mkdtemp(prefix="edges_", dir=tmp_dir)
+    try:
+        part_files = [open(os.path.join(part_dir, "part_{0}.bin".format(i)), "wb") for i in range(n_partitions)]
+        try:
+            # Pass 1: parse, match and partition the keys
+            reader = pd.read_csv(file, header=None, usecols=[0], chunksize=chunksize, dtype=str)
+            for chunk in reader:
+                referring, referred_to = map_edges_chunk(parse_edges_chunk(chunk[0], first), id_index, id_numbers)
+                partition_keys(referring, referred_to, n, width, part_files)
+                stats["rows"] += len(chunk)
+                stats["matched"] += len(referring)
+                stats["chunks"] += 1
+                Metrics.count("edge_rows", len(chunk))
+        finally:
+            for part_file in part_files:
+                part_file.close()
+        # Pass 2: sort and deduplicate each partition, in order
+        stats["edges"] = merge_partitions([[part_file.name] for part_file in part_files], n, out_file)
+    finally:
+        shutil.rmtree(part_dir)
+    return stats
+
+
+def hash_urls(urls):
+    """
+    64 bits hashes of urls
+
+    :param urls: (array-like) the urls (str, NaN for a missing url)
+    :return: (numpy.ndarray) uint64 hashes
+    """
+    return pd.util.hash_array(np.asarray(urls, dtype=object), categorize=False)
+
+
+def build_url_table(id_series, table_dir):
+    """
+    Sorted table of the urls hashes and their article numbers, saved as .npy files to be
+    memory mapped by the workers. Urls shared by several articles, and the (unlikely) hash
+    collisions between different urls, match no article.
+
+    :param id_series: (pandas.core.series.Series) series which index is the article number
+    and which field is its url
+    :param table_dir: (str) directory of the table files
+    :return: (int) number of articles (max article number + 1)
+    """
+    id_index, id_numbers = get_id_map(id_series)
+    hashes = hash_urls(id_index.values)
+    order = np.argsort(hashes, kind="stable")
+    hashes, numbers = hashes[order], id_numbers[order]
+    unique = np.ones(len(hashes), dtype=bool)
+    collision = hashes[1:] == hashes[:-1]
+    unique[1:] &= ~collision
+    unique[:-1] &= ~collision
+    np.save(os.path.join(table_dir, "url_hashes.npy"), hashes[unique])
+    np.save(os.path.join(table_dir, "url_numbers.npy"), numbers[unique])
+    return int(id_numbers.max()) + 1 if len(id_numbers) else 1
+
+
+def init_worker(table_dir, n, width, n_partitions, first):
+    """
+    Initializer of the worker processes: the url table is memory mapped (read-only pages
+    shared by all the workers through the page cache)
+    """
+    WORKER_TABLE["hashes"] = np.load(os.path.join(table_dir, "url_hashes.npy"), mmap_mode="r")
+    WORKER_TABLE["numbers"] = np.load(os.path.join(table_dir, "url_numbers.npy"), mmap_mode="r")
+    WORKER_TABLE.update({"dir": table_dir, "n": n, "width": width, "n_partitions": n_partitions,
+                         "first": first})
+
+
+def lookup_urls(urls):
+    """
+    Article numbers of urls in the worker url table, -1 if unmatched
+    """
+    hashes, numbers = WORKER_TABLE["hashes"], WORKER_TABLE["numbers"]
+    url_hashes = hash_urls(urls)
+    pos = np.searchsorted(hashes, url_hashes)
+    pos[pos == len(hashes)] = 0
+    found = (hashes[pos] == url_hashes) if len(hashes) else np.zeros(len(url_hashes), dtype=bool)
+    return np.where(found, numbers[pos] if len(hashes) else -1, -1).astype(np.int64)
+
+
+def read_shard(file, start, stop):
+    """
+    Lines of a file starting in the byte range [start, stop)
+
+    :return: (bytes) the lines
+    """
+    with open(file, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()
+        begin = f.tell()
+        if begin >= stop:
+            return b""
+        data = f.read(stop - begin)
+        # complete the last line, unless it ends exactly at the end of the range
+        return data if data.endswith(b"\n") else data + f.readline()
+
+
+def match_shard(file, shard, start, stop):
+    """
+    Parse and match the edges of a shard, the keys are written to the shard partition files
+
+    :param file: (str) path of the edge file
+    :param shard: (int) number of the shard
+    :param start: (int) first byte of the shard
+    :param stop: (int) last byte (excluded) of the shard
+    :return: (int) number of rows, (int) number of edges matched
+    """
+    data = read_shard(file, start, stop)
+    if not data:
+        return 0, 0
+    rows = pd.read_csv(io.BytesIO(data), header=None, usecols=[0], dtype=str)[0]
+    edges_df = parse_edges_chunk(rows, WORKER_TABLE["first"])
+    referring = lookup_urls(edges_df["referring"].values)
+    referred_to = lookup_urls(edges_df["referred_to"].values)
+    matched = (referring >= 0) & (referred_to >= 0)
+    part_files = [open(os.path.join(WORKER_TABLE["dir"], "shard_{0}_part_{1}.bin".format(shard, i)), "wb")
+                  for i in range(WORKER_TABLE["n_partitions"])]
+    try:
+        partition_keys(referring[matched], referred_to[matched], WORKER_TABLE["n"], WORKER_TABLE["width"],
+                       part_files)
+    finally:
+        for part_file in part_files:
+            part_file.close()
+    return len(rows), int(matched.sum())
+
+
+def parallel_match_edges(file, id_series, out_file, first="referring", n_jobs=None, shard_bytes=32 * 2 ** 20,
+                         memory=256 * 2 ** 20, tmp_dir=None):
+    """
+    Match the edges of an edge file on a process pool and write the sorted, deduplicated
+    article numbers edges to a csv file (same output as stream_edges)
+
+    :param file: (str) path of the edge file (refs.csv or cits.csv)
+    :param id_series: (pandas.core.series.Series) series which index is the article number
+    and which field is its url
+    :param out_file: (str) path of the output csv file
+    :param first: (str) column of the first url, "referring" for refs and "referred_to" for cits
+    :param n_jobs: (int) number of worker processes (os.cpu_count() if None, in process if 1)
+    :param shard_bytes: (int) size of the shards (bounds the memory of a worker)
+    :param memory: (int) memory budget of a partition in bytes (bounds the memory of the merge)
+    :param tmp_dir: (str) directory of the table and partitions files (system temporary directory if None)
+    :return: (dict) number of rows read, of edges matched, of edges written, of shards and of partitions
+    """
+    size = os.path.getsize(file)
+    n_shards = max(1, int(np.ceil(size / shard_bytes)))
+    n_partitions = get_n_partitions(file, memory)
+    work_dir = tempfile.mkdtemp(prefix="edges_", dir=tmp_dir)
+    try:
+        n = build_url_table(id_series, work_dir)
+        initargs = (work_dir, n, -(-n // n_partitions), n_partitions, first)
+        bounds = [(shard, shard * size // n_shards, (shard + 1) * size // n_shards) for shard in range(n_shards)]
+        if n_jobs == 1:
+            init_worker(*initargs)
+            results = [match_shard(file, *bound) for bound in bounds]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=init_worker, initargs=initargs) as executor:
+                futures = [executor.submit(match_shard, file, *bound) for bound in bounds]
+                results = [future.result() for future in futures]
+        part_paths = [[os.path.join(work_dir, "shard_{0}_part_{1}.bin".format(shard, i)) for shard in range(n_shards)
+                       if os.path.exists(os.path.join(work_dir, "shard_{0}_part_{1}.bin".format(shard, i)))]
+                      for i in range(n_partitions)]
+        stats = {"rows": sum(result[0] for result in results), "matched": sum(result[1] for result in results),
+                 "edges": merge_partitions(part_paths, n, out_file), "shards": n_shards,
+                 "partitions": n_partitions}
+        Metrics.count("edge_rows", stats["rows"])
+    finally:
+        shutil.rmtree(work_dir)
+    return stats
@@ -7,6 +7,11 @@ import pandas as pd
 import itertools
 from collections import Counter
 import numpy as np
+import scipy.sparse as sparse
+
+# Provenance bits of the edges (see union_edges)
+IN_REFS = 1
+IN_CITS = 2
 
 
 def get_edges_list(auths_nums):
@@ -63,7 +68,7 @@ def weighted_edges_list(sorted_edges_list):
     counter_dict = dict(Counter(sorted_edges_list))  # {(auth1, auth2): #co_auth, ...}
     nx_dict = dict()
     for key in counter_dict.keys():  # reformat / keys= [(auth1, auth2), ...]
-        nx_dict[key[0]] = {key[1]: {'weight': counter_dict[key]}}  # format for nx
+        nx_dict.setdefault(key[0], {})[key[1]] = {'weight': counter_dict[key]}  # format for nx
     return nx_dict
 
 
@@ -97,7 +102,8 @@ def article_matching(url_id_series, to_match):
     :return : (pandas.core.series.Series) to_match with urls replaced
     by articles numbers from url_id_series
     """
-    to_match_copy = to_match.copy()
+    # object dtype: the urls (str) are replaced by article numbers
+    to_match_copy = to_match.astype(object)
     uniques = set(to_match_copy.values)
     for url_id in uniques:
         matchs_inds = url_id_series[url_id_series == url_id].index
@@ -172,3 +178,109 @@ def get_citations_ranking(graph, nodes=None, drop_zeros=True):
     ncits_df["rank"] = range(0, ncits_df.shape[0])
     ncits_df.sort_index(inplace=True)
     return ncits_df["rank"]
+
+
+def compact_matrix(adj_mat, unit_weights=False):
+    """
+    Convert a sparse matrix to a compact CSR matrix: int32 indices and float32 values
+    (about half the memory per edge of the default int64/float64 layout).
+    Weights that are small integer counts are represented exactly.
+
+    :param adj_mat: (scipy.sparse.spmatrix) n x n
+    :param unit_weights: (bool) drop the weights and store 1 for each edge
+    :return: (scipy.sparse.csr.csr_matrix) n x n
+    """
+    adj_mat = sparse.csr_matrix(adj_mat)
+    if max(adj_mat.nnz, max(adj_mat.shape)) > np.iinfo(np.int32).max:
+        raise ValueError("matrix too large for int32 indices")
+    if unit_weights:
+        data = np.ones(adj_mat.nnz, dtype=np.float32)
+    else:
+        data = adj_mat.data.astype(np.float32)
+    indices = adj_mat.indices.astype(np.int32, copy=False)
+    indptr = adj_mat.indptr.astype(np.int32, copy=False)
+    return sparse.csr_matrix((data, indices, indptr), shape=adj_mat.shape)
+
+
+def get_adjacency_matrix(graph, nodelist=None, compact=False, unit_weights=False):
+    """
+    Adjacency matrix of a graph as a scipy sparse matrix
+
+    :param graph: (networkx.classes.graph.Graph) the graph
+    :param nodelist: (list) nodes ordering used for rows and columns (default: graph.nodes())
+    :param compact: (bool) return int32 indices and float32 values (see compact_matrix)
+    :param unit_weights: (bool) in compact mode, ignore the weights
+    :return: (scipy.sparse.csr.csr_matrix) n x n
+    """
+    import networkx as nx
+    if hasattr(nx, "to_scipy_sparse_array"):
+        # networkx >= 2.7, to_scipy_sparse_matrix was removed in 3.0
+        adj_mat = sparse.csr_matrix(nx.to_scipy_sparse_array(graph, nodelist=nodelist, format="csr"))
+    else:
+        adj_mat = nx.to_scipy_sparse_matrix(graph, nodelist=nodelist, format="csr")
+    if compact:
+        return compact_matrix(adj_mat, unit_weights)
+    return adj_mat
+
+
+def edgesdf_to_csr(refs_df_id, n=None):
+    """
+    Convert dataframe of refs/cits edges with columns "referring" and "referred_to"
+    (article numbers) to the adjacency matrix of the citation graph, indexed by article number.
+    Duplicated edges are counted once.
+
+    :param refs_df_id: (pandas.core.frame.DataFrame)
+    :param n: (int) number of articles, max article number + 1 if None
+    :return: (scipy.sparse.csr.csr_matrix) n x n, float64 (see compact_matrix for int32/float32)
+    """
+    referring = refs_df_id["referring"].values.astype(np.int64)
+    referred_to = refs_df_id["referred_to"].values.astype(np.int64)
+    if n is None:
+        n = int(max(referring.max(initial=-1), referred_to.max(initial=-1))) + 1
+    adj_mat = sparse.csr_matrix((np.ones(len(referring)), (referring, referred_to)),
+                                shape=(n, n))
+    adj_mat.data[:] = 1
+    return adj_mat
+
+
+def union_edges(refs_df_id, cits_df_id, n=None):
+    """
+    Union of the refs and cits edges (columns "referring" and "referred_to", article numbers).
+    Edges are encoded as int64 keys referring * n + referred_to and deduplicated by a sort, each
+    edge keeps provenance bits: IN_REFS if it was seen in the references of the citing article,
+    IN_CITS if it was seen in the citations of the cited article (IN_REFS | IN_CITS if both).
+
+    :param refs_df_id: (pandas.core.frame.DataFrame) refs edges
+    :param cits_df_id: (pandas.core.frame.DataFrame) cits edges
+    :param n: (int) number of articles, max article number + 1 if None
+    :return: (pandas.core.frame.DataFrame) unique edges sorted by (referring, referred_to) with
+    a "provenance" column, (dict) coverage statistics of the crawl
+    """
+    sources = [(refs_df_id, IN_REFS), (cits_df_id, IN_CITS)]
+    if n is None:
+        n = max([int(df[col].max()) for df, bit in sources for col in ("referring", "referred_to") if len(df)],
+                default=-1) + 1
+    keys = [np.unique(df["referring"].values.astype(np.int64) * n + df["referred_to"].values.astype(np.int64))
+            for df, bit in sources]
+    all_keys = np.concatenate(keys)
+    bits = np.concatenate([np.full(len(source_keys), bit, dtype=np.uint8)
+                           for source_keys, (df, bit) in zip(keys, sources)])
+    order = np.argsort(all_keys, kind="stable")
+    all_keys, bits = all_keys[order], bits[order]
+    # a key is in at most two sources: the provenance of an edge is the OR over its run of keys
+    starts = np.flatnonzero(np.diff(all_keys, prepend=-1) != 0)
+    union = all_keys[starts]
+    provenance = np.bitwise_or.reduceat(bits, starts) if len(starts) else bits
+    edges_df = pd.DataFrame({"referring": union // n, "referred_to": union % n, "provenance": provenance})
+    both = int((provenance == (IN_REFS | IN_CITS)).sum())
+    stats = {"refs_rows": len(refs_df_id),
+             "cits_rows": len(cits_df_id),
+             "refs_edges": len(keys[0]),
+             "cits_edges": len(keys[1]),
+             "edges": len(union),
+             "both": both,
+             "refs_only": int((provenance == IN_REFS).sum()),
+             "cits_only": int((provenance == IN_CITS).sum()),
+             # share of the edges seen from both ends (crawl consistency)
+             "coverage": both / len(union) if len(union) else np.nan}
+    return edges_df, stats
@@ -1,52 +1,87 @@
 #!python
 # -*-coding:utf-8 -*
 
-"""This module provides tools for computing Hubs and Authorities in a directed Graph"""
+"""This module provides tools for computing Hubs and Authorities in a directed Graph
+
+networkx and matplotlib are only imported by the functions that need them (graph conversion
+and plotting), so that scores can be computed in headless batch jobs without paying their
+import time."""
 
-import networkx as nx
 import numpy as np
 import pandas as pd
 import scipy.sparse as sparse
-import matplotlib.pyplot as plt
+from CitNet import GraphCN, Metrics, Utils
+
 
+def iterate_hubs_auths_sparse(adj_mat, k=20, y_init=None, epsilon=None, compact=False):
+    """
+    Compute hubs and authorities coefficients the iterative way on a sparse adjacency matrix.
+    Norms are accumulated in float64.
 
-def iterate_hubs_auths(subgraph, k=20):
+    :param adj_mat: (scipy.sparse.csr.csr_matrix) n x n
+    :param k: (int) (maximum) number of iterations
+    :param y_init: (array-like) n, starting hubs vector (e.g. previous hubs), ones if None
+    :param epsilon: (numeric) stop when the l1 change of the normalized hubs vector is below
+    epsilon, always k iterations if None
+    :param compact: (bool) use int32 indices and float32 values and vectors (float64 otherwise,
+    whatever the dtype of adj_mat)
+    :return: x, y respectively vector of authorities coefs and hubs coefs
+    """
+    if compact:
+        adj_mat = GraphCN.compact_matrix(adj_mat)
+        dtype = np.float32
+    else:
+        adj_mat = sparse.csr_matrix(adj_mat, dtype=np.float64)
+        dtype = np.float64
+    n = adj_mat.shape[0]
+    y = np.ones((n, ), dtype=dtype) if y_init is None else np.array(y_init, dtype=dtype)
+    x = np.ones((n, ), dtype=dtype)
+    adj_mat_t = adj_mat.T.tocsr()
+    for i in range(0, k):
+        y_prev = y
+        x = adj_mat_t.dot(y).astype(dtype, copy=False)
+        y = adj_mat.dot(x).astype(dtype, copy=False)
+        Metrics.count("spmv", 2)
+        x *= dtype(1 / Utils.vec_norm(x))
+        y *= dtype(1 / Utils.vec_norm(y))
+        if epsilon is not None and Utils.vec_norm(y - y_prev, ord=1) < epsilon:
+            break
+    return x, y
+
+
+def iterate_hubs_auths(subgraph, k=20, compact=False):
     """
     Compute hubs and authorities coefficients the iterative way
 
     :param subgraph: (networkx.classes.digraph.DiGraph) a subgraph
     :param k: (int) number of iterations
+    :param compact: (bool) use int32 indices and float32 values and vectors
     :return: x, y, nodes respectively vector of authorities coefs, hubs coefs and nodes
     ordering used for computations
     """
     nodes = list(subgraph)
     nodes.sort()
-    A = nx.to_scipy_sparse_matrix(subgraph, nodelist=nodes)  # .asfptype()
-    n = len(nodes)
-    y = np.ones((n, ))
-    x = np.ones((n, ))
-    for i in range(0, k):
-        x = sparse.csr_matrix.dot(sparse.csr_matrix.transpose(A), y)
-        y = sparse.csr_matrix.dot(A, x)
-        x *= (1 / np.linalg.norm(x))
-        y *= (1 / np.linalg.norm(y))
+    A = GraphCN.get_adjacency_matrix(subgraph, nodelist=nodes, compact=compact)
+    x, y = iterate_hubs_auths_sparse(A, k, compact=compact)
     results_df = pd.DataFrame(index=nodes)
     results_df["xauth_0"] = x
     results_df["xhubs_0"] = y
     return results_df
 
 
-def compute_authorities(subgraph, neigs=1):
+def compute_authorities(subgraph, neigs=1, compact=False):
     """
     Compute authorities coefficients the eigen vectors way
 
     :param subgraph: a subgraph (networkx.classes.digraph.DiGraph)
     :param neigs: number of principal vectors wanted
+    :param compact: (bool) use int32 indices and float32 values
     :return: xstar, nodes : respectively eigen vector stacked as columns and nodes ordering used for computations
     """
     nodes = list(subgraph.nodes())
     nodes.sort()
-    A = nx.to_scipy_sparse_matrix(subgraph, nodelist=nodes).asfptype()
+    dtype = np.float32 if compact else np.float64
+    A = GraphCN.get_adjacency_matrix(subgraph, nodelist=nodes, compact=compact).astype(dtype)
     AT = sparse.csr_matrix.transpose(A)
     ATA = sparse.csr_matrix.dot(AT, A)
     accept = False
@@ -64,17 +99,19 @@ def compute_authorities(subgraph, neigs=1):
     return xstar, nodes
 
 
-def compute_hubs(subgraph, neigs=1):
+def compute_hubs(subgraph, neigs=1, compact=False):
     """
     Compute hubs coefficients the eigen vectors way
 
     :param subgraph: a subgraph (networkx.classes.digraph.DiGraph)
     :param neigs: number of principal vectors wanted
+    :param compact: (bool) use int32 indices and float32 values
     :return: xstar, nodes : respectively eigen vectors stacked as columns and nodes ordering used for computations
     """
     nodes = list(subgraph.nodes())
     nodes.sort()
-    A = nx.to_scipy_sparse_matrix(subgraph, nodelist=nodes).asfptype()
+    dtype = np.float32 if compact else np.float64
+    A = GraphCN.get_adjacency_matrix(subgraph, nodelist=nodes, compact=compact).astype(dtype)
     AT = sparse.csr_matrix.transpose(A)
     AAT = sparse.csr_matrix.dot(A, AT)
     accept = False
@@ -92,16 +129,17 @@ def compute_hubs(subgraph, neigs=1):
     return ystar, nodes
 
 
-def hubs_authorities_eigen(subgraph, neigs=1):
+def hubs_authorities_eigen(subgraph, neigs=1, compact=False):
     """
     Wraps the result from compute_hubs and compute_authorities functions in a dataframe
 
     :param subgraph: a subgraph (networkx.classes.digraph.DiGraph)
     :param neigs: number of principal vectors wanted
+    :param compact: (bool) use int32 indices and float32 values
     :return: Dataframe containing the principal vectors, indexed with nodes
     """
-    xstar, nodes = compute_authorities(subgraph, neigs)
-    ystar, nodes = compute_hubs(subgraph, neigs)
+    xstar, nodes = compute_authorities(subgraph, neigs, compact)
+    ystar, nodes = compute_hubs(subgraph, neigs, compact)
     results_df = pd.DataFrame(index=nodes)
     for i in range(0, neigs):
         results_df["xauth_" + str(i)] = xstar[:, i]
@@ -118,8 +156,8 @@ def non_principal_authorities(eigs_vecs_df, c):
     :param c: Number of authorities to retrieve
     :return: Top c authorities
     """
-    x = eigs_vecs_df.iloc[0].as_matrix()
-    y = eigs_vecs_df.iloc[1].as_matrix()
+    x = eigs_vecs_df.iloc[0].to_numpy()
+    y = eigs_vecs_df.iloc[1].to_numpy()
     xy = np.concatenate((x, y))
     conc_index = eigs_vecs_df.index.append(eigs_vecs_df.index)
     cmax_inds = np.argsort(xy)[::-1][:c]
@@ -136,8 +174,8 @@ def non_principal_hubs(eigs_vecs_df, c):
     :param c: Number of authorities to retrieve
     :return: Top c hubs
     """
-    x = eigs_vecs_df.iloc[0].as_matrix()
-    y = eigs_vecs_df.iloc[1].as_matrix()
+    x = eigs_vecs_df.iloc[0].to_numpy()
+    y = eigs_vecs_df.iloc[1].to_numpy()
     xy = np.concatenate((x, y))
     conc_index = eigs_vecs_df.index.append(eigs_vecs_df.index)
     cmax_inds = np.argsort(xy)[:c]
@@ -183,7 +221,7 @@ def plot_hubs_authorities(subgraph,
                           hubs_rank,
                           kauths=5,
                           khubs=5,
-                          layout=nx.spring_layout,
+                          layout=None,
                           other_authorities=None,
                           other_hubs=None):
     """
@@ -194,11 +232,15 @@ def plot_hubs_authorities(subgraph,
     :param hubs_rank:
     :param kauths: (int) number of authorities to be shown in special style
     :param khubs: (int) number of hubs to be shown in special style
-    :param layout: networkx.layout
+    :param layout: networkx.layout (default: networkx.spring_layout)
     :param other_authorities:
     :param other_hubs:
     :return: Plot of the graph featuring hubs and authorities
     """
+    import networkx as nx
+    import matplotlib.pyplot as plt
+    if layout is None:
+        layout = nx.spring_layout
     pos = layout(subgraph)
     nx.draw_networkx_nodes(subgraph, pos,
                            nodelist=list(auths_rank[kauths:]),
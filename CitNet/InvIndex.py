@@ -0,0 +1,216 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides an inverted index for topic queries
+
+For each indexed column, the index stores the sorted vocabulary of tokens and, for each
+token, the sorted list of articles (int32 posting list) whose column contains the token.
+Posting lists are stored concatenated, with offsets, so that the whole index fits in a
+few numpy arrays and is saved as a single .npz next to the Tables. The .npz also stores a hash of
+the indexed columns, so that an index saved before the attributes table changed (incremental
+crawl, new disambiguation) is rebuilt instead of silently missing the new articles.
+
+# Example
+inv_index = get_index(attrs, "Tables/InvIndex.npz")    # loaded if up to date, rebuilt otherwise
+"""
+
+import hashlib
+import os
+import re
+import numpy as np
+import pandas as pd
+
+
+def tokenize(text):
+    """
+    Split a string into lowercase alphanumeric tokens
+
+    :param text: (str) the string to split (NaN gives no token)
+    :return: (list) the tokens
+    """
+    if not isinstance(text, str):
+        return []
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def build_column_index(series):
+    """
+    Inverted index of one column
+
+    :param series: (pandas.core.series.Series) strings indexed by article number
+    :return: (dict) {"terms": sorted tokens, "offsets": postings offsets of each token,
+    "postings": concatenated int32 posting lists}
+    """
+    tokens = series.apply(lambda x: list(set(tokenize(x))))
+    lengths = np.fromiter(map(len, tokens.values), dtype=np.int64, count=len(tokens))
+    tokens = tokens[lengths > 0]
+    pairs = pd.DataFrame({"term": np.concatenate(tokens.values) if len(tokens) else np.empty(0, dtype=str),
+                          "article": np.repeat(tokens.index.values, lengths[lengths > 0])})
+    pairs.sort_values(by=["term", "article"], inplace=True)
+    terms, counts = np.unique(np.array(pairs["term"].tolist(), dtype=str), return_counts=True)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    return {"terms": terms,
+            "offsets": offsets,
+            "postings": pairs["article"].values.astype(np.int32)}
+
+
+def build_index(df, search_in=("title", "keywords", "jel_code")):
+    """
+    Inverted index of several columns of the attributes table
+
+    :param df: (pandas.core.frame.DataFrame) attributes table, indexed by article number
+    :param search_in: (tuple) the columns to index
+    :return: (dict) {column: column index (see build_column_index)}
+    """
+    index = dict()
+    for col in search_in:
+        index[col] = build_column_index(df[col])
+        index[col]["lookup"] = dict(zip(index[col]["terms"], range(len(index[col]["terms"]))))
+    return index
+
+
+def source_hash(df, search_in=("title", "keywords", "jel_code")):
+    """
+    Content hash of the indexed columns of the attributes table (article numbers included)
+
+    :param df: (pandas.core.frame.DataFrame) attributes table, indexed by article number
+    :param search_in: (tuple) the indexed columns
+    :return: (str) hex digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(",".join(search_in).encode())
+    digest.update(pd.util.hash_pandas_object(df[list(search_in)].astype(str), index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def save_index(index, file, source=None):
+    """
+    Save the inverted index as a .npz file
+
+    :param index: (dict) the index (see build_index)
+    :param file: (str) path of the .npz file
+    :param source: (str) hash of the indexed columns (see source_hash), stored with the index
+    """
+    arrays = dict()
+    for col, col_index in index.items():
+        for key in ("terms", "offsets", "postings"):
+            arrays[col + "__" + key] = col_index[key]
+    if source is not None:
+        arrays["source_hash"] = np.array(source)
+    np.savez(file, **arrays)
+
+
+def load_index(file):
+    """
+    Load an inverted index saved with save_index
+
+    :param file: (str) path of the .npz file
+    :return: (dict) the index (see build_index)
+    """
+    index = dict()
+    with np.load(file) as arrays:
+        for name in arrays.files:
+            if name == "source_hash":
+                continue
+            col, key = name.split("__")
+            index.setdefault(col, dict())[key] = arrays[name]
+    for col_index in index.values():
+        col_index["lookup"] = dict(zip(col_index["terms"], range(len(col_index["terms"]))))
+    return index
+
+
+def get_index(df, file, search_in=("title", "keywords", "jel_code")):
+    """
+    Inverted index of the attributes table, loaded from file if it was built from the same
+    content of the indexed columns, rebuilt and saved otherwise (missing file, attributes
+    table changed since, or index saved without its source hash)
+
+    :param df: (pandas.core.frame.DataFrame) attributes table, indexed by article number
+    :param file: (str) path of the .npz file
+    :param search_in: (tuple) the columns to index
+    :return: (dict) the index (see build_index)
+    """
+    source = source_hash(df, search_in)
+    if os.path.exists(file):
+        with np.load(file) as arrays:
+            stored = str(arrays["source_hash"]) if "source_hash" in arrays.files else None
+        if stored == source:
+            return load_index(file)
+    index = build_index(df, search_in)
+    save_index(index, file, source)
+    return index
+
+
+def get_postings(index, col, term):
+    """
+    Posting list of a token in a column
+
+    :param index: (dict) the index (see build_index)
+    :param col: (str) the column
+    :param term: (str) the token
+    :return: (numpy.ndarray) sorted int32 article numbers
+    """
+    col_index = index[col]
+    i = col_index["lookup"].get(term)
+    if i is None:
+        return np.empty(0, dtype=np.int32)
+    return col_index["postings"][col_index["offsets"][i]:col_index["offsets"][i + 1]]
+
+
+def postings_inter(postings_list):
+    """
+    Intersection of sorted posting lists, starting from the shortest ones
+
+    :param postings_list: (list) sorted posting lists
+    :return: (numpy.ndarray) sorted intersection, empty for an empty list
+    """
+    if not postings_list:
+        return np.empty(0, dtype=np.int32)
+    postings_list = sorted(postings_list, key=len)
+    inter = postings_list[0]
+    for postings in postings_list[1:]:
+        if len(inter) == 0:
+            break
+        pos = np.searchsorted(postings, inter)
+        pos[pos == len(postings)] = 0
+        inter = inter[postings[pos] == inter]
+    return inter
+
+
+def postings_union(postings_list):
+    """
+    Union of sorted posting lists
+
+    :param postings_list: (list) sorted posting lists
+    :return: (numpy.ndarray) sorted union, empty for an empty list
+    """
+    if not postings_list:
+        return np.empty(0, dtype=np.int32)
+    return np.unique(np.concatenate(postings_list))
+
+
+def index_query(index, query_list, search_in=("title", "keywords"), how="union"):
+    """
+    Articles matching a topic query, same logic as Query.topic_subgraph_root:
+    in each column, articles containing all the keywords, then intersection or union
+    over the columns. A keyword matches if the column contains all its tokens
+    (case insensitive).
+
+    :param index: (dict) the index (see build_index)
+    :param query_list: (list) list of keywords
+    :param search_in: (tuple) The columns to include for the query
+    :param how: (str) How to join the columns results ("inter" or "union") ?
+    :return: (numpy.ndarray) sorted int32 article numbers
+    """
+    inds = []
+    for col in search_in:
+        postings_list = [get_postings(index, col, term)
+                         for query in query_list for term in tokenize(query)]
+        if postings_list:
+            inds.append(postings_inter(postings_list))
+        else:
+            inds.append(np.empty(0, dtype=np.int32))
+    if how == "inter":
+        return postings_inter(inds)
+    else:
+        return postings_union(inds)
@@ -0,0 +1,204 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides lightweight instrumentation of the pipeline: stage timers, counters,
+peak memory sampling and optional cProfile capture, written as structured events (JSON lines)
+
+Instrumentation is disabled by default: count() and emit() then return after one test and
+stage() does not time anything, so that library functions can be instrumented in their loops.
+
+# Example
+Metrics.enable("Tables/metrics.jsonl", memory=True)
+with Metrics.stage("matching", rows=len(refs)):
+    modified_refs = GraphCN.match_articles(refs, id_series)
+# {"event": "stage", "name": "matching", "time": 12.3, "counters": {...}, "peak_rss": ..., "rows": ...}
+
+@Metrics.stage("pagerank")
+def rank(adj_mat):
+    ...
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import ContextDecorator
+
+# State of the instrumentation (see enable)
+CONFIG = {"enabled": False, "sink": None, "memory": False, "profile_dir": None, "interval": .05,
+          "profiling": False}
+# Counters, accumulated over the session (stages report their own increments)
+COUNTERS = dict()
+
+
+def enable(file=None, memory=False, profile_dir=None, interval=.05):
+    """
+    Turn the instrumentation on
+
+    :param file: (str) path of the JSON lines file (appended to), stderr if None
+    :param memory: (bool) sample the resident memory during the stages
+    :param profile_dir: (str) directory where a cProfile of each stage is saved, no profiling if None
+    :param interval: (float) memory sampling interval in seconds
+    """
+    disable()
+    CONFIG["sink"] = open(file, "a") if file is not None else sys.stderr
+    CONFIG["memory"] = memory
+    CONFIG["profile_dir"] = profile_dir
+    CONFIG["interval"] = interval
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+    COUNTERS.clear()
+    CONFIG["enabled"] = True
+
+
+def disable():
+    """
+    Turn the instrumentation off (and close the JSON lines file)
+    """
+    CONFIG["enabled"] = False
+    if CONFIG["sink"] not in (None, sys.stderr, sys.stdout):
+        CONFIG["sink"].close()
+    CONFIG["sink"] = None
+
+
+def emit(event, **fields):
+    """
+    Write an event as a JSON line
+
+    :param event: (str) type of the event ("stage", "progress", ...)
+    :param fields: fields of the event (JSON serializable, numpy scalars are converted)
+    """
+    if not CONFIG["enabled"]:
+        return
+    record = {"event": event, "ts": time.time()}
+    record.update(fields)
+    CONFIG["sink"].write(json.dumps(record, default=lambda x: x.item() if hasattr(x, "item") else str(x)) + "\n")
+    CONFIG["sink"].flush()
+
+
+def count(name, n=1):
+    """
+    Increment a counter (pages fetched, comparisons made, SpMV calls...)
+
+    :param name: (str) the counter
+    :param n: (int) the increment
+    """
+    if CONFIG["enabled"]:
+        COUNTERS[name] = COUNTERS.get(name, 0) + n
+
+
+def rss_bytes():
+    """
+    Current resident memory of the process (peak resident memory where /proc is not available)
+
+    :return: (int) number of bytes
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemorySampler(threading.Thread):
+    """
+    Background thread keeping the peak resident memory of the process while running
+
+    :param interval: (float) sampling interval in seconds
+    """
+
+    def __init__(self, interval=.05):
+        threading.Thread.__init__(self, daemon=True)
+        self.interval = interval
+        self.peak = rss_bytes()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def stop(self):
+        """
+        Stop sampling, returns the peak resident memory (bytes)
+        """
+        self.stopped.set()
+        self.join()
+        self.peak = max(self.peak, rss_bytes())
+        return self.peak
+
+
+class stage(ContextDecorator):
+    """
+    Context manager (or decorator) timing a stage of the pipeline. When the instrumentation is
+    enabled, a "stage" event is emitted at the end with the wall and cpu times, the counters
+    incremented during the stage, the peak resident memory and the cProfile file if requested.
+
+    :param name: (str) name of the stage
+    :param fields: additional fields of the event (sizes, parameters...)
+    """
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+        self.active = False
+
+    def _recreate_cm(self):
+        # a fresh timer per call when used as a decorator (recursive or concurrent calls)
+        return stage(self.name, **self.fields)
+
+    def __enter__(self):
+        self.active = CONFIG["enabled"]
+        if not self.active:
+            return self
+        self.counters = dict(COUNTERS)
+        self.sampler = MemorySampler(CONFIG["interval"]) if CONFIG["memory"] else None
+        if self.sampler is not None:
+            self.sampler.start()
+        # nested stages are covered by the profile of the outermost one
+        self.profiler = None
+        if CONFIG["profile_dir"] is not None and not CONFIG["profiling"]:
+            self.profiler = cProfile.Profile()
+            CONFIG["profiling"] = True
+        self.start_cpu = time.process_time()
+        self.start = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.active:
+            return False
+        elapsed = time.perf_counter() - self.start
+        record = {"name": self.name, "time": elapsed, "cpu_time": time.process_time() - self.start_cpu,
+                  "counters": {key: value - self.counters.get(key, 0) for key, value in COUNTERS.items()
+                               if value != self.counters.get(key, 0)}}
+        if self.profiler is not None:
+            self.profiler.disable()
+            CONFIG["profiling"] = False
+            record["profile"] = os.path.join(CONFIG["profile_dir"], "{0}_{1}_{2}.prof".format(
+                self.name, os.getpid(), int(time.time() * 1000)))
+            self.profiler.dump_stats(record["profile"])
+        if self.sampler is not None:
+            record["peak_rss"] = self.sampler.stop()
+        if exc_type is not None:
+            record["error"] = repr(exc_value)
+        record.update(self.fields)
+        emit("stage", **record)
+        return False
+
+
+def read_events(file, event=None):
+    """
+    Read the events of a JSON lines file
+
+    :param file: (str) path of the file
+    :param event: (str) keep only this type of event if given
+    :return: (list) the events (dicts)
+    """
+    with open(file) as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    return [record for record in events if event is None or record["event"] == event]
@@ -3,8 +3,9 @@
 
 """ This module provides tools for PageRank computation
 
-Beware: not as efficient as the networkx implementation so far.
-We recommend to use the aforementioned distribution.
+The Google matrix G = theta * (H + 1/n.d.1T) + (1-theta)/n.1.1T is never formed:
+teleportation and dangling nodes mass are applied as rank-one corrections
+to the sparse transition matrix H at each iteration, so that memory stays O(nnz).
 
 # Toy example for testing this implementation
 row = np.array([0, 0, 1, 2, 2, 2])
@@ -14,82 +15,550 @@ data = np.array([1, 2, 3, 4, 5, 6])
 a_wodang = sparse.csc_matrix((data, (row, col)), (4, 4))
 a_wdang = sparse.csc_matrix((data, (row, col)), (5, 5))"""
 
+import time
+from collections import deque
 import numpy as np
 import scipy.sparse as sparse
 import scipy.sparse.linalg as linalg
+from CitNet import GraphCN, Metrics, Utils
 
 
 def get_dangvec(adj_mat):
     """
-    Returns the vector of dangling nodes (0 if False, 1 if Trues)
+    Returns the vector of dangling nodes (False if not dangling, True if dangling)
     :param adj_mat: (scipy.sparse.csc.csc_matrix) n x n
-    :return: (scipy.sparse.csc.csc_matrix) n x 1
+    :return: (numpy.ndarray) n, boolean
     """
-    dang_vec = sparse.csc_matrix(adj_mat.sum(1) == 0, dtype=int)
+    dang_vec = np.asarray(adj_mat.sum(axis=1)).ravel() == 0
     return dang_vec
 
 
-def get_dangmat(adj_mat):
+def get_hmat(adj_mat, compact=False):
     """
-    Returns the matrix of dangling nodes mandatory score spreading
+    Returns the H mat (row normalized adj_mat, rows of dangling nodes are left empty)
     :param adj_mat: (scipy.sparse.csc.csc_matrix) n x n
-    :return: (scipy.sparse.csc.csc_matrix) n x n
+    :param compact: (bool) float32 values, float64 otherwise (whatever the dtype of adj_mat)
+    :return: (scipy.sparse.csr.csr_matrix) n x n
     """
-    dang_vec = get_dangvec(adj_mat)
-    one_vec = sparse.csc_matrix(np.ones(adj_mat.shape[0]))
-    dang_mat = dang_vec.dot(one_vec) * 1/adj_mat.shape[0]
-    return dang_mat
+    dtype = np.float32 if compact else np.float64
+    h_mat = sparse.csr_matrix(adj_mat, dtype=dtype, copy=True)
+    h_mat.eliminate_zeros()
+    out_weights = np.asarray(h_mat.sum(axis=1), dtype=dtype).ravel()
+    h_mat.data /= np.repeat(out_weights, np.diff(h_mat.indptr))
+    return h_mat
 
 
-def get_hmat(adj_mat):
+def get_persmat(labels, weights=None):
     """
-    Returns the H mat (normalized adj_mat + mandatory score spreading)
-    :param adj_mat: (scipy.sparse.csc.csc_matrix) n x n
-    :return: (scipy.sparse.csc.csc_matrix) n x n
+    Returns a matrix of personalization vectors, one column per distinct label
+    (e.g. one per year cohort or per journal), each column summing to 1
+    :param labels: (array-like) n, label of each node
+    :param weights: (array-like) n, optional weights of the nodes within their column
+    (e.g. a time discount)
+    :return: (scipy.sparse.csc.csc_matrix) n x k, (numpy.ndarray) k labels ordering used for the columns
     """
-    int_mat = get_dangmat(adj_mat) + adj_mat
-    h_mat = sparse.csc_matrix(int_mat / int_mat.sum(axis=1))
-    return h_mat
+    categories, codes = np.unique(np.asarray(labels), return_inverse=True)
+    n = len(codes)
+    if weights is None:
+        weights = np.ones(n)
+    pers_mat = sparse.csc_matrix((np.asarray(weights, dtype=np.float64), (np.arange(n), codes)),
+                                 shape=(n, len(categories)))
+    col_sums = np.asarray(pers_mat.sum(axis=0)).ravel()
+    col_sums[col_sums == 0] = 1
+    pers_mat = pers_mat.dot(sparse.diags(1 / col_sums)).tocsc()
+    return pers_mat, categories
 
 
-def get_gmat(adj_mat, theta):
+def get_pagerank_batch(adj_mat, pers_mat=None, theta=.85, epsilon=1e-06, max_iter=100, compact=False,
+                       return_info=False):
+
     """
-    Returns the G mat ((1-theta) * 1/N.1.1T + theta * H)
+    Returns the matrix of personalized pagerank scores, one column per personalization
+    vector, all solved in one block power iteration over a shared transition matrix
+    (see pagerank_step, one sparse product per iteration for all the columns).
+    As in networkx, the mass of dangling nodes is redistributed following the
+    personalization vector.
     :param adj_mat: (scipy.sparse.csc.csc_matrix) n x n
+    :param pers_mat: (numpy.ndarray or scipy.sparse matrix) n x k personalization vectors
+    stacked as columns (normalized to sum to 1), uniform if None
     :param theta: (numeric) damping factor
-    :return: (scipy.sparse.csc.csc_matrix) n x n
+    :param epsilon: (numeric) convergence parameter, iterations stop when the l1 residual
+    of every column is below epsilon
+    :param max_iter: (int) maximum number of iterations
+    :param compact: (bool) use int32 indices and float32 values
+    :param return_info: (bool) also return a dict with the number of iterations, the final
+    l1 residual of each column (in float64) and whether they are all below epsilon
+    :return: (numpy.ndarray) n x k matrix of pagerank scores (, (dict) info)
     """
     n = adj_mat.shape[0]
-    h_mat = get_hmat(adj_mat)
-    one_vec = sparse.csc_matrix(np.ones(n)).T
-    g_mat = (1-theta)/n * one_vec.dot(one_vec.T) + theta * h_mat
-    return g_mat
+    if compact:
+        adj_mat = GraphCN.compact_matrix(adj_mat)
+    h_mat = get_hmat(adj_mat, compact)
+    h_mat_t = h_mat.T
+    dang_vec = get_dangvec(h_mat)
+    dtype = h_mat.dtype.type
+    if pers_mat is None:
+        pers_mat = np.full((n, 1), 1 / n)
+    elif sparse.issparse(pers_mat):
+        pers_mat = pers_mat.toarray()
+    pers_mat = np.asarray(pers_mat, dtype=np.float64).reshape(n, -1)
+    col_sums = pers_mat.sum(axis=0)
+    if not np.all(col_sums > 0):
+        raise ValueError("results: every column of pers_mat must have a positive sum.")
+    pers_mat = (pers_mat / col_sums).astype(dtype)
+    pr_mat = np.full(pers_mat.shape, 1 / n, dtype=dtype)
+
+    i = 0
+    while i < max_iter:
+        pr_iter = pagerank_step(h_mat_t, dang_vec, pers_mat, theta, pr_mat)
+        i += 1
+        norm_iter = np.abs(pr_iter - pr_mat).sum(axis=0, dtype=np.float64)
+        pr_mat = pr_iter
+        if np.all(norm_iter < epsilon):
+            break
+    Metrics.emit("pagerank_batch", n=n, nnz=h_mat.nnz, columns=pers_mat.shape[1], iterations=i)
+    if not return_info:
+        return pr_mat
+    residual = get_residual(h_mat, dang_vec, pers_mat, theta, pr_mat)
+    info = {"iterations": i, "residual": residual, "converged": bool(np.all(residual < epsilon))}
+    return pr_mat, info
+
+
+def pagerank_step(h_mat_t, dang_vec, pers_vec, theta, pr_vec):
+    """
+    Returns one power iteration step G.pr_vec (G is never formed, see module doc), rescaled to the
+    mass of pr_vec so that the rounding errors of float32 products do not leak mass over the iterations.
+    With n x k scores and personalizations, the k columns are stepped with one sparse product.
+    :param h_mat_t: (scipy.sparse matrix) n x n transposed transition matrix (see get_hmat)
+    :param dang_vec: (numpy.ndarray) n, boolean vector of dangling nodes
+    :param pers_vec: (numpy.ndarray) n (or n x k), personalization vector(s)
+    :param theta: (numeric) damping factor
+    :param pr_vec: (numpy.ndarray) n (or n x k), current scores
+    :return: (numpy.ndarray) n (or n x k), next scores
+    """
+    dtype = pr_vec.dtype.type
+    Metrics.count("spmv")
+    mass = pr_vec.sum(axis=0, dtype=np.float64)
+    spread = theta * pr_vec[dang_vec].sum(axis=0, dtype=np.float64) + (1 - theta) * mass
+    pr_iter = theta * h_mat_t.dot(pr_vec) + pers_vec * spread.astype(dtype)
+    pr_iter *= (mass / pr_iter.sum(axis=0, dtype=np.float64)).astype(dtype)
+    return pr_iter
+
+
+def get_residual(h_mat, dang_vec, pers_vec, theta, pr_vec):
+    """
+    Returns the l1 residual ||G.pr_vec - pr_vec||, computed in float64 whatever the dtype of h_mat
+    (a float32 step can be a fixed point of its own rounding while far from the solution)
+    :return: (float) the residual (numpy.ndarray, one per column, for n x k scores)
+    """
+    h_mat = sparse.csr_matrix(h_mat, dtype=np.float64)
+    pr_vec = np.asarray(pr_vec, dtype=np.float64)
+    pers_vec = np.asarray(pers_vec, dtype=np.float64)
+    return np.abs(pagerank_step(h_mat.T, dang_vec, pers_vec, theta, pr_vec) - pr_vec).sum(axis=0)
+
+
+def pagerank_power(h_mat, dang_vec, pers_vec, theta, epsilon, max_iter, pr_vec):
+    """
+    Power iteration solver, stops when the l1 residual ||G.pr - pr|| is below epsilon
+    :return: (numpy.ndarray) n vector of scores, (int) number of iterations
+    """
+    h_mat_t = h_mat.T
+    i = 0
+    while i < max_iter:
+        pr_iter = pagerank_step(h_mat_t, dang_vec, pers_vec, theta, pr_vec)
+        i += 1
+        norm_iter = Utils.vec_norm(pr_iter - pr_vec, ord=1)
+        pr_vec = pr_iter
+        if norm_iter < epsilon:
+            break
+    return pr_vec, i
+
+
+def pagerank_gauss_seidel(h_mat, dang_vec, pers_vec, theta, epsilon, max_iter, pr_vec):
+    """
+    Gauss-Seidel solver of the linear system (I - theta.H^T) y = pers_vec. Since dangling mass
+    follows the personalization, the scores are y normalized to sum to 1.
+    Each sweep is a sparse triangular solve with the lower part of the system matrix.
+    The system and the residuals are in float64 whatever the dtype of h_mat, the sweeps stop
+    early when the residual stops decreasing (rounding floor of a float32 h_mat).
+    :return: (numpy.ndarray) n vector of scores, (int) number of iterations
+    """
+    n = h_mat.shape[0]
+    h_mat = sparse.csr_matrix(h_mat, dtype=np.float64)
+    sys_mat = (sparse.identity(n, dtype=np.float64, format="csr") - theta * h_mat.T).tocsr()
+    lower = sparse.tril(sys_mat, format="csr")
+    upper = sparse.triu(sys_mat, k=1, format="csr")
+    h_mat_t = h_mat.T
+    pers_vec = pers_vec.astype(np.float64)
+    y_vec = pr_vec.astype(np.float64)
+    norm_prev = np.inf
+    i = 0
+    while i < max_iter:
+        y_vec = linalg.spsolve_triangular(lower, pers_vec - upper.dot(y_vec), lower=True)
+        Metrics.count("triangular_solves")
+        i += 1
+        pr_iter = y_vec / y_vec.sum()
+        norm_iter = Utils.vec_norm(pagerank_step(h_mat_t, dang_vec, pers_vec, theta, pr_iter) - pr_iter, ord=1)
+        if norm_iter < epsilon or norm_iter >= norm_prev:
+            break
+        norm_prev = norm_iter
+    return (y_vec / y_vec.sum()).astype(pr_vec.dtype), i
+
+
+def extrapolate_aitken(pr_hist):
+    """
+    Aitken extrapolation from the last 3 iterates (componentwise delta-squared)
+    :param pr_hist: (list) last iterates, oldest first
+    :return: (numpy.ndarray) extrapolated vector
+    """
+    x0, x1, x2 = pr_hist[-3:]
+    denom = x2 - 2 * x1 + x0
+    safe = np.abs(denom) > 1e-16
+    extra = x2.copy()
+    extra[safe] = x0[safe] - (x1[safe] - x0[safe]) ** 2 / denom[safe]
+    return extra
+
+
+def extrapolate_quadratic(pr_hist):
+    """
+    Quadratic extrapolation (Kamvar et al.) from the last 4 iterates
+    :param pr_hist: (list) last iterates, oldest first
+    :return: (numpy.ndarray) extrapolated vector
+    """
+    x0, x1, x2, x3 = pr_hist[-4:]
+    y_mat = np.column_stack((x1 - x0, x2 - x0))
+    gamma = np.linalg.lstsq(y_mat, -(x3 - x0), rcond=None)[0]
+    beta_0 = gamma[0] + gamma[1] + 1
+    beta_1 = gamma[1] + 1
+    return beta_0 * x1 + beta_1 * x2 + x3
+
+
+def pagerank_extrapolation(h_mat, dang_vec, pers_vec, theta, epsilon, max_iter, pr_vec,
+                           method="quadratic", period=10, settle=.1, min_ratio=.5):
+    """
+    Power iteration accelerated by periodic Aitken or quadratic extrapolation. An extrapolation
+    only pays off once the iterates have settled on a geometric convergence, and only if that
+    convergence is slow: it is attempted when the ratio of the last two residuals is above
+    min_ratio and varies by less than settle, at most once every period steps, and it is kept
+    only if it reduces the residual. On a fast converging graph this is plain power iteration.
+    :param method: (str) "aitken" or "quadratic"
+    :param period: (int) minimum number of power steps between two extrapolations
+    :param settle: (float) tolerance on the relative change of the residual ratio
+    :param min_ratio: (float) residual ratio under which power iteration is left alone
+    :return: (numpy.ndarray) n vector of scores, (int) number of iterations
+    """
+    extrapolate, n_hist = (extrapolate_aitken, 3) if method == "aitken" else (extrapolate_quadratic, 4)
+    h_mat_t = h_mat.T
+    pr_hist = []
+    norms = []
+    next_extra = period
+    backoff = 1
+    i = 0
+    while i < max_iter:
+        pr_iter = pagerank_step(h_mat_t, dang_vec, pers_vec, theta, pr_vec)
+        i += 1
+        norm_iter = Utils.vec_norm(pr_iter - pr_vec, ord=1)
+        pr_vec = pr_iter
+        if norm_iter < epsilon:
+            break
+        pr_hist = (pr_hist + [pr_vec])[-n_hist:]
+        norms = (norms + [norm_iter])[-3:]
+        settled = (len(norms) == 3 and norms[2] > min_ratio * norms[1]
+                   and abs(norms[2] * norms[0] / norms[1] ** 2 - 1) < settle)
+        if i >= next_extra and i + 1 < max_iter and len(pr_hist) == n_hist and settled:
+            pr_extra = np.abs(extrapolate(pr_hist))
+            pr_extra = (pr_extra / pr_extra.sum(dtype=np.float64)).astype(pr_vec.dtype)
+            pr_hist, norms = [], []
+            # the extrapolation is kept only if it actually reduces the residual
+            pr_iter = pagerank_step(h_mat_t, dang_vec, pers_vec, theta, pr_extra)
+            i += 1
+            norm_extra = Utils.vec_norm(pr_iter - pr_extra, ord=1)
+            if norm_extra < norm_iter:
+                pr_vec = pr_iter
+                if norm_extra < epsilon:
+                    break
+                backoff = 1
+            else:
+                # the iterates do not fit the extrapolation model, try less often
+                backoff *= 2
+            next_extra = i + period * backoff
+    return pr_vec, i
+
+
+def pagerank_krylov(h_mat, dang_vec, pers_vec, theta, epsilon, max_iter, pr_vec, method="gmres"):
+    """
+    Krylov solver (GMRES or BiCGSTAB) of the linear system (I - theta.H^T) y = pers_vec,
+    scores are y normalized to sum to 1 (see pagerank_gauss_seidel), the system is in float64
+    :param method: (str) "gmres" or "bicgstab"
+    :return: (numpy.ndarray) n vector of scores, (int) number of iterations
+    """
+    n = h_mat.shape[0]
+    h_mat = sparse.csr_matrix(h_mat, dtype=np.float64)
+    sys_mat = (sparse.identity(n, dtype=np.float64, format="csr") - theta * h_mat.T).tocsr()
+    solve = linalg.gmres if method == "gmres" else linalg.bicgstab
+    n_iter = [0]
 
+    def count(_):
+        n_iter[0] += 1
+        Metrics.count("spmv")
+    # the residual of the linear system is an l2 norm, relative to ||pers_vec||
+    tol = epsilon / np.sqrt(n)
+    pers_vec = pers_vec.astype(np.float64)
+    # one callback per inner iteration of GMRES (one product each)
+    options = {"callback_type": "pr_norm"} if method == "gmres" else {}
+    try:
+        y_vec, status = solve(sys_mat, pers_vec, x0=pr_vec.astype(np.float64), rtol=tol, atol=0,
+                              maxiter=max_iter, callback=count, **options)
+    except TypeError:  # scipy < 1.12
+        y_vec, status = solve(sys_mat, pers_vec, x0=pr_vec.astype(np.float64), tol=tol,
+                              maxiter=max_iter, callback=count)
+    return (y_vec / y_vec.sum()).astype(pr_vec.dtype), n_iter[0]
 
-def get_pagerank(adj_mat, theta=.85, epsilon=1e-03, max_iter=20):
+
+SOLVERS = {"power": pagerank_power,
+           "gauss_seidel": pagerank_gauss_seidel,
+           "aitken": lambda *args: pagerank_extrapolation(*args, method="aitken"),
+           "quadratic": lambda *args: pagerank_extrapolation(*args, method="quadratic"),
+           "gmres": lambda *args: pagerank_krylov(*args, method="gmres"),
+           "bicgstab": lambda *args: pagerank_krylov(*args, method="bicgstab")}
+
+
+def get_pagerank(adj_mat, theta=.85, epsilon=1e-06, max_iter=100, compact=False, personalization=None,
+                 solver="power", pr_init=None, return_info=False):
 
     """
     Returns the vector of pagerank scores
     :param adj_mat: (scipy.sparse.csc.csc_matrix) n x n
     :param theta: (numeric) damping factor
-    :param epsilon: (numeric) convergence parameter
-    :return: vector of pagerank scores n x 1
+    :param epsilon: (numeric) convergence parameter, tolerance on the l1 residual ||G.pr - pr||
+    :param max_iter: (int) maximum number of iterations
+    :param compact: (bool) use int32 indices and float32 values and iterates (float64 otherwise, whatever
+    the dtype of adj_mat)
+    :param personalization: (array-like) n, personalization vector, uniform if None
+    :param solver: (str) one of "power", "gauss_seidel", "aitken", "quadratic", "gmres", "bicgstab"
+    :param pr_init: (array-like) n, starting vector (e.g. a previous ranking), uniform if None
+    :param return_info: (bool) also return a dict with the solver, the number of iterations,
+    the final l1 residual (in float64) and whether it is below epsilon
+    :return: (numpy.ndarray) vector of pagerank scores n (, (dict) info)
     """
+    valid = set(SOLVERS)
+    if solver not in valid:
+        raise ValueError("results: solver must be one of %r." % valid)
     n = adj_mat.shape[0]
-    g_mat = get_gmat(adj_mat, theta)
-    pr_vec = sparse.csc_matrix(np.ones(n))/n
-    norm_iter = adj_mat.shape[0]
-    n = adj_mat.shape[0]
+    if compact:
+        adj_mat = GraphCN.compact_matrix(adj_mat)
+    h_mat = get_hmat(adj_mat, compact)
+    dang_vec = get_dangvec(h_mat)
+    dtype = h_mat.dtype.type
+    if personalization is None:
+        pers_vec = np.full(n, 1 / n, dtype=dtype)
+    else:
+        pers_vec = np.asarray(personalization, dtype=np.float64)
+        if not pers_vec.sum() > 0:
+            raise ValueError("results: personalization must have a positive sum.")
+        pers_vec = (pers_vec / pers_vec.sum()).astype(dtype)
+    if pr_init is None:
+        pr_vec = np.full(n, 1 / n, dtype=dtype)
+    else:
+        pr_vec = np.asarray(pr_init, dtype=np.float64)
+        pr_vec = (pr_vec / pr_vec.sum()).astype(dtype)
 
-    i = 0
-    norm = []
+    pr_vec, n_iter = SOLVERS[solver](h_mat, dang_vec, pers_vec, theta, epsilon, max_iter, pr_vec)
+    Metrics.emit("pagerank", solver=solver, n=n, nnz=h_mat.nnz, iterations=n_iter)
+    if not return_info:
+        return pr_vec
+    residual = get_residual(h_mat, dang_vec, pers_vec, theta, pr_vec)
+    info = {"solver": solver, "iterations": n_iter, "residual": residual, "converged": residual < epsilon}
+    return pr_vec, info
 
-    while (norm_iter > epsilon*n) and (i < max_iter):
-        pr_iter = pr_vec.dot(g_mat)
-        norm_iter = linalg.norm(pr_vec - pr_iter)
-        pr_vec = pr_iter
 
-        i += 1
-        norm += [norm_iter]
-        print("iter {0}: {1}".format(i, norm_iter))
-    return pr_vec.T
+def symmetrize(adj_mat):
+    """
+    Returns the symmetric adjacency matrix of an undirected graph, whether the stored matrix
+    holds both (i, j) and (j, i) or only one of them
+    :param adj_mat: (scipy.sparse.csr.csr_matrix) n x n
+    :return: (scipy.sparse.csr.csr_matrix) n x n
+    """
+    adj_mat = sparse.csr_matrix(adj_mat)
+    return adj_mat.maximum(adj_mat.T).tocsr()
+
+
+def get_undirected_pagerank(adj_mat, theta=.85, epsilon=1e-06, max_iter=100, **kwargs):
+    """
+    Returns the vector of pagerank scores of an undirected weighted graph (e.g. the co-authorship
+    matrix AdjMat_Auth.npz). The score of a node is spread to its neighbours in proportion
+    to the edge weights (normalization by the node strength) and isolated nodes (single
+    authors) are dangling nodes, their score is spread following the personalization.
+    :param adj_mat: (scipy.sparse.csr.csr_matrix) n x n
+    :param theta: (numeric) damping factor
+    :param epsilon: (numeric) convergence parameter, tolerance on the l1 residual
+    :param max_iter: (int) maximum number of iterations
+    :param kwargs: other arguments passed to get_pagerank (compact, solver, personalization...)
+    :return: (numpy.ndarray) vector of pagerank scores n
+    """
+    return get_pagerank(symmetrize(adj_mat), theta, epsilon, max_iter, **kwargs)
+
+
+def compare_solvers(adj_mat, solvers=None, theta=.85, epsilon=1e-08, max_iter=1000, **kwargs):
+    """
+    Benchmark of the time to tolerance of the pagerank solvers
+    :param adj_mat: (scipy.sparse.csc.csc_matrix) n x n
+    :param solvers: (list) solvers to compare (see get_pagerank), all if None
+    :param theta: (numeric) damping factor
+    :param epsilon: (numeric) tolerance on the l1 residual
+    :param max_iter: (int) maximum number of iterations
+    :param kwargs: other arguments passed to get_pagerank
+    :return: (list) one info dict per solver (see get_pagerank) with an additional "time" entry
+    """
+    results = []
+    for solver in solvers or sorted(SOLVERS):
+        start = time.perf_counter()
+        pr_vec, info = get_pagerank(adj_mat, theta, epsilon, max_iter, solver=solver, return_info=True,
+                                    **kwargs)
+        info["time"] = time.perf_counter() - start
+        results.append(info)
+    return results
+
+
+def push_pagerank(h_mat, seeds, theta=.85, epsilon=1e-04):
+
+    """
+    Returns an approximate personalized pagerank vector by local forward push:
+    residual mass is pushed from a node to its successors until every residual is below
+    epsilon times the node out-degree. The cost depends on epsilon and on the
+    neighbourhood of the seeds, not on the size of the graph.
+    As in get_pagerank, the mass of dangling nodes goes back to the personalization (the seeds).
+    :param h_mat: (scipy.sparse.csr.csr_matrix) n x n transition matrix (see get_hmat),
+    to be computed once and shared between queries
+    :param seeds: (list-like) indexes of the seed nodes (uniform personalization on them), not empty
+    :param theta: (numeric) damping factor
+    :param epsilon: (numeric) residual threshold
+    :return: (numpy.ndarray) indexes of the nodes reached, (numpy.ndarray) their scores,
+    (float) total residual mass left, an upper bound of the l1 error
+    """
+    indptr, indices, data = h_mat.indptr, h_mat.indices, h_mat.data
+    seeds = list(set(seeds))
+    if not seeds:
+        raise ValueError("results: seeds must not be empty.")
+    seed_mass = 1 / len(seeds)
+    pr_dict = {}
+    res_dict = dict.fromkeys(seeds, seed_mass)
+    queue = deque(seeds)
+    queued = set(seeds)
+    while queue:
+        u = queue.popleft()
+        queued.discard(u)
+        res_u = res_dict[u]
+        deg_u = indptr[u + 1] - indptr[u]
+        if res_u <= epsilon * max(deg_u, 1):
+            continue
+        res_dict[u] = 0
+        pr_dict[u] = pr_dict.get(u, 0) + (1 - theta) * res_u
+        if deg_u:
+            targets = indices[indptr[u]:indptr[u + 1]]
+            shares = (theta * res_u) * data[indptr[u]:indptr[u + 1]]
+        else:
+            targets = seeds
+            shares = [theta * res_u * seed_mass] * len(seeds)
+        for v, share in zip(targets, shares):
+            res_v = res_dict.get(v, 0) + share
+            res_dict[v] = res_v
+            if v not in queued and res_v > epsilon * max(indptr[v + 1] - indptr[v], 1):
+                queue.append(v)
+                queued.add(v)
+    nodes = np.fromiter(pr_dict.keys(), dtype=np.int64, count=len(pr_dict))
+    scores = np.fromiter(pr_dict.values(), dtype=np.float64, count=len(pr_dict))
+    return nodes, scores, sum(res_dict.values())
+
+
+def update_pagerank(adj_mat, pr_vec, new_edges, n_new=None, theta=.85, epsilon=1e-06, check=False):
+
+    """
+    Returns the pagerank scores after appending nodes and edges to the graph, computed
+    incrementally from the previous scores (uniform teleportation).
+    The scores are rescaled to y, the solution of (I - theta.H^T) y = (1-theta).1 (dangling rows
+    left empty), for which appending edges only changes the residual on the targets of the
+    nodes whose out-edges changed and on the new nodes. Only these residual changes are
+    pushed (see push_pagerank), until every residual is below epsilon times the node out-degree.
+    The previous scores are assumed to be converged.
+    :param adj_mat: (scipy.sparse.csr.csr_matrix) n_old x n_old previous adjacency matrix
+    :param pr_vec: (numpy.ndarray) n_old, previous pagerank scores
+    :param new_edges: (array-like) m x 2 appended edges (referring, referred_to), by node index,
+    new nodes are numbered from n_old on. Edges already in adj_mat and repeated edges are only
+    counted once (as when the matrix is rebuilt, see GraphCN.union_edges)
+    :param n_new: (int) number of nodes after the update, default is deduced from new_edges
+    :param theta: (numeric) damping factor
+    :param epsilon: (numeric) residual threshold (scores are scaled to average 1 per node)
+    :param check: (bool) also run a full recomputation and report the actual l1 error and times
+    :return: (scipy.sparse.csr.csr_matrix) n_new x n_new updated adjacency matrix,
+    (numpy.ndarray) n_new updated scores, (dict) info with the number of pushes, the residual
+    left and the resulting l1 error bound on the scores
+    """
+    start = time.perf_counter()
+    new_edges = np.asarray(new_edges, dtype=np.int64).reshape(-1, 2)
+    n_old = adj_mat.shape[0]
+    if n_new is None:
+        n_new = max(n_old, int(new_edges.max()) + 1 if len(new_edges) else 0)
+    adj_old = sparse.csr_matrix(adj_mat, dtype=np.float64)
+    adj_old.resize((n_new, n_new))
+    new_edges = np.unique(new_edges, axis=0)
+    if len(new_edges):
+        new_edges = new_edges[np.asarray(adj_old[new_edges[:, 0], new_edges[:, 1]]).ravel() == 0]
+    delta = sparse.csr_matrix((np.ones(len(new_edges)), (new_edges[:, 0], new_edges[:, 1])),
+                              shape=(n_new, n_new))
+    adj_new = (adj_old + delta).tocsr()
+
+    # previous scores rescaled to y
+    dang_old = get_dangvec(adj_mat)
+    scale = n_old / (1 + theta / (1 - theta) * pr_vec[dang_old].sum())
+    y_vec = np.zeros(n_new)
+    y_vec[:n_old] = scale * pr_vec
+
+    # residual changes: rows whose out-edges changed, and teleportation of the new nodes
+    changed = np.unique(new_edges[:, 0])
+    changed = changed[changed < n_old]
+    d_mat = get_hmat(adj_new[changed]) - get_hmat(adj_old[changed])
+    d_res = theta * d_mat.T.dot(y_vec[changed])
+    res_dict = {v: d_res[v] for v in np.flatnonzero(d_res)}
+    for v in range(n_old, n_new):
+        res_dict[v] = res_dict.get(v, 0) + 1 - theta
+
+    indptr, indices, data = adj_new.indptr, adj_new.indices, adj_new.data
+    queue = deque(res_dict)
+    queued = set(res_dict)
+    n_push = 0
+    while queue:
+        u = queue.popleft()
+        queued.discard(u)
+        res_u = res_dict[u]
+        deg_u = indptr[u + 1] - indptr[u]
+        if abs(res_u) <= epsilon * max(deg_u, 1):
+            continue
+        res_dict[u] = 0
+        y_vec[u] += res_u
+        n_push += 1
+        if not deg_u:
+            continue
+        weights = data[indptr[u]:indptr[u + 1]]
+        shares = (theta * res_u / weights.sum()) * weights
+        for v, share in zip(indices[indptr[u]:indptr[u + 1]], shares):
+            res_v = res_dict.get(v, 0) + share
+            res_dict[v] = res_v
+            if v not in queued and abs(res_v) > epsilon * max(indptr[v + 1] - indptr[v], 1):
+                queue.append(v)
+                queued.add(v)
+
+    y_sum = y_vec.sum()
+    residual = sum(abs(res) for res in res_dict.values())
+    info = {"pushes": n_push,
+            "touched": len(res_dict),
+            "residual": residual,
+            "error_bound": 2 * residual / ((1 - theta) * y_sum),
+            "time": time.perf_counter() - start}
+    pr_new = y_vec / y_sum
+    if check:
+        start = time.perf_counter()
+        pr_full = get_pagerank(adj_new, theta, epsilon=1e-10, max_iter=1000, solver="bicgstab")
+        info["recompute_time"] = time.perf_counter() - start
+        info["recompute_error"] = Utils.vec_norm(pr_new - pr_full, ord=1)
+    return adj_new, pr_new, info
@@ -0,0 +1,245 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides a pipeline runner for the scripts of the project
+
+Each stage is a script with declared input and output tables (see STAGES). A stage is run when
+one of its outputs is missing or was modified, or when its script or the content of one of its
+inputs changed since its last successful run. The fingerprints (content hashes) are kept in
+Tables/pipeline.json. A stage whose outputs are rewritten identically does not make the
+following ones stale. Stages that do not depend on each other (the co-authorship and the
+citation graphs) run in parallel.
+
+The scraping stage reads the web, which cannot be fingerprinted: it only runs when one of its
+outputs is missing or when it is forced.
+
+# Example
+run_pipeline(os.getcwd())                       # everything that is stale
+run_pipeline(os.getcwd(), targets=["hits"])     # only what hits needs
+run_pipeline(os.getcwd(), force=["disamb"])     # disamb (and what follows if its outputs change)
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from CitNet import Metrics
+
+# Stages of the pipeline: script run from the project root, inputs and outputs in Tables
+STAGES = [{"name": "scrap", "script": "DbScrap.py", "inputs": [],
+           "outputs": ["attrs.csv", "cits.csv", "refs.csv"], "external": True},
+          {"name": "disamb", "script": "DisambAuth.py", "inputs": ["attrs.csv"],
+           "outputs": ["authors.csv", "attrs_nos.csv"]},
+          {"name": "authors_graph", "script": "AuthorsGraph.py", "inputs": ["attrs_nos.csv"],
+           "outputs": ["AdjMat_Auth.npz", "AuthorsPR.csv"]},
+          {"name": "refs_cits_graph", "script": "RefsCitsGraph.py", "inputs": ["attrs_nos.csv", "cits.csv", "refs.csv"],
+           "outputs": ["cits_edges.csv", "refs_edges.csv", "AdjMat_CitsRefs.npz"]},
+          {"name": "sim_index", "script": "SimIndex.py", "inputs": ["AdjMat_CitsRefs.npz"],
+           "outputs": ["SimIndex_cocitation.npz", "SimIndex_coupling.npz"]},
+          {"name": "hits", "script": "HITS.py", "inputs": ["attrs_nos.csv", "cits_edges.csv", "refs_edges.csv"],
+           "outputs": ["InvIndex.npz"]}]
+# Fingerprints file, in Tables
+STATE_FILE = "pipeline.json"
+
+
+def file_hash(file, known=None):
+    """
+    Content hash of a file. The hash of a previous call is reused when the size and
+    modification time of the file did not change.
+
+    :param file: (str) path of the file
+    :param known: (list) [size, mtime_ns, hash] of a previous call, or None
+    :return: (list) [size, mtime_ns, hash]
+    """
+    stat = os.stat(file)
+    if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return known
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b""):
+            digest.update(chunk)
+    return [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+
+
+def load_state(path):
+    """
+    Fingerprints of the previous runs ({"files": {file: [size, mtime_ns, hash]}, "stages": {name: record}})
+
+    :param path: (str) path to the Tables
+    """
+    file = os.path.join(path, STATE_FILE)
+    if not os.path.exists(file):
+        return {"files": {}, "stages": {}}
+    with open(file) as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    """
+    Save the fingerprints (written to a temporary file first, so that an interrupted run
+    does not corrupt them)
+    """
+    file = os.path.join(path, STATE_FILE)
+    with open(file + ".tmp", "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(file + ".tmp", file)
+
+
+def get_dependencies(stages):
+    """
+    Stages producing the inputs of each stage
+
+    :param stages: (list) the stages (see STAGES)
+    :return: (dict) {name: set of names of the stages it depends on}
+    """
+    producers = {output: stage["name"] for stage in stages for output in stage["outputs"]}
+    return {stage["name"]: {producers[file] for file in stage["inputs"] if file in producers}
+            for stage in stages}
+
+
+def select_stages(stages, targets):
+    """
+    The targets and the stages they depend on (all the stages if targets is None)
+    """
+    if not targets:
+        return list(stages)
+    valid = {stage["name"] for stage in stages}
+    if not set(targets) <= valid:
+        raise ValueError("results: targets must be in %r." % valid)
+    deps = get_dependencies(stages)
+    needed = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in needed:
+            needed.add(name)
+            todo.extend(deps[name])
+    return [stage for stage in stages if stage["name"] in needed]
+
+
+def fingerprint(stage, root, path, state):
+    """
+    Current fingerprint of a stage: hashes of its script, inputs and outputs (None if missing)
+
+    :return: (dict) {"script": hash, "inputs": {file: hash}, "outputs": {file: hash}}
+    """
+    def hash_of(file):
+        if not os.path.exists(file):
+            return None
+        state["files"][file] = file_hash(file, state["files"].get(file))
+        return state["files"][file][2]
+    return {"script": hash_of(os.path.join(root, stage["script"])),
+            "inputs": {name: hash_of(os.path.join(path, name)) for name in stage["inputs"]},
+            "outputs": {name: hash_of(os.path.join(path, name)) for name in stage["outputs"]}}
+
+
+def stale_reason(stage, current, previous):
+    """
+    Why a stage must be run, None if it is up to date
+
+    :param stage: (dict) the stage
+    :param current: (dict) its current fingerprint (see fingerprint)
+    :param previous: (dict) its fingerprint after the last successful run, or None
+    :return: (str) the reason or None
+    """
+    missing = [name for name, value in current["outputs"].items() if value is None]
+    if missing:
+        return "missing outputs " + ", ".join(missing)
+    if stage.get("external"):
+        return None
+    if previous is None:
+        return "never run"
+    if current["script"] != previous["script"]:
+        return "script changed"
+    changed = [name for name, value in current["inputs"].items() if value != previous["inputs"].get(name)]
+    if changed:
+        return "inputs changed " + ", ".join(changed)
+    modified = [name for name, value in current["outputs"].items() if value != previous["outputs"].get(name)]
+    if modified:
+        return "outputs modified " + ", ".join(modified)
+    return None
+
+
+def run_script(stage, root, path):
+    """
+    Run the script of a stage from the project root (output in Tables/logs/<stage>.log)
+
+    :return: (int) return code, (float) time in seconds
+    """
+    os.makedirs(os.path.join(path, "logs"), exist_ok=True)
+    env = dict(os.environ, MPLBACKEND="Agg")
+    start = time.perf_counter()
+    with open(os.path.join(path, "logs", stage["name"] + ".log"), "w") as log:
+        code = subprocess.call([sys.executable, stage["script"]], cwd=root, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    return code, time.perf_counter() - start
+
+
+def run_pipeline(root, stages=STAGES, targets=None, force=(), workers=2, dry_run=False):
+    """
+    Run the stale stages of the pipeline, independent stages in parallel
+
+    :param root: (str) project root (where the scripts are)
+    :param stages: (list) the stages (see STAGES)
+    :param targets: (list) names of the stages to bring up to date (with what they depend on), all if None
+    :param force: (list) names of stages to run even if up to date
+    :param workers: (int) number of stages run at the same time
+    :param dry_run: (bool) only report what would be run (a stale stage makes the following ones stale)
+    :return: (list) one record per stage {"stage", "status" (fresh, ran, failed, blocked, stale), "reason", "time"}
+    """
+    path = os.path.join(root, "Tables")
+    stages = select_stages(stages, targets)
+    deps = get_dependencies(stages)
+    state = load_state(path)
+    by_name = {stage["name"]: stage for stage in stages}
+    pending = dict(by_name)
+    status = dict()
+    results = []
+    running = dict()
+
+    def finish(name, stage_status, reason, elapsed=0.):
+        status[name] = stage_status
+        results.append({"stage": name, "status": stage_status, "reason": reason, "time": elapsed})
+        Metrics.emit("pipeline", stage=name, status=stage_status, reason=reason, time=elapsed)
+        print("{0}: {1}{2}".format(name, stage_status, " (" + reason + ")" if reason else ""))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if not deps[name] <= set(status):
+                    continue
+                del pending[name]
+                if any(status[dep] in ("failed", "blocked") for dep in deps[name]):
+                    finish(name, "blocked", "a dependency failed")
+                    continue
+                current = fingerprint(stage, root, path, state)
+                reason = "forced" if name in force else stale_reason(stage, current,
+                                                                      state["stages"].get(name))
+                if reason is None and dry_run and any(status[dep] == "stale" for dep in deps[name]):
+                    reason = "dependency stale"
+                if reason is None:
+                    finish(name, "fresh", None)
+                elif dry_run:
+                    finish(name, "stale", reason)
+                else:
+                    print("{0}: running ({1})".format(name, reason))
+                    running[executor.submit(run_script, stage, root, path)] = (name, reason)
+            if not running:
+                continue
+            done = wait(list(running), return_when=FIRST_COMPLETED)[0]
+            for future in done:
+                name, reason = running.pop(future)
+                code, elapsed = future.result()
+                if code == 0:
+                    state["stages"][name] = fingerprint(by_name[name], root, path, state)
+                    save_state(path, state)
+                    finish(name, "ran", reason, elapsed)
+                else:
+                    state["stages"].pop(name, None)
+                    save_state(path, state)
+                    finish(name, "failed", "exit code {0}, see logs/{1}.log".format(code, name), elapsed)
+    save_state(path, state)
+    return results
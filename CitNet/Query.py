@@ -4,6 +4,9 @@
 """This module provides tools for querying our database"""
 
 import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+from CitNet import InvIndex, PageRank
 
 
 def topic_query(df, query_list, search_in=("title", "keywords")):
@@ -67,7 +70,7 @@ def indexlist_union(indexlist):
     return inter
 
 
-def topic_subgraph_root(df, query_list, search_in=("title", "keywords"), how="union"):
+def topic_subgraph_root(df, query_list, search_in=("title", "keywords"), how="union", index=None):
     """
     Root nodes for building a subgraph relevant to a topic based query
 
@@ -75,9 +78,13 @@ def topic_subgraph_root(df, query_list, search_in=("title", "keywords"), how="un
     :param query_list: (list) list of keywords
     :param search_in: (tuple) The columns to include for the query
     :param how: (str) How to join the indexes in the list ?
+    :param index: (dict) inverted index (see InvIndex.build_index), if given the query is
+    answered with posting lists merges (token matching) instead of a scan of df (substring matching)
 
     :return: the index of the nodes (pandas.indexes.range.RangeIndex)
     """
+    if index is not None:
+        return pd.Index(InvIndex.index_query(index, query_list, search_in, how))
     inds = topic_query(df, query_list, search_in)
     if how == "inter":
         return indexlist_inter(inds)
@@ -102,7 +109,7 @@ def similarity_subgraph_root(nodes_list, graph):
     return list(set(root_nodes))
 
 
-def expand_root(root_nodes, graph, d):
+def expand_root(root_nodes, graph, d, seed=None):
     """
     Expand root nodes by including their successors and some of their predecessors
     (d to be exact)
@@ -110,9 +117,11 @@ def expand_root(root_nodes, graph, d):
     :param root_nodes: (list-like) the roots nodes
     :param graph: (networkx.classes.digraph.DiGraph) the graph
     :param d: how many predecessors to include at most ?
+    :param seed: (int) seed of the predecessors sampling, global numpy random state if None
 
     :return: the expanded nodes list (list).
     """
+    rand = np.random if seed is None else np.random.RandomState(seed)
     nodes = []
     all_nodes = set(graph.nodes())
     root_nodes = set(root_nodes).intersection(all_nodes)
@@ -120,7 +129,7 @@ def expand_root(root_nodes, graph, d):
         successors = list(graph.successors(node))
         predecessors = list(graph.predecessors(node))
         if len(predecessors) >= d:
-            np.random.shuffle(predecessors)
+            rand.shuffle(predecessors)
             new_nodes = set(successors + predecessors[0: d])
         else:
             new_nodes = set(successors + predecessors)
@@ -128,7 +137,8 @@ def expand_root(root_nodes, graph, d):
     return nodes
 
 
-def topic_query_subgraph(graph, d, df, query_list, search_in=("title", "keywords"), how="union"):
+def topic_query_subgraph(graph, d, df, query_list, search_in=("title", "keywords"), how="union", index=None,
+                         seed=None):
     """
     Find expanded subgraph for a topic query
 
@@ -138,24 +148,167 @@ def topic_query_subgraph(graph, d, df, query_list, search_in=("title", "keywords
     :param query_list: (list) List of keywords
     :param search_in: (tuple) The columns to include for the query
     :param how: (str) How to join the indexes in the list ?
+    :param index: (dict) inverted index (see InvIndex.build_index)
+    :param seed: (int) seed of the predecessors sampling (see expand_root)
 
     :return: (networkx.classes.digraph.DiGraph) the expanded subgraph for the query
     """
-    root_nodes = topic_subgraph_root(df, query_list, search_in, how)
-    expanded = expand_root(root_nodes, graph, d)
+    root_nodes = topic_subgraph_root(df, query_list, search_in, how, index)
+    expanded = expand_root(root_nodes, graph, d, seed)
     return graph.subgraph(expanded)
 
 
-def similarity_query_subgraph(nodes_list, graph, d):
+def similarity_query_subgraph(nodes_list, graph, d, seed=None):
     """
     Find expanded subgraph for a similarity query
 
     :param graph: (networkx.classes.digraph.DiGraph) the graph
     :param d: how many predecessors to include at most ?
     :param nodes_list: the list of articles of our similar to request
+    :param seed: (int) seed of the predecessors sampling (see expand_root)
 
     :return: (networkx.classes.digraph.DiGraph) the expanded subgraph for the similarity query
     """
     root_nodes = similarity_subgraph_root(nodes_list, graph)
-    expanded = expand_root(root_nodes, graph, d)
+    expanded = expand_root(root_nodes, graph, d, seed)
     return graph.subgraph(expanded)
+
+
+def get_similarity_hmat(adj_mat):
+    """
+    Transition matrix used by similarity_push_query: citations are followed in both
+    directions (references and citing articles), as in similarity_subgraph_root.
+    To be computed once for the whole graph.
+
+    :param adj_mat: (scipy.sparse.csr.csr_matrix) n x n adjacency matrix of the citation graph
+
+    :return: (scipy.sparse.csr.csr_matrix) n x n transition matrix
+    """
+    return PageRank.get_hmat(adj_mat + adj_mat.T)
+
+
+def similarity_push_query(nodes_list, h_mat, k=10, theta=.85, epsilon=1e-04, nodelist=None):
+    """
+    Top k articles related to a set of seed articles, ranked by an approximate personalized
+    PageRank computed by local push (see PageRank.push_pagerank)
+
+    :param nodes_list: the list of articles of our similar to request
+    :param h_mat: (scipy.sparse.csr.csr_matrix) n x n transition matrix (see get_similarity_hmat)
+    :param k: (int) number of articles to return
+    :param theta: (numeric) damping factor
+    :param epsilon: (numeric) residual threshold, the smaller the more accurate (and slower)
+    :param nodelist: (list-like) nodes ordering of h_mat, if None nodes are the matrix indexes
+
+    :return: (numpy.ndarray) the k most related articles, (numpy.ndarray) their scores, both empty
+    when none of the articles is in the graph
+    """
+    if nodelist is not None:
+        nodelist = np.asarray(nodelist)
+        position = dict(zip(nodelist, range(len(nodelist))))
+        seeds = [position[node] for node in nodes_list if node in position]
+    else:
+        seeds = [node for node in nodes_list if 0 <= node < h_mat.shape[0]]
+    if not seeds:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    nodes, scores, residual = PageRank.push_pagerank(h_mat, seeds, theta, epsilon)
+    not_seed = ~np.isin(nodes, seeds)
+    nodes, scores = nodes[not_seed], scores[not_seed]
+    top = np.argsort(-scores)[:k]
+    if nodelist is not None:
+        return nodelist[nodes[top]], scores[top]
+    return nodes[top], scores[top]
+
+
+def gather_neighbours(indptr, indices, nodes):
+    """
+    Concatenated neighbours of nodes in a CSR (successors) or CSC (predecessors) structure
+
+    :param indptr: (numpy.ndarray) index pointer array of the matrix
+    :param indices: (numpy.ndarray) indices array of the matrix
+    :param nodes: (numpy.ndarray) the nodes
+
+    :return: (numpy.ndarray) the neighbours, (numpy.ndarray) the node each neighbour comes from
+    """
+    counts = indptr[nodes + 1] - indptr[nodes]
+    ends = np.cumsum(counts)
+    positions = np.arange(ends[-1] if len(ends) else 0) + np.repeat(indptr[nodes] - ends + counts, counts)
+    return indices[positions], np.repeat(nodes, counts)
+
+
+def expand_root_sparse(root_nodes, adj_mat, d, seed=None, adj_csc=None):
+    """
+    Expand root nodes by including their successors and some of their predecessors
+    (d to be exact), vectorized version of expand_root on the adjacency matrix, whose indexes
+    are the nodes. The sampling of the predecessors only depends on seed.
+
+    :param root_nodes: (list-like) the roots nodes
+    :param adj_mat: (scipy.sparse.csr.csr_matrix) n x n adjacency matrix of the graph
+    :param d: how many predecessors to include at most ?
+    :param seed: (int) seed of the predecessors sampling
+    :param adj_csc: (scipy.sparse.csc.csc_matrix) adj_mat in CSC format, to be computed once
+    and shared between queries (computed if None)
+
+    :return: (numpy.ndarray) the sorted expanded nodes, (scipy.sparse.csr.csr_matrix) the adjacency
+    matrix of the subgraph induced by these nodes
+    """
+    adj_mat = sparse.csr_matrix(adj_mat)
+    if adj_csc is None:
+        adj_csc = adj_mat.tocsc()
+    n = adj_mat.shape[0]
+    root_nodes = np.unique(np.asarray(root_nodes, dtype=np.int64))
+    root_nodes = root_nodes[(root_nodes >= 0) & (root_nodes < n)]
+    successors, _ = gather_neighbours(adj_mat.indptr, adj_mat.indices, root_nodes)
+    predecessors, owners = gather_neighbours(adj_csc.indptr, adj_csc.indices, root_nodes)
+    # random order of the predecessors within each root, keep the d first ones
+    rand = np.random.default_rng(seed)
+    order = np.lexsort((rand.random(len(predecessors)), owners))
+    owners = owners[order]
+    group_start = np.searchsorted(owners, owners)
+    predecessors = predecessors[order][np.arange(len(owners)) - group_start < d]
+    nodes = np.unique(np.concatenate((successors, predecessors)))
+    return nodes, adj_mat[nodes][:, nodes]
+
+
+def topic_query_submatrix(adj_mat, d, df, query_list, search_in=("title", "keywords"), how="union",
+                          index=None, seed=None, adj_csc=None):
+    """
+    Find expanded subgraph for a topic query, as an adjacency matrix (see expand_root_sparse)
+
+    :param adj_mat: (scipy.sparse.csr.csr_matrix) n x n adjacency matrix of the graph
+    :param d: how many predecessors to include at most ?
+    :param df: (pandas.core.frame.DataFrame) Dataframe on which to perform the query
+    :param query_list: (list) List of keywords
+    :param search_in: (tuple) The columns to include for the query
+    :param how: (str) How to join the indexes in the list ?
+    :param index: (dict) inverted index (see InvIndex.build_index)
+    :param seed: (int) seed of the predecessors sampling
+    :param adj_csc: (scipy.sparse.csc.csc_matrix) adj_mat in CSC format
+
+    :return: (numpy.ndarray) the expanded nodes, (scipy.sparse.csr.csr_matrix) their adjacency matrix
+    """
+    root_nodes = topic_subgraph_root(df, query_list, search_in, how, index)
+    return expand_root_sparse(root_nodes, adj_mat, d, seed, adj_csc)
+
+
+def similarity_query_submatrix(nodes_list, adj_mat, d, seed=None, adj_csc=None):
+    """
+    Find expanded subgraph for a similarity query, as an adjacency matrix (see expand_root_sparse)
+
+    :param nodes_list: the list of articles of our similar to request
+    :param adj_mat: (scipy.sparse.csr.csr_matrix) n x n adjacency matrix of the graph
+    :param d: how many predecessors to include at most ?
+    :param seed: (int) seed of the predecessors sampling
+    :param adj_csc: (scipy.sparse.csc.csc_matrix) adj_mat in CSC format
+
+    :return: (numpy.ndarray) the expanded nodes, (scipy.sparse.csr.csr_matrix) their adjacency matrix,
+    the articles out of the graph are ignored
+    """
+    adj_mat = sparse.csr_matrix(adj_mat)
+    if adj_csc is None:
+        adj_csc = adj_mat.tocsc()
+    nodes = np.unique(np.asarray(nodes_list, dtype=np.int64))
+    nodes = nodes[(nodes >= 0) & (nodes < adj_mat.shape[0])]
+    successors, _ = gather_neighbours(adj_mat.indptr, adj_mat.indices, nodes)
+    predecessors, _ = gather_neighbours(adj_csc.indptr, adj_csc.indices, nodes)
+    root_nodes = np.unique(np.concatenate((successors, predecessors)))
+    return expand_root_sparse(root_nodes, adj_mat, d, seed, adj_csc)
@@ -1,68 +1,311 @@
 #!python
 # -*-coding:utf-8 -*
 
-"""This module provides tools to scrap articles from Ideas Repec"""
+"""This module provides tools to scrap articles from Ideas Repec
 
-from urllib.request import urlopen
+Pages are fetched by fetch(): requests to a host are spaced by a token bucket, failures
+(429, 5xx, timeouts, connection errors) are retried with jittered exponential backoff (waiting
+at least the Retry-After of the server, a url asked to wait too long is given up), and
+when a PageStore is configured the validators (ETag, Last-Modified) and the body of each page
+are kept, so that re-crawling sends conditional requests and an unchanged page costs a 304.
+
+# Example
+configure(store_dir="Tables/pages", rate=2., retries=5)
+get_attrs("aea/aecrev/v105y2015i1p1-33.html")    # 200, validators stored
+get_attrs("aea/aecrev/v105y2015i1p1-33.html")    # 304, parsed from the stored body
+"""
+
+import email.utils
+import hashlib
+import http.client
+import os
+import pickle
+import random
+import socket
+import threading
+import time
+import zlib
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
 from bs4 import BeautifulSoup
-from urllib.error import HTTPError
+from urllib.error import HTTPError, URLError
 
 import pandas as pd
 import numpy as np
 
 from progressbar import ProgressBar
+from CitNet import Metrics
 
+# Fetching parameters (see configure)
+CONFIG = {"store": None, "rate": 2., "burst": 5, "retries": 5, "backoff": 1., "max_backoff": 60.,
+          "max_retry_after": 600., "timeout": 30.}
+# Statuses worth retrying (rate limited, server errors)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# One token bucket per host
+BUCKETS = dict()
+BUCKETS_LOCK = threading.Lock()
 
-def get_refs(eja, root="https://ideas.repec.org/a/"):
+
+class TokenBucket(object):
     """
-    This function returns the references from the 
-    specified article (format eja: editor/journal/article)
-    
-    :param eja:  format editor/journal/article
-    :param root: default "https://ideas.repec.org/a/"
-    :return: [[id_art, id_ref]...] (np.array)
+    Token bucket limiting the rate of requests (thread safe)
+
+    :param rate: (float) tokens added per second (sustained requests per second)
+    :param burst: (int) capacity of the bucket (requests that can be made at once)
     """
-    
-    url = root + eja
+
+    def __init__(self, rate=2., burst=5):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, waiting until one is available. Returns the time waited (seconds)
+        """
+        waited = 0.
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+                time.sleep(wait)
+                waited += wait
+
+
+class PageStore(object):
+    """
+    On-disk store of the fetched pages: validators (ETag, Last-Modified) and compressed body,
+    one file per url
+
+    :param store_dir: (str) directory of the store
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+    def path(self, url):
+        """
+        Path of the file of a page
+        """
+        return os.path.join(self.store_dir, hashlib.sha1(url.encode()).hexdigest() + ".pkl")
+
+    def get(self, url):
+        """
+        Returns {"url", "etag", "last_modified", "body"} stored for url, None if missing
+        """
+        if not os.path.exists(self.path(url)):
+            return None
+        with open(self.path(url), "rb") as file:
+            entry = pickle.load(file)
+        entry["body"] = zlib.decompress(entry["body"])
+        return entry
+
+    def put(self, url, etag, last_modified, body):
+        """
+        Store the validators and the body of a page (written to a temporary file first)
+        """
+        entry = {"url": url, "etag": etag, "last_modified": last_modified, "body": zlib.compress(body)}
+        with open(self.path(url) + ".tmp", "wb") as file:
+            pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.path(url) + ".tmp", self.path(url))
+
+
+def configure(store_dir=None, **params):
+    """
+    Set the fetching parameters
+
+    :param store_dir: (str) directory of the PageStore, no conditional requests if None
+    :param params: "rate" (requests per second per host), "burst", "retries", "backoff" (first
+    delay in seconds), "max_backoff", "max_retry_after" (longest Retry-After waited for, in seconds),
+    "timeout" (seconds)
+    """
+    valid = set(CONFIG) - {"store"}
+    if not set(params) <= valid:
+        raise ValueError("results: params must be in %r." % valid)
+    CONFIG.update(params)
+    CONFIG["store"] = PageStore(store_dir) if store_dir is not None else None
+    with BUCKETS_LOCK:
+        BUCKETS.clear()
+
+
+def get_bucket(host):
+    """
+    Token bucket of a host
+    """
+    with BUCKETS_LOCK:
+        if host not in BUCKETS:
+            BUCKETS[host] = TokenBucket(CONFIG["rate"], CONFIG["burst"])
+        return BUCKETS[host]
+
+
+def retry_after_seconds(retry_after):
+    """
+    Delay asked by a Retry-After header, given in seconds or as an HTTP date
+
+    :param retry_after: (str) Retry-After header of the response, if any
+    :return: (float) delay in seconds (0 for a date in the past), None if missing or invalid
+    """
+    if retry_after is None:
+        return None
     try:
-        html = urlopen(url)
-    except HTTPError:
+        return max(0., float(retry_after))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError, IndexError):
         return None
-    
-    bsObj = BeautifulSoup(html, "lxml")
+    if date.tzinfo is None:
+        return None
+    return max(0., date.timestamp() - time.time())
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Delay before a retry: full jitter exponential backoff, uniform in
+    [0, min(max_backoff, backoff * 2 ** attempt)], at least the full Retry-After of the server
+
+    :param attempt: (int) number of the failed attempt (0 for the first)
+    :param retry_after: (str) Retry-After header of the response, if any
+    :return: (float) delay in seconds
+    """
+    delay = random.uniform(0, min(CONFIG["max_backoff"], CONFIG["backoff"] * 2 ** attempt))
+    asked = retry_after_seconds(retry_after)
+    return delay if asked is None else max(delay, asked)
+
+
+def fetch(url, store=None):
+    """
+    Body of a page. With a store, the request is conditional on the stored validators and a 304
+    returns the stored body. 429, 5xx, timeouts and connection errors are retried (see
+    backoff_delay), other HTTP errors (404...) are not, nor are the urls whose Retry-After
+    exceeds CONFIG["max_retry_after"] (to be crawled again later).
+
+    :param url: (str) url of the page
+    :param store: (PageStore) store of the validators, CONFIG["store"] if None
+    :return: (bytes) body of the page, None if it could not be fetched
+    """
+    return fetch_status(url, store)[0]
+
+
+def fetch_status(url, store=None):
+    """
+    Same as fetch, also telling whether the page was downloaded or reused from the store
+
+    :param url: (str) url of the page
+    :param store: (PageStore) store of the validators, CONFIG["store"] if None
+    :return: (bytes) body of the page, None if it could not be fetched,
+    (int) 200 if downloaded, 304 if not modified, None if it could not be fetched
+    """
+    store = store if store is not None else CONFIG["store"]
+    stored = store.get(url) if store is not None else None
+    headers = dict()
+    if stored is not None and stored["etag"]:
+        headers["If-None-Match"] = stored["etag"]
+    if stored is not None and stored["last_modified"]:
+        headers["If-Modified-Since"] = stored["last_modified"]
+    bucket = get_bucket(urlparse(url).netloc)
+    for attempt in range(CONFIG["retries"] + 1):
+        bucket.acquire()
+        retry_after = None
+        try:
+            with urlopen(Request(url, headers=headers), timeout=CONFIG["timeout"]) as response:
+                body = response.read()
+                etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+            Metrics.count("pages_fetched")
+            if store is not None and (etag or last_modified):
+                store.put(url, etag, last_modified, body)
+            return body, 200
+        except HTTPError as error:
+            if error.code == 304 and stored is not None:
+                Metrics.count("pages_not_modified")
+                return stored["body"], 304
+            if error.code not in RETRY_STATUS:
+                break
+            retry_after = error.headers.get("Retry-After") if error.headers is not None else None
+            if (retry_after_seconds(retry_after) or 0.) > CONFIG["max_retry_after"]:
+                Metrics.count("pages_deferred")
+                break
+        except (URLError, socket.timeout, ConnectionError, http.client.HTTPException):
+            pass
+        if attempt < CONFIG["retries"]:
+            Metrics.count("pages_retried")
+            time.sleep(backoff_delay(attempt, retry_after))
+    Metrics.count("pages_failed")
+    return None, None
+
+
+def get_page(eja, root="https://ideas.repec.org/a/", store=None):
+    """
+    Parsed page of an article (format eja: editor/journal/article)
+
+    :param eja: format editor/journal/article
+    :param root: default "https://ideas.repec.org/a/"
+    :param store: (PageStore) store of the validators (see fetch)
+    :return: (bs4.BeautifulSoup) the page, None if it could not be fetched
+    """
+    html = fetch(root + eja, store)
+    if html is None:
+        return None
+    return BeautifulSoup(html, "lxml")
+
+
+def parse_tab(bsObj, eja, tab):
+    """
+    Links listed in a tab of an article page ("refs-tab" or "cites-tab")
+
+    :param bsObj: (bs4.BeautifulSoup) the page
+    :param eja: format editor/journal/article
+    :param tab: (str) "refs-tab" or "cites-tab"
+    :return: [[eja, eja_link]...] (np.array), None if the page has no such tab
+    """
     try:
-        ref = bsObj.find("div", {"aria-labelledby": "refs-tab"}).find("input").attrs["value"].split("#")
+        ref = bsObj.find("div", {"aria-labelledby": tab}).find("input").attrs["value"].split("#")
     except AttributeError:
         return None
-    
     ref = pd.Series(ref).apply(lambda x: [eja, x.split(":")[1] + "/" +
                                           x.split(":")[2] + "/" + ''.join(x.split(":")[3:]) + ".html"]).values
     return ref
 
 
-def get_cits(eja, root="https://ideas.repec.org/a/"):
+def get_refs(eja, root="https://ideas.repec.org/a/", store=None):
+    """
+    This function returns the references from the 
+    specified article (format eja: editor/journal/article)
+    
+    :param eja:  format editor/journal/article
+    :param root: default "https://ideas.repec.org/a/"
+    :param store: (PageStore) store of the validators (see fetch)
+    :return: [[id_art, id_ref]...] (np.array)
+    """
+    bsObj = get_page(eja, root, store)
+    if bsObj is None:
+        return None
+    return parse_tab(bsObj, eja, "refs-tab")
+
+
+def get_cits(eja, root="https://ideas.repec.org/a/", store=None):
     """
     This function returns the citations pointing to the 
     specified article (format eja: editor/journal/article)
 
     :param eja:  format editor/journal/article
     :param root: default "https://ideas.repec.org/a/"
+    :param store: (PageStore) store of the validators (see fetch)
     :return: [[id_art, id_cit]...] (np.array)
     """
-    url = root + eja
-    try:
-        html = urlopen(url)
-    except HTTPError:
-        return None
-    
-    bsObj = BeautifulSoup(html, "lxml")
-    try:
-        ref = bsObj.find("div", {"aria-labelledby": "cites-tab"}).find("input").attrs["value"].split("#")
-    except AttributeError:
+    bsObj = get_page(eja, root, store)
+    if bsObj is None:
         return None
-    ref = pd.Series(ref).apply(lambda x: [eja, x.split(":")[1] + "/" + x.split(":")[2] + "/" +
-                                          ''.join(x.split(":")[3:]) + ".html"]).values
-    return ref
+    return parse_tab(bsObj, eja, "cites-tab")
 
 
 def get_stack(itr_list, meth):
@@ -84,44 +327,35 @@ def get_stack(itr_list, meth):
     if meth not in valid:
         raise ValueError("results: meth must be one of %r." % valid)
         
-    if meth == "cit":
-        cits = np.empty(1)
-        pbar = ProgressBar()
-        for eja in pbar(itr_list):
-            if get_cits(eja) is not None:
-                    cits = np.concatenate((cits, get_cits(eja)), axis=0)
-        return cits[1:]
-    
-    if meth == "ref":
-        refs = np.empty(1)
-        pbar = ProgressBar()
-        for eja in pbar(itr_list):
-            if get_refs(eja) is not None:
-                    try:
-                        refs_copy = np.copy(refs)
-                        refs = np.concatenate((refs, get_refs(eja)), axis=0)
-                    except ValueError:
-                        refs = refs_copy
-        return refs[1:]
+    # one request per article (the result is kept instead of fetching the page twice)
+    get_links = get_cits if meth == "cit" else get_refs
+    stack = np.empty(1)
+    pbar = ProgressBar()
+    for eja in pbar(itr_list):
+        links = get_links(eja)
+        if links is not None:
+            try:
+                stack = np.concatenate((stack, links), axis=0)
+            except ValueError:
+                pass
+    return stack[1:]
 
 
-def get_attrs(eja, root="https://ideas.repec.org/a/"):
+def get_attrs(eja, root="https://ideas.repec.org/a/", store=None):
     """
     This function returns the attributes of interest from the 
     specified article (format editor/journal/article). 
     
     :param eja: format editor/journal/article
     :param root: default "https://ideas.repec.org/a/"
+    :param store: (PageStore) store of the validators (see fetch)
     :return: url, title, authors, date, jel_code, keywords
     """
 
     url = root + eja
-    try:
-        html = urlopen(url)
-    except HTTPError:  # as e?
+    bsObj = get_page(eja, root, store)
+    if bsObj is None:
         return None
-    
-    bsObj = BeautifulSoup(html, "lxml")
     try:
         title = bsObj.find("meta", {"name": "citation_title"}).attrs["content"]
     except AttributeError:
@@ -143,4 +377,117 @@ def get_attrs(eja, root="https://ideas.repec.org/a/"):
     except AttributeError:
         keywords = np.nan
     
-    return url, title, authors, date, jel_code, keywords    
\ No newline at end of file
+    return url, title, authors, date, jel_code, keywords    
+
+def get_listing(edj, root="https://ideas.repec.org/a/", store=None):
+    """
+    Articles listed on the page of a journal (format edj: editor/journal)
+
+    :param edj: format editor/journal
+    :param root: default "https://ideas.repec.org/a/"
+    :param store: (PageStore) store of the validators (see fetch), an unchanged listing costs a 304
+    :return: ["ed/journ/art.html", ...] (list), None if the page could not be fetched
+    """
+    edj = edj.strip("/") + "/"
+    html = fetch(root + edj, store)
+    if html is None:
+        return None
+    bsObj = BeautifulSoup(html, "lxml")
+    return [edj + art.attrs["href"] for art in bsObj.findAll("a", href=True) if ".html" in art.attrs["href"]]
+
+
+def discover_articles(journals, known, root="https://ideas.repec.org/a/", store=None):
+    """
+    Articles of the selected journals that are not in the registry: only the listing pages of
+    these journals are walked (instead of all the editors and journals of IDEAS). The pages of
+    the known articles are not looked at, see recheck_articles for their updates
+
+    :param journals: (array-like) ["ed/journ", ...] journals to walk (see DbScrap.get_rankj)
+    :param known: (array-like) eja registry, articles already parsed ("ed/journ/art.html")
+    :param root: default "https://ideas.repec.org/a/"
+    :param store: (PageStore) store of the validators (see fetch)
+    :return: (np.array) new eja, in listing order, (dict) numbers of journals walked and failed,
+    articles listed and new articles
+    """
+    known = set(known)
+    new_eja = []
+    stats = {"journals": len(journals), "failed": 0, "listed": 0, "new": 0}
+    pbar = ProgressBar()
+    for edj in pbar(journals):
+        listing = get_listing(edj, root, store)
+        if listing is None:
+            stats["failed"] += 1
+            continue
+        stats["listed"] += len(listing)
+        for eja in listing:
+            if eja not in known:
+                known.add(eja)
+                new_eja.append(eja)
+    stats["new"] = len(new_eja)
+    Metrics.count("articles_discovered", len(new_eja))
+    return np.array(new_eja, dtype=object), stats
+
+
+def recheck_articles(journals, known, root="https://ideas.repec.org/a/", store=None):
+    """
+    Known articles of the selected journals whose page changed since it was parsed: a conditional
+    request is sent for each of them, those answering 200 (new citations, corrected references)
+    are returned to be parsed again, those answering 304 cost no download. The new validators and
+    body are stored, so that parsing the modified pages afterwards costs a 304.
+    Articles parsed before the store existed (no validators stored) cannot be compared: their page
+    is downloaded to store its validators (baselined) and they are not returned, they are
+    re-checked from the next run on.
+
+    :param journals: (array-like) ["ed/journ", ...] journals to re-check (see DbScrap.get_rankj)
+    :param known: (array-like) eja registry, articles already parsed ("ed/journ/art.html")
+    :param root: default "https://ideas.repec.org/a/"
+    :param store: (PageStore) store of the validators, CONFIG["store"] if None
+    :return: (np.array) modified eja, in registry order, (dict) numbers of articles checked,
+    modified, not modified, baselined and failed
+    """
+    store = store if store is not None else CONFIG["store"]
+    if store is None:
+        raise ValueError("results: a PageStore is needed to re-check the known articles (see configure).")
+    prefixes = tuple(edj.strip("/") + "/" for edj in journals)
+    checked = [eja for eja in known if isinstance(eja, str) and eja.startswith(prefixes)]
+    modified = []
+    stats = {"checked": len(checked), "modified": 0, "not_modified": 0, "baselined": 0, "failed": 0}
+    pbar = ProgressBar()
+    for eja in pbar(checked):
+        baseline = store.get(root + eja) is None
+        status = fetch_status(root + eja, store)[1]
+        if status == 200 and baseline:
+            stats["baselined"] += 1
+        elif status == 200:
+            modified.append(eja)
+        elif status == 304:
+            stats["not_modified"] += 1
+        else:
+            stats["failed"] += 1
+    stats["modified"] = len(modified)
+    Metrics.count("articles_modified", len(modified))
+    return np.array(modified, dtype=object), stats
+
+
+def drop_article_rows(file, ejas, chunksize=100000):
+    """
+    Remove from an edge file (refs.csv or cits.csv, rows "['eja', 'eja_link']" written by
+    DbScrap.py) the rows of the given articles, so that their edges parsed again replace the
+    old ones instead of being appended to them. The file is rewritten through a temporary file.
+
+    :param file: (str) path of the edge file
+    :param ejas: (iterable) articles ("ed/journ/art.html") whose rows are removed
+    :param chunksize: (int) number of rows read at once
+    :return: (int) number of rows removed
+    """
+    ejas = set(ejas)
+    if not ejas or not os.path.exists(file) or os.path.getsize(file) == 0:
+        return 0
+    removed = 0
+    with open(file + ".tmp", "w") as out:
+        for chunk in pd.read_csv(file, header=None, usecols=[0], chunksize=chunksize, dtype=str):
+            drop = chunk[0].str.extract(r"^\['(.*?)', '", expand=False).isin(ejas)
+            chunk[~drop].to_csv(out, header=False, index=False)
+            removed += int(drop.sum())
+    os.replace(file + ".tmp", file)
+    return removed
@@ -0,0 +1,248 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides a local HTTP/JSON query server keeping the graph resident
+
+The attributes table, the citation graph (CSR and CSC), the inverted index and the PageRank
+scores are loaded once. Requests are answered concurrently by an asyncio server, the
+CPU-bound work is offloaded to a pool of workers (threads sharing the resident data, or
+processes each loading it once).
+
+Endpoints (GET, parameters in the query string, lists comma separated):
+- /topic?q=trading,asymmetry&how=union&limit=100  articles matching a topic query
+- /similarity?nodes=23721&k=10&epsilon=1e-4        related articles (local push PageRank)
+- /hits?q=trading,asymmetry&d=1000&k=10&seed=0     top authorities and hubs of a topic query
+- /pagerank?k=10&seeds=23721                        global (or personalized) PageRank top k
+- /stats                                            per endpoint latency percentiles
+
+# Example
+serve("Tables", port=8000)
+# then: curl "http://127.0.0.1:8000/topic?q=trading"
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+from CitNet import GraphCN, HubsAuths, InvIndex, PageRank, Query
+
+# Resident data of the server (or of each worker process, see load_state)
+STATE = {}
+
+
+def load_state(path):
+    """
+    Load the attributes, the citation graph, the inverted index and the PageRank scores
+    in STATE
+
+    :param path: (str) path to the Tables
+    """
+    attrs = pd.read_csv(os.path.join(path, "attrs_nos.csv"), index_col=0)
+    edges_df = pd.concat([pd.read_csv(os.path.join(path, "cits_edges.csv")),
+                          pd.read_csv(os.path.join(path, "refs_edges.csv"))])
+    adj_mat = GraphCN.edgesdf_to_csr(edges_df, n=max(attrs.index.max(), edges_df.values.max()) + 1)
+    inv_index = InvIndex.get_index(attrs, os.path.join(path, "InvIndex.npz"))
+    STATE.update({"attrs": attrs,
+                  "adj_mat": adj_mat,
+                  "adj_csc": adj_mat.tocsc(),
+                  "index": inv_index,
+                  "sim_hmat": Query.get_similarity_hmat(adj_mat),
+                  "pagerank": PageRank.get_pagerank(adj_mat)})
+
+
+def get_list(params, name, default=None, cast=str):
+    """
+    Comma separated list parameter of a request
+    """
+    if name not in params:
+        if default is None:
+            raise KeyError("missing parameter: " + name)
+        return default
+    return [cast(value) for value in params[name].split(",") if value != ""]
+
+
+def top_k(nodes, scores, k):
+    """
+    k best nodes by score, as a JSON serializable list
+    """
+    top = np.argsort(-scores)[:k]
+    return [{"node": int(node), "score": float(score)} for node, score in zip(nodes[top], scores[top])]
+
+
+def handle_topic(params):
+    """
+    Articles matching a topic query (see Query.topic_subgraph_root)
+    """
+    query_list = get_list(params, "q")
+    search_in = tuple(get_list(params, "search_in", ["title", "keywords"]))
+    roots = Query.topic_subgraph_root(STATE["attrs"], query_list, search_in, params.get("how", "union"),
+                                      STATE["index"])
+    limit = int(params.get("limit", 100))
+    return {"count": len(roots), "nodes": [int(node) for node in roots[:limit]]}
+
+
+def handle_similarity(params):
+    """
+    Articles related to a set of seed articles (see Query.similarity_push_query)
+    """
+    nodes_list = get_list(params, "nodes", cast=int)
+    nodes, scores = Query.similarity_push_query(nodes_list, STATE["sim_hmat"], k=int(params.get("k", 10)),
+                                                epsilon=float(params.get("epsilon", 1e-04)))
+    return {"results": top_k(nodes, scores, len(nodes))}
+
+
+def handle_hits(params):
+    """
+    Top authorities and hubs of the expanded subgraph of a topic query
+    """
+    query_list = get_list(params, "q")
+    search_in = tuple(get_list(params, "search_in", ["title", "keywords"]))
+    nodes, sub_adj = Query.topic_query_submatrix(STATE["adj_mat"], int(params.get("d", 1000)), STATE["attrs"],
+                                                 query_list, search_in, params.get("how", "union"),
+                                                 STATE["index"], int(params.get("seed", 0)), STATE["adj_csc"])
+    k = int(params.get("k", 10))
+    if len(nodes) == 0:
+        return {"authorities": [], "hubs": []}
+    auths, hubs = HubsAuths.iterate_hubs_auths_sparse(sub_adj, int(params.get("iter", 100)))
+    return {"authorities": top_k(nodes, auths, k), "hubs": top_k(nodes, hubs, k)}
+
+
+def handle_pagerank(params):
+    """
+    Global PageRank top k, or personalized on seed articles (the seeds out of the graph are
+    ignored, as in /similarity: empty answer when none of them is in the graph)
+    """
+    k = int(params.get("k", 10))
+    n = STATE["adj_mat"].shape[0]
+    seeds = get_list(params, "seeds", [], cast=int)
+    if seeds:
+        seeds = [seed for seed in seeds if 0 <= seed < n]
+        if not seeds:
+            return {"results": []}
+        personalization = np.zeros(n)
+        personalization[seeds] = 1
+        scores = PageRank.get_pagerank(STATE["adj_mat"], theta=float(params.get("theta", .85)),
+                                       personalization=personalization)
+    else:
+        scores = STATE["pagerank"]
+    return {"results": top_k(np.arange(len(scores)), scores, k)}
+
+
+HANDLERS = {"/topic": handle_topic,
+            "/similarity": handle_similarity,
+            "/hits": handle_hits,
+            "/pagerank": handle_pagerank}
+
+
+class QueryServer(object):
+    """
+    Asyncio HTTP/JSON server answering the requests of HANDLERS
+
+    :param path: (str) path to the Tables
+    :param workers: (int) size of the worker pool
+    :param executor: (str) "thread" (workers share the resident data) or "process"
+    (each worker process loads the data once)
+    :param max_latencies: (int) number of latencies kept per endpoint for the percentiles
+    """
+
+    def __init__(self, path, workers=4, executor="thread", max_latencies=10000):
+        if executor == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=load_state, initargs=(path,))
+        else:
+            load_state(path)
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.latencies = {endpoint: deque(maxlen=max_latencies) for endpoint in HANDLERS}
+        self.server = None
+
+    def stats(self):
+        """
+        Returns the number of requests and the latency percentiles (ms) of each endpoint
+        """
+        stats = dict()
+        for endpoint, latencies in self.latencies.items():
+            if latencies:
+                p50, p90, p99 = np.percentile(np.array(latencies) * 1000, [50, 90, 99])
+                stats[endpoint] = {"count": len(latencies), "p50_ms": p50, "p90_ms": p90, "p99_ms": p99}
+            else:
+                stats[endpoint] = {"count": 0}
+        return stats
+
+    async def dispatch(self, target):
+        """
+        Returns the HTTP status and the JSON answer of a request target ("/endpoint?params")
+        """
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == "/stats":
+            return 200, self.stats()
+        if url.path not in HANDLERS:
+            return 404, {"error": "unknown endpoint " + url.path}
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            answer = await loop.run_in_executor(self.executor, HANDLERS[url.path], params)
+            status = 200
+        except (KeyError, ValueError, IndexError) as e:
+            answer, status = {"error": str(e.args[0]) if e.args else repr(e)}, 400
+        self.latencies[url.path].append(time.perf_counter() - start)
+        return status, answer
+
+    async def handle(self, reader, writer):
+        """
+        Answer one HTTP connection
+        """
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if len(request_line) < 2 or request_line[0] != "GET":
+                status, answer = 405, {"error": "only GET requests are supported"}
+            else:
+                status, answer = await self.dispatch(request_line[1])
+        except Exception as e:
+            status, answer = 500, {"error": repr(e)}
+        body = json.dumps(answer).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}.get(status, "Error")
+        writer.write("HTTP/1.1 {0} {1}\r\nContent-Type: application/json\r\nContent-Length: {2}\r\n"
+                     "Connection: close\r\n\r\n".format(status, reason, len(body)).encode() + body)
+        await writer.drain()
+        writer.close()
+
+    async def start(self, host="127.0.0.1", port=8000):
+        """
+        Start listening (port 0 picks a free port), returns the (host, port) actually bound
+        """
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        """
+        Stop listening and shut the worker pool down
+        """
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown()
+
+
+def serve(path, host="127.0.0.1", port=8000, workers=4, executor="thread"):
+    """
+    Run the query server until interrupted
+
+    :param path: (str) path to the Tables
+    :param host: (str) interface to listen on (localhost by default)
+    :param port: (int) port to listen on
+    :param workers: (int) size of the worker pool
+    :param executor: (str) "thread" or "process" (see QueryServer)
+    """
+    async def run():
+        query_server = QueryServer(path, workers, executor)
+        bound = await query_server.start(host, port)
+        print("Serving on http://{0}:{1}".format(*bound))
+        async with query_server.server:
+            await query_server.server.serve_forever()
+    asyncio.run(run())
@@ -0,0 +1,144 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides a co-citation and bibliographic coupling similarity index
+
+With A the adjacency matrix of the citation graph (A[i, j] = 1 if i cites j):
+- co-citation similarity of articles i and j is (A^T.A)[i, j], the number of articles citing both,
+- bibliographic coupling of articles i and j is (A.A^T)[i, j], the number of references they share.
+The products are computed by blocks of rows (memory is bounded by the block) spread over
+a process pool, only the top k most similar articles of each row are kept.
+The result is a compact index (ids + scores, n x k) in which each article is looked up in O(1)."""
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.sparse as sparse
+
+# Factor matrices of the worker processes (see init_worker)
+WORKER_MATS = {}
+
+
+def get_factor(adj_mat, kind="cocitation"):
+    """
+    Returns M such that the similarity matrix is M.M^T
+
+    :param adj_mat: (scipy.sparse.csr.csr_matrix) n x n adjacency matrix of the citation graph
+    :param kind: (str) "cocitation" or "coupling"
+    :return: (scipy.sparse.csr.csr_matrix) n x n
+    """
+    valid = {"cocitation", "coupling"}
+    if kind not in valid:
+        raise ValueError("results: kind must be one of %r." % valid)
+    adj_mat = sparse.csr_matrix(adj_mat, dtype=np.float32)
+    adj_mat.data[:] = 1
+    if kind == "cocitation":
+        return adj_mat.T.tocsr()
+    return adj_mat
+
+
+def init_worker(factor, cosine):
+    """
+    Initializer of the worker processes: the factor matrix is sent once per worker
+    """
+    WORKER_MATS["factor"] = factor
+    WORKER_MATS["factor_t"] = factor.T.tocsr()
+    norms = np.sqrt(np.asarray(factor.sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    WORKER_MATS["norms"] = norms if cosine else None
+
+
+def topk_block(start, stop, k):
+    """
+    Top k most similar articles of the rows start:stop of the similarity matrix
+
+    :param start: (int) first row of the block
+    :param stop: (int) last row (excluded) of the block
+    :param k: (int) number of similar articles to keep
+    :return: (numpy.ndarray) (stop-start) x k int32 ids (-1 when less than k similar articles),
+    (numpy.ndarray) (stop-start) x k float32 scores, ties broken by increasing id
+    """
+    factor, factor_t, norms = WORKER_MATS["factor"], WORKER_MATS["factor_t"], WORKER_MATS["norms"]
+    sim_block = factor[start:stop].dot(factor_t).tocsr()
+    # an article is not similar to itself
+    rows = np.repeat(np.arange(start, stop), np.diff(sim_block.indptr))
+    sim_block.data[sim_block.indices == rows] = 0
+    sim_block.eliminate_zeros()
+    if norms is not None:
+        sim_block = sparse.diags(1 / norms[start:stop]).dot(sim_block).dot(sparse.diags(1 / norms)).tocsr()
+    ids = np.full((stop - start, k), -1, dtype=np.int32)
+    scores = np.zeros((stop - start, k), dtype=np.float32)
+    for row in range(stop - start):
+        row_ids = sim_block.indices[sim_block.indptr[row]:sim_block.indptr[row + 1]]
+        row_scores = sim_block.data[sim_block.indptr[row]:sim_block.indptr[row + 1]]
+        if len(row_ids) > k:
+            # the k-th score may be shared: keep all the ties, the smallest ids win below
+            top = row_scores >= -np.partition(-row_scores, k - 1)[k - 1]
+            row_ids, row_scores = row_ids[top], row_scores[top]
+        order = np.lexsort((row_ids, -row_scores))[:k]
+        ids[row, :len(order)] = row_ids[order]
+        scores[row, :len(order)] = row_scores[order]
+    return ids, scores
+
+
+def topk_similarity(adj_mat, kind="cocitation", k=20, block_size=1024, n_jobs=None, cosine=False):
+    """
+    Top k most similar articles of every article
+
+    :param adj_mat: (scipy.sparse.csr.csr_matrix) n x n adjacency matrix of the citation graph
+    :param kind: (str) "cocitation" (A^T.A) or "coupling" (A.A^T)
+    :param k: (int) number of similar articles to keep per article
+    :param block_size: (int) number of rows per block (bounds the memory of a sparse product)
+    :param n_jobs: (int) number of worker processes (os.cpu_count() if None, in process if 1)
+    :param cosine: (bool) normalize the counts by the geometric mean of the articles degrees
+    :return: (numpy.ndarray) n x k int32 ids of the similar articles (-1 padded),
+    (numpy.ndarray) n x k float32 scores, both sorted by decreasing score
+    """
+    factor = get_factor(adj_mat, kind)
+    n = factor.shape[0]
+    blocks = [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+    if n_jobs == 1:
+        init_worker(factor, cosine)
+        results = [topk_block(start, stop, k) for start, stop in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=init_worker,
+                                 initargs=(factor, cosine)) as executor:
+            futures = [executor.submit(topk_block, start, stop, k) for start, stop in blocks]
+            results = [future.result() for future in futures]
+    ids = np.concatenate([result[0] for result in results]) if results else np.empty((0, k), np.int32)
+    scores = np.concatenate([result[1] for result in results]) if results else np.empty((0, k), np.float32)
+    return ids, scores
+
+
+def save_simindex(file, ids, scores):
+    """
+    Save a top k similarity index as a .npz file
+
+    :param file: (str) path of the .npz file
+    :param ids: (numpy.ndarray) n x k ids (see topk_similarity)
+    :param scores: (numpy.ndarray) n x k scores
+    """
+    np.savez(file, ids=ids, scores=scores)
+
+
+def load_simindex(file):
+    """
+    Load a top k similarity index saved with save_simindex
+
+    :param file: (str) path of the .npz file
+    :return: (numpy.ndarray) n x k ids, (numpy.ndarray) n x k scores
+    """
+    with np.load(file) as arrays:
+        return arrays["ids"], arrays["scores"]
+
+
+def get_similar(ids, scores, node):
+    """
+    Similar articles of an article, looked up in the index
+
+    :param ids: (numpy.ndarray) n x k ids (see topk_similarity)
+    :param scores: (numpy.ndarray) n x k scores
+    :param node: (int) the article (matrix index)
+    :return: (numpy.ndarray) ids of the similar articles, (numpy.ndarray) their scores
+    """
+    found = ids[node] >= 0
+    return ids[node][found], scores[node][found]
@@ -0,0 +1,147 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides structural statistics of an undirected weighted graph (the co-authorship
+graph AdjMat_Auth.npz) computed on its sparse adjacency matrix, without building a networkx graph
+
+Degrees are numbers of distinct neighbours (self loops are ignored), strengths are sums of
+the weights (articles in common for the co-authorship graph). The stored matrix may hold both
+(i, j) and (j, i) or only one of them (see PageRank.symmetrize).
+
+# Example
+adj_mat = scipy.sparse.load_npz("Tables/AdjMat_Auth.npz")
+report = structure_report(adj_mat)    # summary statistics and timings of each computation
+"""
+
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+from scipy.sparse import csgraph
+from CitNet import Metrics, PageRank
+
+
+def get_binary(adj_mat):
+    """
+    Unweighted symmetric adjacency matrix without self loops
+
+    :param adj_mat: (scipy.sparse matrix) n x n
+    :return: (scipy.sparse.csr.csr_matrix) n x n symmetric, int64 ones
+    """
+    bin_mat = PageRank.symmetrize(adj_mat)
+    bin_mat.setdiag(0)
+    bin_mat.eliminate_zeros()
+    bin_mat.data = np.ones(bin_mat.nnz, dtype=np.int64)
+    return bin_mat
+
+
+def get_components(adj_mat):
+    """
+    Connected components
+
+    :param adj_mat: (scipy.sparse matrix) n x n
+    :return: (numpy.ndarray) n, component of each node, (numpy.ndarray) size of each component
+    """
+    n_components, labels = csgraph.connected_components(adj_mat, directed=False)
+    return labels, np.bincount(labels, minlength=n_components)
+
+
+def get_core_numbers(adj_mat):
+    """
+    Core number of each node (largest k such that the node is in the k-core, the maximal
+    subgraph where every node has degree >= k). The graph is peeled level by level: all the
+    nodes of degree <= k are removed at once and the degrees of their neighbours are updated
+    with one sparse product, until none is left at level k.
+
+    :param adj_mat: (scipy.sparse matrix) n x n
+    :return: (numpy.ndarray) n, core number of each node
+    """
+    bin_mat = get_binary(adj_mat)
+    degrees = np.diff(bin_mat.indptr).astype(np.int64)
+    core = np.zeros(len(degrees), dtype=np.int64)
+    active = np.ones(len(degrees), dtype=bool)
+    k = 0
+    while active.any():
+        k = max(k, degrees[active].min())
+        removed = active & (degrees <= k)
+        while removed.any():
+            core[removed] = k
+            active &= ~removed
+            degrees -= bin_mat.dot(removed.astype(np.int64))
+            removed = active & (degrees <= k)
+    return core
+
+
+def get_histograms(adj_mat):
+    """
+    Degree, strength and edge weight distributions
+
+    :param adj_mat: (scipy.sparse matrix) n x n, integer weights
+    :return: (pandas.core.frame.DataFrame) indexed by value, columns "degree", "strength" (number of
+    nodes) and "weight" (number of edges, each counted once)
+    """
+    adj_mat = PageRank.symmetrize(adj_mat)
+    bin_mat = get_binary(adj_mat)
+    degrees = np.diff(bin_mat.indptr)
+    strengths = np.asarray(adj_mat.sum(axis=1)).ravel() - adj_mat.diagonal()
+    weights = sparse.triu(adj_mat, k=1).data
+    hists = [np.bincount(np.asarray(values, dtype=np.int64)) for values in (degrees, strengths, weights)]
+    size = max(len(hist) for hist in hists)
+    return pd.DataFrame({name: np.pad(hist, (0, size - len(hist)))
+                         for name, hist in zip(("degree", "strength", "weight"), hists)})
+
+
+def get_triangles(adj_mat):
+    """
+    Number of triangles through each node and local clustering coefficients, from the sparse
+    product B.B masked by the upper triangle of B (B binary adjacency): (B.B)[i, j] counts the common neighbours of
+    the linked nodes i and j, each triangle is found on its 3 edges (pairs i < j).
+
+    :param adj_mat: (scipy.sparse matrix) n x n
+    :return: (numpy.ndarray) n triangles per node, (numpy.ndarray) n local clustering
+    coefficients (0 for degree < 2), (float) global clustering (transitivity)
+    """
+    bin_mat = get_binary(adj_mat)
+    upper = sparse.triu(bin_mat, k=1).tocsr()
+    # common neighbours of each linked pair (i < j)
+    common = bin_mat.dot(bin_mat).multiply(upper).tocsr()
+    triangles = (np.asarray(common.sum(axis=1)).ravel() + np.asarray(common.sum(axis=0)).ravel()) // 2
+    degrees = np.diff(bin_mat.indptr).astype(np.float64)
+    pairs = degrees * (degrees - 1) / 2
+    clustering = np.divide(triangles, pairs, out=np.zeros(len(pairs)), where=pairs > 0)
+    transitivity = triangles.sum() / pairs.sum() if pairs.sum() else 0.
+    return triangles, clustering, transitivity
+
+
+def structure_report(adj_mat):
+    """
+    Summary of the structure of the graph, with the time of each computation
+
+    :param adj_mat: (scipy.sparse matrix) n x n
+    :return: (dict) summary statistics, (dict) "labels", "core", "histograms", "triangles",
+    "clustering" detailed results, (dict) timings in seconds
+    """
+    timings, details = dict(), dict()
+
+    def timed(name, func):
+        with Metrics.stage("structure_" + name):
+            start = time.perf_counter()
+            result = func(adj_mat)
+            timings[name] = time.perf_counter() - start
+        return result
+
+    details["labels"], sizes = timed("components", get_components)
+    details["core"] = timed("k_core", get_core_numbers)
+    details["histograms"] = timed("histograms", get_histograms)
+    details["triangles"], details["clustering"], transitivity = timed("triangles", get_triangles)
+    degrees = details["histograms"]["degree"]
+    summary = {"nodes": adj_mat.shape[0],
+               "edges": int(degrees.dot(degrees.index)) // 2,
+               "isolated": int(degrees.iloc[0]) if len(degrees) else 0,
+               "components": len(sizes),
+               "largest_component": int(sizes.max()) if len(sizes) else 0,
+               "max_core": int(details["core"].max()) if len(details["core"]) else 0,
+               "triangles": int(details["triangles"].sum()) // 3,
+               "transitivity": float(transitivity),
+               "avg_clustering": float(details["clustering"].mean()) if len(details["clustering"]) else 0.}
+    return summary, details, timings
@@ -0,0 +1,212 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""This module provides a time indexed citation graph, for rankings "as of year Y"
+
+Articles are renumbered by publication year (articles without a date last), so that the
+articles published up to year Y are a prefix 0..k-1 of the nodes. Edges are stored in a CSR
+matrix ordered the same way, with per year offset tables: the snapshot of the graph up to year
+Y is a prefix slice of indptr, indices and data (no copy). An edge to an article published after
+the citing one (working paper cited before its publication, erratum...) would break the prefix:
+these "late" edges are kept aside, sorted by the year of the cited article, and added to the
+snapshots that contain both ends.
+
+# Example
+time_graph = build_time_graph(edges_df, get_years(attrs))
+adj_mat, nodes = snapshot(time_graph, 2000)     # graph of the articles published up to 2000
+ranks, info = rank_by_year(time_graph)           # in-degree, PageRank and HITS for every year
+"""
+
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+from CitNet import GraphCN, HubsAuths, Metrics, PageRank
+
+
+def get_years(attrs, n=None):
+    """
+    Publication year of the articles, from their "date" (YYYY-MM) field
+
+    :param attrs: (pandas.core.frame.DataFrame) articles attributes indexed by article number
+    :param n: (int) number of articles, max article number + 1 if None
+    :return: (numpy.ndarray) n, year of each article number (nan if unknown)
+    """
+    if n is None:
+        n = int(attrs.index.max()) + 1
+    years = pd.to_numeric(attrs["date"].astype(str).str.split("-").str[0], errors="coerce")
+    return years.reindex(np.arange(n)).values.astype(np.float64)
+
+
+def build_time_graph(edges_df, years, n=None, compact=False):
+    """
+    Build the time indexed citation graph
+
+    :param edges_df: (pandas.core.frame.DataFrame) edges (columns "referring" and "referred_to",
+    article numbers), duplicates are dropped
+    :param years: (array-like) n, year of each article number (nan if unknown)
+    :param n: (int) number of articles, len(years) if None
+    :param compact: (bool) use int32 indices and float32 values
+    :return: (dict) {"years": (numpy.ndarray) sorted years,
+                     "node_offsets": number of articles published up to each year,
+                     "edge_offsets": number of CSR edges between these articles,
+                     "adj_mat": (scipy.sparse.csr.csr_matrix) n x n on the renumbered articles,
+                     "late_rows", "late_cols": late edges (renumbered), sorted by year of the cited article,
+                     "late_offsets": number of late edges between the articles published up to each year,
+                     "perm": article number of each node, "rank": node of each article number}
+    """
+    years = np.asarray(years, dtype=np.float64)
+    if n is None:
+        n = len(years)
+    year_key = np.where(np.isnan(years[:n]), np.inf, years[:n])
+    perm = np.argsort(year_key, kind="stable")
+    rank = np.empty(n, dtype=np.int64)
+    rank[perm] = np.arange(n)
+    sorted_key = year_key[perm]
+    cutoffs = np.unique(sorted_key[np.isfinite(sorted_key)])
+    node_offsets = np.searchsorted(sorted_key, cutoffs, side="right")
+    # block of a node: index of its year in cutoffs (len(cutoffs) if unknown)
+    block = np.searchsorted(cutoffs, sorted_key, side="left")
+
+    keys = np.unique(rank[edges_df["referring"].values] * n + rank[edges_df["referred_to"].values])
+    rows, cols = keys // n, keys % n
+    late = block[cols] > block[rows]
+    adj_mat = sparse.csr_matrix((np.ones(int((~late).sum())), (rows[~late], cols[~late])), shape=(n, n))
+    adj_mat.sort_indices()
+    if compact:
+        adj_mat = GraphCN.compact_matrix(adj_mat)
+    late_order = np.lexsort((cols[late], rows[late], block[cols[late]]))
+    late_rows, late_cols = rows[late][late_order], cols[late][late_order]
+    return {"years": cutoffs.astype(np.int64),
+            "node_offsets": node_offsets,
+            "edge_offsets": adj_mat.indptr[node_offsets],
+            "adj_mat": adj_mat,
+            "late_rows": late_rows,
+            "late_cols": late_cols,
+            "late_offsets": np.searchsorted(block[late_cols], np.arange(len(cutoffs)), side="right"),
+            "perm": perm,
+            "rank": rank}
+
+
+def save_time_graph(time_graph, file):
+    """
+    Save the time indexed graph as a .npz file
+
+    :param time_graph: (dict) the graph (see build_time_graph)
+    :param file: (str) path of the .npz file
+    """
+    arrays = {key: value for key, value in time_graph.items() if key != "adj_mat"}
+    adj_mat = time_graph["adj_mat"]
+    np.savez(file, adj_data=adj_mat.data, adj_indices=adj_mat.indices, adj_indptr=adj_mat.indptr, **arrays)
+
+
+def load_time_graph(file):
+    """
+    Load a time indexed graph saved with save_time_graph
+
+    :param file: (str) path of the .npz file
+    :return: (dict) the graph (see build_time_graph)
+    """
+    with np.load(file) as arrays:
+        time_graph = {key: arrays[key] for key in arrays.files if not key.startswith("adj_")}
+        n = len(time_graph["perm"])
+        time_graph["adj_mat"] = sparse.csr_matrix((arrays["adj_data"], arrays["adj_indices"], arrays["adj_indptr"]),
+                                                  shape=(n, n))
+    return time_graph
+
+
+def get_cutoff(time_graph, year):
+    """
+    Position of the last year <= year in time_graph["years"] (-1 if before the first year)
+    """
+    return int(np.searchsorted(time_graph["years"], year, side="right")) - 1
+
+
+def snapshot(time_graph, year, late=True):
+    """
+    Citation graph of the articles published up to year (included). Without late edges (or if
+    there are none up to year) the matrix is a view on the arrays of time_graph: it must not be
+    modified in place.
+
+    :param time_graph: (dict) the graph (see build_time_graph)
+    :param year: (int) last year included
+    :param late: (bool) include the late edges (citations of articles published after the citing one)
+    :return: (scipy.sparse.csr.csr_matrix) k x k adjacency matrix of the nodes 0..k-1,
+    (numpy.ndarray) k article numbers of these nodes
+    """
+    cutoff = get_cutoff(time_graph, year)
+    k = int(time_graph["node_offsets"][cutoff]) if cutoff >= 0 else 0
+    adj_mat = time_graph["adj_mat"]
+    m = adj_mat.indptr[k]
+    # the constructor would copy slices much shorter than their base (scipy prunes them)
+    sub_mat = sparse.csr_matrix((k, k), dtype=adj_mat.dtype)
+    sub_mat.data, sub_mat.indices, sub_mat.indptr = adj_mat.data[:m], adj_mat.indices[:m], adj_mat.indptr[:k + 1]
+    n_late = int(time_graph["late_offsets"][cutoff]) if cutoff >= 0 else 0
+    if late and n_late:
+        late_mat = sparse.csr_matrix((np.ones(n_late, dtype=adj_mat.dtype),
+                                      (time_graph["late_rows"][:n_late], time_graph["late_cols"][:n_late])),
+                                     shape=(k, k))
+        sub_mat = (sub_mat + late_mat).tocsr()
+    return sub_mat, time_graph["perm"][:k]
+
+
+def rank_by_year(time_graph, years=None, theta=.85, epsilon=1e-06, max_iter=100, solver="power",
+                 hits_iter=100, hits_epsilon=1e-06, late=True, warm_start=True):
+    """
+    In-degree, PageRank and HITS scores of the snapshots of the graph, year after year.
+    In-degrees are updated with the edges added since the previous cutoff only, PageRank and HITS
+    start from the scores of the previous cutoff (new articles get the uniform score), which
+    saves most of the iterations when a year adds a small share of the graph.
+
+    :param time_graph: (dict) the graph (see build_time_graph)
+    :param years: (list) cutoff years, in increasing order, all the years of the graph if None
+    :param theta: (numeric) damping factor
+    :param epsilon: (numeric) PageRank tolerance on the l1 residual
+    :param max_iter: (int) maximum number of PageRank iterations
+    :param solver: (str) PageRank solver (see PageRank.get_pagerank)
+    :param hits_iter: (int) maximum number of HITS iterations
+    :param hits_epsilon: (numeric) HITS tolerance on the l1 change of the hubs vector
+    :param late: (bool) include the late edges (see snapshot)
+    :param warm_start: (bool) start PageRank and HITS from the previous cutoff
+    :return: (dict) {year: (pandas.core.frame.DataFrame) indexed by article number, columns
+    "in_degree", "pr_score", "xauth_0", "xhub_0"}, (pandas.core.frame.DataFrame) one row per year
+    with the numbers of nodes and edges, PageRank iterations and time
+    """
+    if years is None:
+        years = time_graph["years"]
+    n = len(time_graph["perm"])
+    indices = time_graph["adj_mat"].indices
+    in_degree = np.zeros(n, dtype=np.int64)
+    k_prev, m_prev, late_prev = 0, 0, 0
+    pr_vec, hubs = None, None
+    results, infos = dict(), []
+    for year in years:
+        start = time.perf_counter()
+        cutoff = get_cutoff(time_graph, year)
+        if cutoff < 0:
+            continue
+        k = int(time_graph["node_offsets"][cutoff])
+        m = int(time_graph["edge_offsets"][cutoff])
+        n_late = int(time_graph["late_offsets"][cutoff]) if late else 0
+        # in-degree: edges added since the previous cutoff
+        in_degree += np.bincount(indices[m_prev:m], minlength=n)
+        in_degree += np.bincount(time_graph["late_cols"][late_prev:n_late], minlength=n)
+        adj_mat, nodes = snapshot(time_graph, year, late=late)
+        pr_init, y_init = None, None
+        if warm_start and pr_vec is not None:
+            pr_init = np.append(pr_vec * (k_prev / k), np.full(k - k_prev, 1 / k))
+            y_init = np.append(hubs, np.full(k - k_prev, 1 / np.sqrt(k)))
+        pr_vec, pr_info = PageRank.get_pagerank(adj_mat, theta, epsilon, max_iter, solver=solver,
+                                                pr_init=pr_init, return_info=True)
+        if adj_mat.nnz:
+            auths, hubs = HubsAuths.iterate_hubs_auths_sparse(adj_mat, hits_iter, y_init, hits_epsilon)
+        else:
+            auths, hubs = np.zeros(k), np.full(k, 1 / np.sqrt(k))
+        results[year] = pd.DataFrame({"in_degree": in_degree[:k], "pr_score": pr_vec,
+                                      "xauth_0": auths, "xhub_0": hubs}, index=nodes)
+        info = {"year": year, "nodes": k, "edges": adj_mat.nnz, "pr_iterations": pr_info["iterations"],
+                "time": time.perf_counter() - start}
+        Metrics.emit("time_snapshot", **info)
+        infos.append(info)
+        k_prev, m_prev, late_prev = k, m, n_late
+    return results, pd.DataFrame(infos)
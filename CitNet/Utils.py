@@ -3,6 +3,8 @@
 
 """This module provides various tools for processing"""
 
+import numpy as np
+
 
 def str_to_list(x):
     """
@@ -31,3 +33,17 @@ def parse_url(url, to_remove):
     :return: (str) url with to_remove removed
     """
     return url.replace(to_remove, "")
+
+
+def vec_norm(x, ord=2):
+    """
+    Norm of a vector, accumulated in float64 whatever the dtype of x
+    (so that float32 iteration vectors do not lose precision in the norm)
+
+    :param x: (numpy.ndarray) the vector
+    :param ord: (int) 1 or 2, the norm to compute
+    :return: (float) the norm of x
+    """
+    if ord == 1:
+        return np.abs(x).sum(dtype=np.float64)
+    return np.sqrt(np.einsum("i,i->", x, x, dtype=np.float64))
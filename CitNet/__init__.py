@@ -0,0 +1,5 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Citation network tools, see the README. Submodules are imported explicitly
+(from CitNet import PageRank) so that importing the package itself stays cheap."""
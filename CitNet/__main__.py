@@ -0,0 +1,8 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""python -m CitNet, same as the citnet console script (see Cli)"""
+
+from CitNet import Cli
+
+Cli.main()
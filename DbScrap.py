@@ -1,6 +1,5 @@
-from urllib.request import urlopen
+import os
 from bs4 import BeautifulSoup
-from urllib.error import HTTPError
 import pandas as pd
 import numpy as np
 from progressbar import ProgressBar
@@ -11,7 +10,7 @@ from CitNet import ScrapIR
 #
 # Input: "https://ideas.repec.org/a/"
 # Output: edjournart_list.csv - list of all articles available on IR
-#         eja.csv   - subset of articles in the top 30 journals
+#         eja.csv   - subset of articles in the top 30 journals (registry of parsed articles)
 #         attrs.csv - attributes of articles in eja
 #         cits.csv    - citations of articles in eja
 #         refs.csv    - references of articles in eja
@@ -26,60 +25,75 @@ from CitNet import ScrapIR
 #####################################################################
 # Set root
 root = "https://ideas.repec.org/a/"
-
-#####################################################################
-# Get editor list
-ed_list = []
-pbar = ProgressBar()
-html = urlopen(root)
-bsObj = BeautifulSoup(html, "lxml")
-for ed in pbar(bsObj.findAll({"a": "href"})):
-    if len(ed.attrs["href"]) == 4:
-        ed_list += [ed.attrs["href"]]
-
-#####################################################################
-#  Get journals list
-journ_list = []
-edjourn_list = []
-pbar = ProgressBar()
-for ed in pbar(ed_list):
-    html = urlopen(root + ed)
-    bsObj = BeautifulSoup(html, "lxml")
-
-    for journ in bsObj.findAll({"a": "href"}):
-        if len(journ.attrs["href"]) == 7:
-            journ_list += [journ.attrs["href"]]
-            edjourn_list += [ed + journ.attrs["href"]]
-
-#####################################################################
-# Get articles list
-art_list = []
-edjournart_list = []
-pbar = ProgressBar()
-i = 0
-for edj in pbar(edjourn_list):
-    try:
-        html = urlopen(root + edj)
-    except HTTPError as e:
-        i += 1
+# Pages are fetched at most 2 per second, failures retried with backoff, and their
+# validators kept in Tables/pages so that a re-crawl only downloads the modified pages
+ScrapIR.configure(store_dir="Tables/pages", rate=2., retries=5)
+# Incremental discovery: once eja.csv (the registry of parsed articles) exists, only the listing
+# pages of the top journals are walked (Section 1 is skipped) and only new articles are parsed
+incremental = os.path.exists("Tables/eja.csv")
+# In incremental mode, re-check the known articles of the top journals (one conditional request
+# each) and parse again the references and citations of those whose page changed
+recheck = True
+
+if not incremental:
+    #################################################################
+    # Get editor list
+    ed_list = []
+    pbar = ProgressBar()
+    html = ScrapIR.fetch(root)
+    if html is None:
+        raise RuntimeError("the list of editors could not be fetched from " + root)
     bsObj = BeautifulSoup(html, "lxml")
-    for art in bsObj.findAll({"a": "href"}):
-        if ".html" in art.attrs["href"]:
-            art_list += [art.attrs["href"]]
-            edjournart_list += [edj + art.attrs["href"]]
-
-# ed_list ["ed1/","ed2/", ...]
-# journ_list ["journ1/","journ2/", ...]
-# art_list ["art1.htm","art2.html", ...]
-# edjourn_list ["ed1/journ1/","ed1/journ2", ...]
-# edjournart_list ["ed1/journ1/art1.html", ...]
-
-#####################################################################
-# Save eja list as .cvs (and del the others)
-pd.Series(edjournart_list).to_csv('Tables/edjournart_list.csv',
-                                  index=False, header=False)
-del ed_list, journ_list, art_list, edjourn_list
-del edjournart_list
+    for ed in pbar(bsObj.findAll({"a": "href"})):
+        if len(ed.attrs["href"]) == 4:
+            ed_list += [ed.attrs["href"]]
+
+    #################################################################
+    #  Get journals list
+    journ_list = []
+    edjourn_list = []
+    pbar = ProgressBar()
+    for ed in pbar(ed_list):
+        html = ScrapIR.fetch(root + ed)
+        if html is None:
+            continue
+        bsObj = BeautifulSoup(html, "lxml")
+
+        for journ in bsObj.findAll({"a": "href"}):
+            if len(journ.attrs["href"]) == 7:
+                journ_list += [journ.attrs["href"]]
+                edjourn_list += [ed + journ.attrs["href"]]
+
+    #################################################################
+    # Get articles list
+    art_list = []
+    edjournart_list = []
+    pbar = ProgressBar()
+    i = 0
+    for edj in pbar(edjourn_list):
+        html = ScrapIR.fetch(root + edj)
+        if html is None:
+            # do not parse the page of the previous journal again
+            i += 1
+            continue
+        bsObj = BeautifulSoup(html, "lxml")
+        for art in bsObj.findAll({"a": "href"}):
+            if ".html" in art.attrs["href"]:
+                art_list += [art.attrs["href"]]
+                edjournart_list += [edj + art.attrs["href"]]
+
+    # ed_list ["ed1/","ed2/", ...]
+    # journ_list ["journ1/","journ2/", ...]
+    # art_list ["art1.htm","art2.html", ...]
+    # edjourn_list ["ed1/journ1/","ed1/journ2", ...]
+    # edjournart_list ["ed1/journ1/art1.html", ...]
+
+    #################################################################
+    # Save eja list as .cvs (and del the others)
+    pd.Series(edjournart_list).to_csv('Tables/edjournart_list.csv',
+                                      index=False, header=False)
+    del ed_list, journ_list, art_list, edjourn_list
+    del edjournart_list
 
 #####################################################################
 # Output : edjournart_list.csv
@@ -88,7 +102,7 @@ del edjournart_list
 
 #####################################################################
 # Section 2. Parse articles
-# Input : edjournart_list.csv
+# Input : edjournart_list.csv (or eja.csv and the listings of the top journals if incremental)
 # Output :  eja.csv     - subset of input for top journals
 #           attrs.csv   - attributes of articles in eja
 #           cits.csv    - citations of articles in eja
@@ -108,7 +122,9 @@ def get_rankj(lb, url="https://ideas.repec.org/top/top.journals.all.html"):
     :param url: (str) url of the ranking page
     :return: (np.ar) ["ed/journ", ...]
     """
-    html = urlopen(url)
+    html = ScrapIR.fetch(url)
+    if html is None:
+        raise RuntimeError("the journal ranking could not be fetched from " + url)
     bsObj = BeautifulSoup(html, "lxml")
     rankj_list = []
     i = 0
@@ -124,34 +140,40 @@ def get_rankj(lb, url="https://ideas.repec.org/top/top.journals.all.html"):
 # Top 30
 TopJourn_ar = get_rankj(30)
 
-#####################################################################
-# Subset of articles in top journals
-edjournart_db = pd.read_csv('Tables/edjournart_list.csv',
-                            header=None, names=["eja"])
-# !rm "Tables/edjournart_list.csv"
-TopEja = np.empty(1).flatten()
-for i in range(len(TopJourn_ar)):
-    TopEja = np.concatenate([TopEja,
-                             np.array(np.where(edjournart_db.eja.str.contains(TopJourn_ar[i]) is True)).flatten()])
-TopEja = TopEja[1:].astype(int)  # Indexes (!)
-
-pd.Series(edjournart_db.values[TopEja].flatten()).to_csv("Tables/eja.csv",
-                                                         index=False, header=False)
-
-#####################################################################
-# Load list of eja (np.array)
-eja_ar = pd.read_csv('Tables/eja.csv', header=None).values.flatten()
-# !rm "Tables/eja.csv"
-
-#####################################################################
-# Output : eja.csv
-#####################################################################
+if incremental:
+    #################################################################
+    # New articles of the top journals: their listings diffed against the registry
+    known_eja = pd.read_csv('Tables/eja.csv', header=None).values.flatten()
+    eja_ar, discovery = ScrapIR.discover_articles(TopJourn_ar, known_eja, root)
+    print(discovery)
+    if recheck:
+        modified_ar, modified = ScrapIR.recheck_articles(TopJourn_ar, known_eja, root)
+        print(modified)
+    else:
+        modified_ar = np.empty(0, dtype=object)
+else:
+    #################################################################
+    # Subset of articles in top journals
+    edjournart_db = pd.read_csv('Tables/edjournart_list.csv',
+                                header=None, names=["eja"])
+    # !rm "Tables/edjournart_list.csv"
+    TopEja = np.empty(1).flatten()
+    for i in range(len(TopJourn_ar)):
+        TopEja = np.concatenate([TopEja,
+                                 np.flatnonzero(edjournart_db.eja.str.contains(TopJourn_ar[i]).values)])
+    TopEja = TopEja[1:].astype(int)  # Indexes (!)
+    #################################################################
+    # List of eja (np.array)
+    eja_ar = edjournart_db.values[TopEja].flatten()
 
 #####################################################################
 # Get attributes
 attrs = []
 for eja in eja_ar:  # Should be ran on full eja
     attrs += [ScrapIR.get_attrs(eja)]
+# Articles whose page could not be fetched are left out of the registry (found again next time)
+eja_ar = np.array([eja for eja, attr in zip(eja_ar, attrs) if attr is not None], dtype=object)
+attrs = [attr for attr in attrs if attr is not None]
 db_attrs = pd.DataFrame(attrs, columns=["url",
                                         "title",
                                         "authors",
@@ -162,16 +184,29 @@ db_attrs["editor"] = db_attrs.url.str.split("/").apply(lambda x: x[4])
 db_attrs["journal"] = db_attrs.url.str.split("/").apply(lambda x: x[5])
 db_attrs["article_id"] = db_attrs.url.str.split("/").apply(lambda x: x[-1])
 # db_attrs["year"] = pd.DatetimeIndex(db_attrs.date).year
-# save attrs to csv
-db_attrs.to_csv("Tables/attrs")
+# save attrs to csv (appended after the known articles, numbered from there, in incremental mode)
+if incremental:
+    db_attrs.index += len(pd.read_csv("Tables/attrs.csv", usecols=[0]))
+    db_attrs.to_csv("Tables/attrs.csv", mode="a", header=False)
+    pd.Series(eja_ar).to_csv("Tables/eja.csv", mode="a", index=False, header=False)
+else:
+    db_attrs.to_csv("Tables/attrs.csv")
+    pd.Series(eja_ar).to_csv("Tables/eja.csv", index=False, header=False)
 
 #####################################################################
-# Output : attrs.csv
+# Output : eja.csv
+#          attrs.csv
 #####################################################################
 
 
 #####################################################################
 # 3.2 Get refs and cits
+# NB: in incremental mode the pages of the new articles and of the modified known articles are
+# parsed. The rows already saved for the latter are replaced by the new ones (references removed
+# from a page are removed from refs.csv), unless no row could be parsed again (page not fetched):
+# the old rows are kept then. Their attributes are not updated.
+if incremental:
+    eja_ar = np.concatenate([eja_ar, modified_ar])
 cit_ar = ScrapIR.get_stack(eja_ar, "cit")
 ref_ar = ScrapIR.get_stack(eja_ar, "ref")
 # cit_ar = ScrapIR.get_stack(eja_ar[:100], "cit")
@@ -179,8 +214,13 @@ ref_ar = ScrapIR.get_stack(eja_ar, "ref")
 
 #####################################################################
 # Save cits and refs as .csv
-pd.DataFrame(cit_ar).to_csv("Tables/cits", index=False, header=False)
-pd.DataFrame(ref_ar).to_csv("Tables/refs", index=False, header=False)
+mode = "a" if incremental else "w"
+if incremental:
+    for file, stack in (("Tables/cits.csv", cit_ar), ("Tables/refs.csv", ref_ar)):
+        parsed = {row[0] for row in stack}
+        print(file, ScrapIR.drop_article_rows(file, [eja for eja in modified_ar if eja in parsed]), "rows replaced")
+pd.DataFrame(cit_ar).to_csv("Tables/cits.csv", mode=mode, index=False, header=False)
+pd.DataFrame(ref_ar).to_csv("Tables/refs.csv", mode=mode, index=False, header=False)
 
 
 #####################################################################
@@ -1,6 +1,6 @@
 import pandas as pd
-import time
 from CitNet import DisambName as DN
+from CitNet import Metrics
 import os
 
 #####################################################################
@@ -17,6 +17,8 @@ import os
 #####################################################################
 # Path to the data
 path = os.path.join(os.getcwd(), "Tables")
+# Stage timings and counters (JSON lines)
+Metrics.enable(path + "/metrics.jsonl")
 
 
 #####################################################################
@@ -50,10 +52,8 @@ df_authors["uniformat"] = df_authors["original"].apply(DN.uniformize_names)
 
 #####################################################################
 # Start mapping authors (finding equivalent ones)
-start = time.clock()
-cleaned = DN.map_authors(df_authors, 0.12)
-end = time.clock()
-print(end - start)
+with Metrics.stage("map_authors", names=len(df_authors)):
+    cleaned = DN.map_authors(df_authors, 0.12)
 # Filter out the cases where multiple authors points to one
 print(cleaned[cleaned.equivalent.apply(lambda x: len(x)) > 1])
 print("len was {0}, it is now {1}".format(len(df_authors), len(cleaned)))
@@ -87,11 +87,9 @@ cleaned_bis = DN.unpack_authors_list(cleaned_cop)
 # Find authors indexes for each paper in attrs (WARNING : TAKES A LITTLE MORE THAN AN HOUR)
 maxs_eq = max(cleaned_cop.equivalent.apply(lambda x: len(x)))
 eqs_cols = ["equivalent_" + str(i) for i in range(0, maxs_eq)]
-start = time.clock()
-attrs["authors_nos"] = attrs["authors_list"].apply(
-    lambda x: DN.author_corresp(cleaned_cop, eqs_cols, x))
-end = time.clock()
-print(end - start)
+with Metrics.stage("author_corresp", articles=len(attrs)):
+    attrs["authors_nos"] = attrs["authors_list"].apply(
+        lambda x: DN.author_corresp(cleaned_cop, eqs_cols, x))
 
 #####################################################################
 # Save to csv
@@ -1,13 +1,13 @@
 import importlib
 import pandas as pd
 import networkx as nx
-import seaborn as sns
 import os
-import time
 import CitNet
 from CitNet import HubsAuths as HA
 from CitNet import Query as Q
 from CitNet import GraphCN
+from CitNet import InvIndex
+from CitNet import Metrics
 
 
 #####################################################################
@@ -25,18 +25,21 @@ from CitNet import GraphCN
 
 # Path to the data
 path = os.getcwd() + "/Tables/"
+# Stage timings and SpMV counts (JSON lines)
+Metrics.enable(path + "metrics.jsonl")
 # Load attributes for terms matching
 attrs = pd.read_csv(path + "attrs_nos.csv", index_col=0)
 # Load refs and cites edges dataframes
 cits_edgesdf = pd.read_csv(path + "cits_edges.csv")
 refs_edgesdf = pd.read_csv(path + "refs_edges.csv")
-# Convert them to list of edges
-cits_edges = GraphCN.edgesdf_to_edgeslist(cits_edgesdf)
-refs_edges = GraphCN.edgesdf_to_edgeslist(refs_edgesdf)
-# Stack refs and cits edges together
-all_edges = cits_edges + refs_edges
-# Construct nx.DiGraph from stacked edges (refs + cits)
-cits_refs_graph = nx.DiGraph(all_edges)
+# Union of refs and cits edges (deduplicated, with provenance bits) and coverage of the crawl
+edges_df, edges_stats = GraphCN.union_edges(refs_edgesdf, cits_edgesdf)
+print(edges_stats)
+# Construct nx.DiGraph from the union of the edges (refs + cits)
+cits_refs_graph = nx.DiGraph()
+cits_refs_graph.add_edges_from(zip(edges_df["referring"].values, edges_df["referred_to"].values))
+# Load the inverted index of titles, keywords and JEL codes (rebuilt when attrs changed)
+inv_index = InvIndex.get_index(attrs, path + "InvIndex.npz")
 
 
 #####################################################################
@@ -45,7 +48,7 @@ cits_refs_graph = nx.DiGraph(all_edges)
 # Create the expanded subgraph on which to perform the algo
 d = 1000
 query_list = ["asymmetry", "trading"]
-subtest_topic = Q.topic_query_subgraph(cits_refs_graph, d, attrs, query_list)
+subtest_topic = Q.topic_query_subgraph(cits_refs_graph, d, attrs, query_list, index=inv_index)
 # compute hubs and authorities in an iterative fashion
 hubs_auths_df = HA.iterate_hubs_auths(subtest_topic, k=1000)
 # compute authorities in the eigen vector search fashion
@@ -83,11 +86,9 @@ attrs.loc[top_auths_sim[:10], ["title","authors"]]
 #####################################################################
 # Section 4. Compute Hubs and Authorities on whole Graph
 #####################################################################
-start = time.clock()
-# hubs_auths_whole = hubs_authorities_eigen(cits_refs_graph, neigs=1)
-hubs_auths_whole = HA.iterate_hubs_auths(cits_refs_graph, k=1000)
-end = time.clock()
-print(end - start)
+with Metrics.stage("hits_whole", nodes=cits_refs_graph.number_of_nodes()):
+    # hubs_auths_whole = hubs_authorities_eigen(cits_refs_graph, neigs=1)
+    hubs_auths_whole = HA.iterate_hubs_auths(cits_refs_graph, k=1000)
 # nodes sorted by authority coef
 top_auths_whole = hubs_auths_whole.sort_values(by="xauth_0", ascending=False).index
 print(top_auths_whole)
@@ -101,4 +102,5 @@ auths_ranks = HA.get_top_authorities(hubs_auths_whole, cits_refs_graph, drop_zer
 df = pd.DataFrame(columns=["cits_rank", "authority_rank"])
 df["cits_rank"] = cits_ranks
 df["authority_rank"] = auths_ranks
+import seaborn as sns  # only needed for this plot
 sns.jointplot("cits_rank", "authority_rank", df, kind="kde")
@@ -1,30 +1,42 @@
 # Data management
 import pandas as pd
+import scipy.sparse
 # Utilitaires
-import time
+import ast
 import os
 # UserDefined module
 from CitNet import Utils
 from CitNet import GraphCN
+from CitNet import EdgesStream
+from CitNet import Metrics
 
 #####################################################################
 # GRAPH CITATIONS
 #
 # Input: refs.csv
 #        cits.csv
-#        attrs.csv
-# Output:cits_ids.csv
-#        refs_ids.csv
+#        attrs_nos.csv
+# Output:cits_edges.csv
+#        refs_edges.csv
+#        AdjMat_CitsRefs.npz - Sparse adjacency mat of citations
 #####################################################################
 
 #####################################################################
 # Path to the data
 path = os.path.join(os.getcwd(), "Tables")
+# Stage timings (JSON lines)
+Metrics.enable(path + "/metrics.jsonl")
+# Parameters
+# streaming: refs.csv and cits.csv are read by chunks of chunksize rows and
+# deduplicated by partitions of at most memory bytes (see EdgesStream)
+streaming = True
+chunksize = 100000
+memory = 256 * 2 ** 20
+# n_jobs: worker processes of the streaming matching (os.cpu_count() if None, 1 for chunks in process)
+n_jobs = None
 #####################################################################
 # Load the data
-refs = pd.read_csv(path + "refs.csv")
-cits = pd.read_csv(path + "cits.csv", header=None)
-attrs = pd.read_csv(path + "attrs_nos.csv", encoding="ISO-8859-1")
+attrs = pd.read_csv(path + "/attrs_nos.csv", encoding="ISO-8859-1")
 
 
 #####################################################################
@@ -33,41 +45,81 @@ attrs = pd.read_csv(path + "attrs_nos.csv", encoding="ISO-8859-1")
 
 
 #####################################################################
-# Pre processing of cits to uniformize format with refs.csv
-cits["listed"] = cits[0].apply(Utils.str_to_list)
-cits["referred_to"] = cits["listed"].apply(lambda x: x[0])
-cits["referring"] = cits["listed"].apply(lambda x: x[1])
-cits = cits[["referred_to", "referring"]]
 # Uniformize the format of the urls
 to_remove = "https://ideas.repec.org/a/"
 parse_url_ideas = lambda x: Utils.parse_url(x, to_remove)
 attrs["url_id"] = attrs["url"].apply(parse_url_ideas)
+# Get the series which index are the articles number and which field are their urls
+id_series = attrs["url_id"]
 
 
 #####################################################################
 # Section 2. Matching urls index (of attrs)
+# Section 3. Adjacency matrix
+# NB: the process pool of the parallel matching needs the __main__ guard
 #####################################################################
 
 
-#####################################################################
-# Get the series which index are the articles number and which field are their urls
-id_series = attrs["url_id"]
-# Match article id for all refs (TAKES APPROX 7 1/2 HOURS !)
-start = time.clock()
-modified_refs = GraphCN.match_articles(refs, id_series)
-modified_refs.to_csv(path + "/refs_id.csv")  # refs_edges.csv ?
-end = time.clock()
-print(end - start)
-# Match article id for all cits (TAKES APPROX 3 1/2 HOURS !)
-start = time.clock()
-modified_cits = GraphCN.match_articles(cits, id_series, begin_with="referring")
-modified_cits.to_csv(path + "/cits_id.csv")  # cits_edges.csv ?
-end = time.clock()
-print(end - start)
+if __name__ == "__main__":
+    if streaming and n_jobs != 1:
+        #################################################################
+        # Match, sort and deduplicate refs and cits edges by shards on a process pool
+        with Metrics.stage("parallel_refs", n_jobs=n_jobs):
+            print(EdgesStream.parallel_match_edges(path + "/refs.csv", id_series, path + "/refs_edges.csv",
+                                                   first="referring", n_jobs=n_jobs, memory=memory))
+        with Metrics.stage("parallel_cits", n_jobs=n_jobs):
+            print(EdgesStream.parallel_match_edges(path + "/cits.csv", id_series, path + "/cits_edges.csv",
+                                                   first="referred_to", n_jobs=n_jobs, memory=memory))
+        modified_refs = pd.read_csv(path + "/refs_edges.csv")
+        modified_cits = pd.read_csv(path + "/cits_edges.csv")
+    elif streaming:
+        #################################################################
+        # Match, sort and deduplicate refs and cits edges chunk by chunk
+        with Metrics.stage("stream_refs"):
+            print(EdgesStream.stream_edges(path + "/refs.csv", id_series, path + "/refs_edges.csv",
+                                           first="referring", chunksize=chunksize, memory=memory))
+        with Metrics.stage("stream_cits"):
+            print(EdgesStream.stream_edges(path + "/cits.csv", id_series, path + "/cits_edges.csv",
+                                           first="referred_to", chunksize=chunksize, memory=memory))
+        modified_refs = pd.read_csv(path + "/refs_edges.csv")
+        modified_cits = pd.read_csv(path + "/cits_edges.csv")
+    else:
+        #################################################################
+        # Pre processing of refs and cits (rows "['eja', 'eja_ref']" written by DbScrap.py)
+        # refs: the article refers to eja_ref, cits: the article is cited by eja_cit
+        refs = pd.read_csv(path + "/refs.csv", header=None)
+        cits = pd.read_csv(path + "/cits.csv", header=None)
+        refs["listed"] = refs[0].apply(ast.literal_eval)
+        refs["referring"] = refs["listed"].apply(lambda x: x[0])
+        refs["referred_to"] = refs["listed"].apply(lambda x: x[1])
+        refs = refs[["referring", "referred_to"]]
+        cits["listed"] = cits[0].apply(ast.literal_eval)
+        cits["referred_to"] = cits["listed"].apply(lambda x: x[0])
+        cits["referring"] = cits["listed"].apply(lambda x: x[1])
+        cits = cits[["referred_to", "referring"]]
+        # Match article id for all refs (TAKES APPROX 7 1/2 HOURS !)
+        with Metrics.stage("match_refs", rows=len(refs)):
+            modified_refs = GraphCN.match_articles(refs, id_series)
+            modified_refs = modified_refs.dropna().astype(int)[["referring", "referred_to"]]
+            modified_refs.to_csv(path + "/refs_edges.csv", index=False)
+        # Match article id for all cits (TAKES APPROX 3 1/2 HOURS !)
+        with Metrics.stage("match_cits", rows=len(cits)):
+            modified_cits = GraphCN.match_articles(cits, id_series, begin_with="referring")
+            modified_cits = modified_cits.dropna().astype(int)[["referred_to", "referring"]]
+            modified_cits.to_csv(path + "/cits_edges.csv", index=False)
+
+    #################################################################
+    # Section 3: union of refs and cits edges, one row/column per article of attrs
+    # (compact: int32 indices, float32 values)
+    edges_df, edges_stats = GraphCN.union_edges(modified_refs, modified_cits, n=len(attrs))
+    Metrics.emit("edges_union", **edges_stats)
+    print(edges_stats)
+    adjacency_matrix = GraphCN.compact_matrix(GraphCN.edgesdf_to_csr(edges_df, n=len(attrs)))
+    scipy.sparse.save_npz(path + "/AdjMat_CitsRefs.npz", adjacency_matrix)
 
 
 #####################################################################
-# Output:cits_ids.csv
-#        refs_ids.csv
+# Output:cits_edges.csv
+#        refs_edges.csv
+#        AdjMat_CitsRefs.npz
 #####################################################################
-
@@ -0,0 +1,39 @@
+import scipy.sparse
+import os
+from CitNet import Similarity
+
+
+#####################################################################
+# SIMILARITY INDEX
+#
+# Input: AdjMat_CitsRefs.npz - Sparse adjacency mat of citations
+# Output: SimIndex_cocitation.npz - top k co-cited articles
+#         SimIndex_coupling.npz   - top k bibliographically coupled
+#                                   articles
+#####################################################################
+
+#####################################################################
+# Path to the data
+path = os.path.join(os.getcwd(), "Tables")
+# Parameters
+k = 20
+block_size = 1024
+
+
+#####################################################################
+# Section 1. Top k similar articles
+# NB: the process pool needs the __main__ guard
+#####################################################################
+if __name__ == "__main__":
+    adj_mat = scipy.sparse.load_npz(path + "/AdjMat_CitsRefs.npz")
+    for kind in ["cocitation", "coupling"]:
+        ids, scores = Similarity.topk_similarity(adj_mat, kind, k=k, block_size=block_size)
+        Similarity.save_simindex(path + "/SimIndex_" + kind + ".npz", ids, scores)
+    # ids, scores = Similarity.load_simindex(path + "/SimIndex_cocitation.npz") # to load
+    # Similarity.get_similar(ids, scores, node)
+
+
+#####################################################################
+# Output: SimIndex_cocitation.npz
+#         SimIndex_coupling.npz
+#####################################################################
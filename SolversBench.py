@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import os
+from CitNet import PageRank
+
+
+#####################################################################
+# PAGERANK SOLVERS BENCHMARK
+#
+# Input: AdjMat_CitsRefs.npz - Sparse adjacency mat of citations
+#        AdjMat_Auth.npz     - Sparse weighted adjacency mat of
+#                              co-authorship
+# Output: solvers_bench.csv - time to tolerance, iterations and
+#                             residual of each solver
+#####################################################################
+
+#####################################################################
+# Path to the data
+path = os.path.join(os.getcwd(), "Tables")
+# Parameters
+epsilon = 1e-08
+max_iter = 1000
+thetas = [.85, .95, .99]
+
+
+#####################################################################
+# Section 1. Load the matrices
+#####################################################################
+# The matrices are stored compact (float32), an epsilon of 1e-08 is only reachable in float64
+adj_mats = {"citations": scipy.sparse.load_npz(path + "/AdjMat_CitsRefs.npz").astype(np.float64),
+            "co-authorship": scipy.sparse.load_npz(path + "/AdjMat_Auth.npz").astype(np.float64)}
+
+
+#####################################################################
+# Section 2. Time to tolerance of each solver
+#####################################################################
+results = []
+for name, adj_mat in adj_mats.items():
+    for theta in thetas:
+        for info in PageRank.compare_solvers(adj_mat, theta=theta, epsilon=epsilon, max_iter=max_iter):
+            info.update({"graph": name, "theta": theta})
+            results.append(info)
+bench_df = pd.DataFrame(results, columns=["graph", "theta", "solver", "time",
+                                          "iterations", "residual", "converged"])
+print(bench_df.sort_values(by=["graph", "theta", "time"]).to_string(index=False))
+bench_df.to_csv(path + "/solvers_bench.csv", index=False)
+
+
+#####################################################################
+# Output: solvers_bench.csv
+#####################################################################
@@ -1,12 +1,13 @@
-from distutils.core import setup
+from setuptools import setup
 
 setup(
     name='CitNet',
     version='0.1',
-    packages=[''],
+    packages=['CitNet'],
     url='',
     license='',
     author='cyrilverluise',
     author_email='cyril.verluise@gmail.com',
-    description=''
+    description='',
+    entry_points={'console_scripts': ['citnet = CitNet.Cli:main']}
 )
@@ -0,0 +1,40 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Shared fixtures of the CitNet tests"""
+
+import numpy as np
+import pytest
+import scipy.sparse as sparse
+
+
+def make_citation_graph(n=3000, m=5, seed=0):
+    """
+    Seeded citation graph grown by preferential attachment: article i cites min(i, m) older
+    articles picked in proportion to their in-degree + 1, so that the top of the rankings is
+    well separated
+
+    :param n: (int) number of articles
+    :param m: (int) number of references per article
+    :param seed: (int) random seed
+    :return: (scipy.sparse.csr.csr_matrix) n x n float64 adjacency matrix
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols = [], []
+    # each article appears once plus once per citation received
+    targets = np.zeros(n * (m + 1), dtype=np.int64)
+    n_targets = 1
+    for i in range(1, n):
+        cited = targets[rng.integers(0, n_targets, size=min(i, m))]
+        rows.extend([i] * len(cited))
+        cols.extend(cited)
+        targets[n_targets:n_targets + len(cited) + 1] = np.append(cited, i)
+        n_targets += len(cited) + 1
+    adj_mat = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+    adj_mat.data[:] = 1
+    return adj_mat
+
+
+@pytest.fixture(scope="session")
+def citation_graph():
+    return make_citation_graph()
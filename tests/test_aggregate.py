@@ -0,0 +1,84 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Citation flows between groups of articles against loops over the edges"""
+
+from collections import Counter
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sparse
+from CitNet import Aggregate
+
+
+@pytest.fixture(scope="module")
+def attrs(citation_graph):
+    """
+    Journal and date of the fixture articles, a few of them unknown
+    """
+    n = citation_graph.shape[0]
+    rng = np.random.default_rng(0)
+    journals = pd.Series(rng.choice(["aer", "ecta", "jpe", "qje", "restud"], size=n), dtype=object)
+    journals[rng.random(n) < .02] = np.nan
+    dates = pd.Series(["{0}-0{1}".format(1990 + i * 10 // n, 1 + i % 9) for i in range(n)], dtype=object)
+    dates[rng.random(n) < .02] = np.nan
+    # the last articles are not in the attributes table
+    return pd.DataFrame({"journal": journals, "date": dates}, index=np.arange(n)).iloc[:-10]
+
+
+def test_journal_flows(citation_graph, attrs):
+    flows, journals = Aggregate.journal_flows(citation_graph, attrs)
+    journal = attrs["journal"].reindex(np.arange(citation_graph.shape[0]))
+    expected = Counter((journal[i], journal[j]) for i, j in zip(*citation_graph.nonzero())
+                       if isinstance(journal[i], str) and isinstance(journal[j], str))
+    assert list(journals) == sorted(journal.dropna().unique())
+    position = {name: g for g, name in enumerate(journals)}
+    assert (flows != 0).nnz == len(expected)
+    for (citing, cited), count in expected.items():
+        assert flows[position[citing], position[cited]] == count
+    ranks = Aggregate.rank_journals(flows, journals)
+    assert np.allclose(ranks.loc[journals, "self_cits"], flows.diagonal())
+    assert np.allclose(ranks.loc[journals, "cits_received"], np.asarray(flows.sum(axis=0)).ravel() - flows.diagonal())
+    assert abs(ranks["pr_score"].sum() - 1) < 1e-08
+
+
+def test_journal_year_flows(citation_graph, attrs):
+    n = citation_graph.shape[0]
+    journal = attrs["journal"].reindex(np.arange(n))
+    year = attrs["date"].reindex(np.arange(n)).str[:4]
+    for by in ("citing", "cited"):
+        flows = Aggregate.journal_year_flows(citation_graph, attrs, by=by)
+        # the citations received by the articles of a journal, by year of the citing or cited article
+        edges = [(i if by == "citing" else j, j) for i, j in zip(*citation_graph.nonzero())]
+        expected = Counter((int(year[dated]), journal[j]) for dated, j in edges
+                           if isinstance(year[dated], str) and isinstance(journal[j], str))
+        assert flows.values.sum() == sum(expected.values())
+        for (y, name), count in expected.items():
+            assert flows.loc[y, name] == count
+    with pytest.raises(ValueError):
+        Aggregate.journal_year_flows(citation_graph, attrs, by="journal")
+
+
+def test_author_citation_graph(citation_graph):
+    n = citation_graph.shape[0]
+    rng = np.random.default_rng(1)
+    # 0 (unsigned) to 3 authors per article out of 500, an author listed twice counts once
+    auths_nos = pd.Series([list(rng.integers(0, 500, size=rng.integers(0, 4))) for i in range(n)])
+    auths_nos[0] = [3, 3]
+    for fractional in (False, True):
+        authorship = Aggregate.get_authorship(auths_nos, fractional=fractional)
+        flows = Aggregate.aggregate_flows(citation_graph, authorship).toarray()
+        expected = np.zeros(flows.shape)
+        for i, j in zip(*citation_graph.nonzero()):
+            citing, cited = set(auths_nos[i]), set(auths_nos[j])
+            for a in citing:
+                for b in cited:
+                    expected[a, b] += 1 / (len(citing) * len(cited)) if fractional else 1
+        assert np.allclose(flows, expected)
+    assert authorship[0].nnz == 1 and authorship[0, 3] == 1
+    # fractional credit: each citation between signed articles counts once in total
+    signed = np.array([len(nos) > 0 for nos in auths_nos])
+    assert np.isclose(flows.sum(), citation_graph[signed][:, signed].sum())
+    ranks = Aggregate.rank_authors(sparse.csr_matrix(flows))
+    assert ranks.index.name == "author" and len(ranks) == flows.shape[0]
+    assert np.allclose(ranks.sort_index()["self_cits"], np.diag(flows))
@@ -0,0 +1,34 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Benchmark comparison and exit status of citnet bench"""
+
+import pytest
+from CitNet import Bench, Cli, GraphCN
+
+
+def make_run(**times):
+    return {"stages": [{"stage": stage, "time": time} if time is not None else
+                       {"stage": stage, "time": None, "error": "TypeError()"} for stage, time in times.items()]}
+
+
+def test_failed_stage_is_a_regression():
+    reference = make_run(graph=1., matching=2., hits=1.)
+    comparison = Bench.compare_runs(reference, make_run(graph=1.1, matching=None, hits=3.)).set_index("stage")
+    assert not comparison.loc["graph", "regression"]
+    assert comparison.loc["matching", "regression"]
+    assert comparison.loc["matching", "error"] == "TypeError()"
+    assert comparison.loc["hits", "regression"]
+    assert Bench.failed_stages(make_run(graph=1., matching=None)) == ["matching"]
+
+
+def test_cli_exits_on_failed_stage(tmp_path, monkeypatch):
+    argv = ["--path", str(tmp_path), "bench", "--sizes", "2000", "--stages", "graph", "matching", "--repeat", "1"]
+    Cli.main(argv)
+
+    def broken(*args, **kwargs):
+        raise TypeError("broken matching")
+    monkeypatch.setattr(GraphCN, "match_articles", broken)
+    with pytest.raises(SystemExit) as exit_info:
+        Cli.main(argv)
+    assert exit_info.value.code == 1
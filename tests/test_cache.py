@@ -0,0 +1,73 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Query cache keys and bounds"""
+
+import os
+import networkx as nx
+import numpy as np
+import pandas as pd
+from CitNet import Cache, InvIndex
+
+
+def test_graph_version_follows_edges():
+    graph = nx.DiGraph([(0, 1), (1, 2), (2, 0)])
+    version = Cache.graph_version(graph)
+    # rewiring in place keeps the number of nodes and edges
+    graph.remove_edge(2, 0)
+    graph.add_edge(0, 2)
+    assert Cache.graph_version(graph) != version
+    assert Cache.graph_version(nx.DiGraph([(0, 2), (1, 2), (0, 1)])) == Cache.graph_version(graph)
+
+
+def test_query_modes_do_not_share_entries():
+    graph = nx.DiGraph([(1, 0), (2, 0), (2, 1)])
+    attrs = pd.DataFrame({"title": ["Trading volume", "Monetary policy", "Informed trading"],
+                          "keywords": "", "jel_code": ""}, index=np.arange(3))
+    cache = Cache.QueryCache()
+    # the substring search is case sensitive, the inverted index is not
+    substring = Cache.cached_topic_hits(cache, graph, 10, attrs, ["trading"])
+    index = Cache.cached_topic_hits(cache, graph, 10, attrs, ["trading"], index=InvIndex.build_index(attrs))
+    # roots 2 (substring) or 0 and 2 (index), expanded with their successors and predecessors
+    assert sorted(substring.index) == [0, 1]
+    assert sorted(index.index) == [0, 1, 2]
+    assert cache.stats()["misses"] == 2
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    entry = {"nodes": np.arange(1000), "xauth_0": np.ones(1000), "xhubs_0": np.ones(1000)}
+    cache = Cache.QueryCache(cache_dir=str(tmp_path), max_disk_bytes=60000)
+    for i in range(10):
+        cache.put(("topic", i), entry)
+    files = os.listdir(str(tmp_path))
+    assert sum(os.path.getsize(os.path.join(str(tmp_path), file)) for file in files) <= 60000
+    assert cache.stats()["disk_evictions"] == 10 - len(files)
+    # the most recent entries are kept
+    assert os.path.basename(cache.disk_path(("topic", 9))) in files
+
+
+def test_versions_computed_once_per_object(monkeypatch):
+    graph = nx.DiGraph([(1, 0), (2, 0), (2, 1)])
+    attrs = pd.DataFrame({"title": ["Trading volume", "Monetary policy", "Informed trading"],
+                          "keywords": "", "jel_code": ""}, index=np.arange(3))
+    cache = Cache.QueryCache()
+    calls = []
+    graph_version = Cache.graph_version
+    monkeypatch.setattr(Cache, "graph_version", lambda graph: calls.append(graph) or graph_version(graph))
+    for _ in range(3):
+        Cache.cached_topic_hits(cache, graph, 10, attrs, ["trading"])
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 2
+    # an article appended to the attributes table (new object) changes the roots of the query
+    attrs = pd.concat([attrs, pd.DataFrame({"title": ["Monetary trading"], "keywords": "", "jel_code": ""},
+                                           index=[3])])
+    Cache.cached_topic_hits(cache, graph, 10, attrs, ["trading"])
+    assert len(calls) == 1
+    assert cache.stats()["misses"] == 2
+    # a graph modified in place is forgotten to be hashed again
+    graph.add_edge(3, 1)
+    cache.forget(graph)
+    results = Cache.cached_topic_hits(cache, graph, 10, attrs, ["trading"])
+    assert len(calls) == 2
+    assert cache.stats()["misses"] == 3
+    assert results.equals(Cache.cached_topic_hits(Cache.QueryCache(), graph, 10, attrs, ["trading"]))
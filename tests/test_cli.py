@@ -0,0 +1,36 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Cold start of the command line interface"""
+
+import os
+import subprocess
+import sys
+import time
+from CitNet import Cli
+
+# the fresh interpreters import CitNet from the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(Cli.__file__)))
+
+
+def loaded_modules(code, modules):
+    """
+    Modules among modules imported by a fresh interpreter running code
+    """
+    code += "\nimport sys\nprint(','.join(m for m in {0!r} if m in sys.modules))".format(modules)
+    loaded = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT).decode().strip()
+    return [module for module in loaded.split(",") if module]
+
+
+def test_cli_imports_are_lazy():
+    assert loaded_modules("import CitNet.Cli", Cli.LAZY_MODULES + ("numpy", "pandas", "scipy")) == []
+    assert loaded_modules("import " + ", ".join(Cli.CORE_MODULES), Cli.LAZY_MODULES) == []
+
+
+def test_cold_start_budget():
+    timings = []
+    for i in range(3):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, "-m", "CitNet", "--help"], stdout=subprocess.DEVNULL, cwd=ROOT)
+        timings.append(time.perf_counter() - start)
+    assert min(timings) < Cli.COLD_START_BUDGET
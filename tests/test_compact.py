@@ -0,0 +1,75 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Compact (int32/float32) HITS and PageRank against the float64 computations"""
+
+import numpy as np
+import scipy.sparse as sparse
+from CitNet import HubsAuths, PageRank
+
+TOP_K = 20
+
+
+def assert_same_top(ref_scores, scores, k=TOP_K, rtol=1e-5):
+    """
+    The top k of scores matches the top k of ref_scores, nodes tied in ref_scores (up to rtol)
+    may come in any order
+    """
+    ref_top = np.argsort(-ref_scores, kind="stable")[:k]
+    top = np.argsort(-scores, kind="stable")[:k]
+    np.testing.assert_allclose(ref_scores[top], ref_scores[ref_top], rtol=rtol)
+
+
+def test_pagerank_compact_rankings(citation_graph):
+    pr_64 = PageRank.get_pagerank(citation_graph, epsilon=1e-10, max_iter=1000)
+    pr_32 = PageRank.get_pagerank(citation_graph, epsilon=1e-07, max_iter=1000, compact=True)
+    assert pr_64.dtype == np.float64 and pr_32.dtype == np.float32
+    np.testing.assert_array_equal(np.argsort(-pr_32)[:TOP_K], np.argsort(-pr_64)[:TOP_K])
+    assert np.abs(pr_32 - pr_64).sum() < 1e-05
+
+
+def test_pagerank_batch_compact_rankings(citation_graph):
+    n = citation_graph.shape[0]
+    pers_mat, _ = PageRank.get_persmat(np.arange(n) % 3)
+    pr_64 = PageRank.get_pagerank_batch(citation_graph, pers_mat, epsilon=1e-10, max_iter=1000)
+    pr_32 = PageRank.get_pagerank_batch(citation_graph, pers_mat, epsilon=1e-07, max_iter=1000, compact=True)
+    for j in range(pr_64.shape[1]):
+        assert_same_top(pr_64[:, j], pr_32[:, j])
+    assert np.abs(pr_32 - pr_64).sum(axis=0).max() < 1e-05
+
+
+def test_hits_compact_rankings(citation_graph):
+    auths_64, hubs_64 = HubsAuths.iterate_hubs_auths_sparse(citation_graph, 200)
+    auths_32, hubs_32 = HubsAuths.iterate_hubs_auths_sparse(citation_graph, 200, compact=True)
+    assert auths_64.dtype == np.float64 and auths_32.dtype == np.float32
+    assert_same_top(auths_64, auths_32)
+    assert_same_top(hubs_64, hubs_32)
+    assert np.abs(auths_32 - auths_64).sum() < 1e-04
+    assert np.abs(hubs_32 - hubs_64).sum() < 1e-04
+
+
+def test_precision_follows_compact_flag(citation_graph):
+    adj_32 = sparse.csr_matrix(citation_graph, dtype=np.float32)
+    assert PageRank.get_pagerank(adj_32).dtype == np.float64
+    assert HubsAuths.iterate_hubs_auths_sparse(adj_32)[0].dtype == np.float64
+
+
+def test_compact_convergence_is_reported(citation_graph):
+    # float32 iterates cannot reach 1e-12: no false convergence, and no mass leak
+    pr_vec, info = PageRank.get_pagerank(citation_graph, epsilon=1e-12, max_iter=1000, compact=True,
+                                         return_info=True)
+    assert not info["converged"]
+    assert info["residual"] > 1e-12
+    assert abs(pr_vec.sum(dtype=np.float64) - 1) < 1e-06
+    pr_vec, info = PageRank.get_pagerank(citation_graph, epsilon=1e-12, max_iter=1000, return_info=True)
+    assert info["converged"]
+    assert abs(pr_vec.sum() - 1) < 1e-12
+
+
+def test_eigen_precision_follows_compact_flag():
+    import networkx as nx
+    graph = nx.gnp_random_graph(200, .05, seed=1, directed=True)
+    x_32, _ = HubsAuths.compute_authorities(graph, compact=True)
+    x_64, _ = HubsAuths.compute_authorities(graph)
+    assert x_32.dtype == np.float32 and x_64.dtype == np.float64
+    np.testing.assert_allclose(np.abs(x_32), np.abs(x_64), atol=1e-06)
@@ -0,0 +1,98 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Matching of the edge files (streamed, sharded, in memory) and union of the refs and cits edges"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from CitNet import EdgesStream, GraphCN
+
+
+@pytest.fixture(scope="module")
+def crawl(citation_graph, tmp_path_factory):
+    """
+    Urls of 400 articles (two of them sharing a url) and a refs.csv file of their edges, as
+    written by DbScrap.py, with duplicated rows and references to articles out of the crawl
+    """
+    n = 400
+    urls = pd.Series(["ed/journ/v{0}.html".format(i) for i in range(n)], index=np.arange(n))
+    urls[7] = urls[8]
+    referring, referred_to = citation_graph[:n][:, :n].nonzero()
+    rows = [[urls[i], urls[j]] for i, j in zip(referring, referred_to)]
+    rows += rows[:50] + [[urls[i], "ed/other/v{0}.html".format(i)] for i in range(30)]
+    rows = [rows[i] for i in np.random.default_rng(0).permutation(len(rows))]
+    file = str(tmp_path_factory.mktemp("crawl") / "refs.csv")
+    stack = np.empty(len(rows), dtype=object)
+    stack[:] = rows
+    pd.DataFrame(stack).to_csv(file, index=False, header=False)
+    return file, urls, rows
+
+
+def in_memory_edges(rows, urls):
+    """
+    Sorted unique edges of the rows, matched with GraphCN.match_articles
+    """
+    refs = pd.DataFrame(rows, columns=["referring", "referred_to"])
+    matched = GraphCN.match_articles(refs, urls, begin_with="referring").dropna().astype(np.int64)
+    return matched.drop_duplicates().sort_values(["referring", "referred_to"]).reset_index(drop=True)
+
+
+def test_stream_edges_matches_in_memory(crawl, tmp_path):
+    file, urls, rows = crawl
+    expected = in_memory_edges(rows, urls)
+    assert not expected.isin([7, 8]).any().any()
+    # a few rows per chunk and a few kB per partition: several chunks and partitions
+    for chunksize, memory in ((10 ** 6, 2 ** 30), (97, 2 ** 12)):
+        out_file = str(tmp_path / "refs_edges.csv")
+        stats = EdgesStream.stream_edges(file, urls, out_file, chunksize=chunksize, memory=memory)
+        assert pd.read_csv(out_file).equals(expected)
+        assert stats["rows"] == len(rows) and stats["edges"] == len(expected)
+        assert stats["chunks"] == -(-len(rows) // chunksize)
+    assert stats["partitions"] > 1
+    # cits.csv rows start with the cited article
+    cits_file = str(tmp_path / "cits.csv")
+    stack = np.empty(len(rows), dtype=object)
+    stack[:] = [row[::-1] for row in rows]
+    pd.DataFrame(stack).to_csv(cits_file, index=False, header=False)
+    EdgesStream.stream_edges(cits_file, urls, out_file, first="referred_to", chunksize=97, memory=2 ** 12)
+    assert pd.read_csv(out_file).equals(expected)
+
+
+def test_parallel_matching_matches_streaming(crawl, tmp_path):
+    file, urls, rows = crawl
+    EdgesStream.stream_edges(file, urls, str(tmp_path / "streamed.csv"))
+    expected = pd.read_csv(str(tmp_path / "streamed.csv"))
+    # shards of a few hundred bytes: their bounds fall inside rows
+    for n_jobs, shard_bytes, memory in ((1, 2 ** 30, 2 ** 30), (1, 500, 2 ** 12), (2, 1000, 2 ** 12)):
+        out_file = str(tmp_path / "refs_edges.csv")
+        stats = EdgesStream.parallel_match_edges(file, urls, out_file, n_jobs=n_jobs, shard_bytes=shard_bytes,
+                                                 memory=memory)
+        assert pd.read_csv(out_file).equals(expected)
+        assert stats["rows"] == len(rows) and stats["edges"] == len(expected)
+    assert stats["shards"] > 1 and stats["partitions"] > 1
+    # every line is read by exactly one shard, whatever the bounds
+    data = open(file, "rb").read()
+    for n_shards in (1, 7, 1000):
+        bounds = [shard * len(data) // n_shards for shard in range(n_shards + 1)]
+        assert b"".join(EdgesStream.read_shard(file, start, stop) for start, stop in zip(bounds, bounds[1:])) == data
+
+
+def test_union_edges_provenance(citation_graph):
+    referring, referred_to = citation_graph.nonzero()
+    rng = np.random.default_rng(0)
+    # each edge seen in the references of the citing article, the citations of the cited one or both
+    seen = rng.integers(1, 4, size=len(referring))
+    edges_df = pd.DataFrame({"referring": referring, "referred_to": referred_to})
+    refs = edges_df[seen & GraphCN.IN_REFS > 0]
+    cits = edges_df[seen & GraphCN.IN_CITS > 0]
+    union, stats = GraphCN.union_edges(pd.concat([refs, refs.iloc[:100]]), cits.sample(frac=1, random_state=0),
+                                       n=citation_graph.shape[0])
+    assert np.array_equal(union["referring"], referring) and np.array_equal(union["referred_to"], referred_to)
+    assert np.array_equal(union["provenance"], seen)
+    assert stats["refs_rows"] == len(refs) + 100 and stats["refs_edges"] == len(refs)
+    assert stats["both"] == (seen == 3).sum() and stats["refs_only"] + stats["cits_only"] + stats["both"] == len(seen)
+    assert stats["coverage"] == (seen == 3).mean()
+    assert (GraphCN.edgesdf_to_csr(union, n=citation_graph.shape[0]) != citation_graph).nnz == 0
+    empty = pd.DataFrame({"referring": [], "referred_to": []})
+    assert len(GraphCN.union_edges(empty, empty)[0]) == 0
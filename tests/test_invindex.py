@@ -0,0 +1,43 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Inverted index kept in sync with the attributes table"""
+
+import numpy as np
+import pandas as pd
+from CitNet import InvIndex
+
+
+def make_attrs(titles):
+    return pd.DataFrame({"title": titles, "keywords": "", "jel_code": ""}, index=np.arange(len(titles)))
+
+
+def test_index_rebuilt_when_attrs_change(tmp_path):
+    file = str(tmp_path / "InvIndex.npz")
+    attrs = make_attrs(["Asymmetric trading", "Monetary policy"])
+    index = InvIndex.get_index(attrs, file)
+    assert list(InvIndex.index_query(index, ["trading"])) == [0]
+    # same table: the saved index is reused
+    assert list(InvIndex.index_query(InvIndex.get_index(attrs, file), ["trading"])) == [0]
+    # appended article (incremental crawl): the saved index is stale and rebuilt
+    attrs = make_attrs(["Asymmetric trading", "Monetary policy", "High frequency trading"])
+    assert list(InvIndex.index_query(InvIndex.get_index(attrs, file), ["trading"])) == [0, 2]
+    assert list(InvIndex.index_query(InvIndex.load_index(file), ["trading"])) == [0, 2]
+
+
+def test_index_without_source_hash_is_rebuilt(tmp_path):
+    file = str(tmp_path / "InvIndex.npz")
+    InvIndex.save_index(InvIndex.build_index(make_attrs(["Monetary policy"])), file)
+    attrs = make_attrs(["Monetary policy", "Asymmetric trading"])
+    assert list(InvIndex.index_query(InvIndex.get_index(attrs, file), ["trading"])) == [1]
+
+
+def test_empty_queries():
+    index = InvIndex.build_index(make_attrs(["Asymmetric trading", "Monetary policy"]))
+    assert InvIndex.postings_inter([]).dtype == np.int32
+    assert len(InvIndex.postings_inter([])) == 0
+    assert len(InvIndex.postings_union([])) == 0
+    for how in ("inter", "union"):
+        assert len(InvIndex.index_query(index, [], how=how)) == 0
+        assert len(InvIndex.index_query(index, ["trading"], search_in=(), how=how)) == 0
+    assert list(InvIndex.index_query(index, ["trading"], search_in=("title",), how="inter")) == [0]
@@ -0,0 +1,98 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Matrix-free PageRank against networkx"""
+
+import networkx as nx
+import numpy as np
+import pytest
+import scipy.sparse as sparse
+from CitNet import Metrics, PageRank
+
+
+def nx_pagerank(adj_mat, **kwargs):
+    graph = nx.from_scipy_sparse_array(adj_mat, create_using=nx.DiGraph)
+    pr_dict = nx.pagerank(graph, tol=1e-13, max_iter=1000, **kwargs)
+    return np.array([pr_dict[i] for i in range(adj_mat.shape[0])])
+
+
+def test_pagerank_matches_networkx(citation_graph):
+    pr_vec = PageRank.get_pagerank(citation_graph, epsilon=1e-12, max_iter=1000)
+    assert isinstance(pr_vec, np.ndarray) and pr_vec.shape == (citation_graph.shape[0], )
+    assert np.abs(pr_vec - nx_pagerank(citation_graph)).sum() < 1e-09
+
+
+def test_pagerank_weighted_with_dangling_nodes():
+    # articles 3 and 4 cite nothing: their mass is spread uniformly
+    adj_mat = sparse.csr_matrix((np.array([1., 2., 3., 4., 5., 6.]),
+                                 (np.array([0, 0, 1, 2, 2, 2]), np.array([0, 2, 2, 0, 1, 2]))), shape=(5, 5))
+    pr_vec = PageRank.get_pagerank(adj_mat, epsilon=1e-14, max_iter=1000)
+    np.testing.assert_allclose(pr_vec, nx_pagerank(adj_mat), atol=1e-12)
+    assert abs(pr_vec.sum() - 1) < 1e-12
+
+
+def test_batch_matches_single_vector(citation_graph, tmp_path):
+    n = citation_graph.shape[0]
+    weights = np.exp(-np.arange(n) / n)
+    pers_mat, labels = PageRank.get_persmat(np.arange(n) % 4, weights)
+    Metrics.enable(str(tmp_path / "metrics.jsonl"))
+    try:
+        pr_mat, info = PageRank.get_pagerank_batch(citation_graph, pers_mat, epsilon=1e-12, max_iter=1000,
+                                                   return_info=True)
+        spmv = Metrics.COUNTERS["spmv"]
+    finally:
+        Metrics.disable()
+    assert pr_mat.shape == (n, len(labels))
+    assert info["converged"] and info["residual"].shape == (len(labels), )
+    # one block product per iteration, one more for the residual
+    assert spmv == info["iterations"] + 1
+    for j in range(len(labels)):
+        pr_vec = PageRank.get_pagerank(citation_graph, epsilon=1e-12, max_iter=1000,
+                                       personalization=pers_mat[:, j].toarray().ravel())
+        assert np.abs(pr_mat[:, j] - pr_vec).sum() < 1e-10
+
+
+def test_batch_rejects_empty_personalization(citation_graph):
+    n = citation_graph.shape[0]
+    pers_mat = np.zeros((n, 2))
+    pers_mat[0, 0] = 1
+    with pytest.raises(ValueError):
+        PageRank.get_pagerank_batch(citation_graph, pers_mat)
+    with pytest.raises(ValueError):
+        PageRank.get_pagerank(citation_graph, personalization=np.zeros(n))
+
+
+def test_update_matches_full_rebuild(citation_graph):
+    n_old = 2500
+    adj_old = citation_graph[:n_old, :n_old].tocsr()
+    pr_old = PageRank.get_pagerank(adj_old, epsilon=1e-13, max_iter=1000)
+    rows, cols = citation_graph.nonzero()
+    appended = np.column_stack((rows, cols))[rows >= n_old]
+    # an edge already in the graph and an appended edge given twice
+    new_edges = np.vstack((appended, [[10, int(adj_old[10].indices[0])], appended[0]]))
+    adj_new, pr_new, info = PageRank.update_pagerank(adj_old, pr_old, new_edges, epsilon=1e-08)
+    assert (adj_new != citation_graph).nnz == 0
+    pr_full = PageRank.get_pagerank(citation_graph, epsilon=1e-13, max_iter=1000)
+    error = np.abs(pr_new - pr_full).sum()
+    assert error <= info["error_bound"] + 1e-12
+    assert error < 1e-06
+
+
+def test_undirected_weighted_pagerank_matches_networkx(citation_graph):
+    # co-authorship like: symmetric integer weights and isolated (single) authors
+    n = citation_graph.shape[0] + 50
+    rng = np.random.default_rng(1)
+    upper = sparse.triu(citation_graph + citation_graph.T, k=1).tocoo()
+    weights = rng.integers(1, 5, size=upper.nnz).astype(np.float64)
+    upper = sparse.csr_matrix((weights, (upper.row, upper.col)), shape=(n, n))
+    graph = nx.Graph()
+    graph.add_nodes_from(range(n))
+    graph.add_weighted_edges_from(zip(upper.tocoo().row, upper.tocoo().col, weights))
+    pr_dict = nx.pagerank(graph, tol=1e-13, max_iter=1000)
+    pr_nx = np.array([pr_dict[i] for i in range(n)])
+    # the matrix may hold both (i, j) and (j, i) or only one of them
+    for adj_mat in (upper, upper + upper.T):
+        pr_vec = PageRank.get_undirected_pagerank(adj_mat, epsilon=1e-12, max_iter=1000)
+        assert np.abs(pr_vec - pr_nx).sum() < 1e-09
+    pr_32 = PageRank.get_undirected_pagerank(upper, epsilon=1e-07, max_iter=1000, compact=True)
+    assert np.abs(pr_32 - pr_nx).sum() < 1e-05
@@ -0,0 +1,82 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Staleness logic of the pipeline runner, on small script stages"""
+
+import os
+from CitNet import Pipeline
+
+# count.py: number of lines of the input, sum.py: sum of the counts, copy.py: copy of the input
+SCRIPTS = {"count.py": "n = len(open('Tables/lines.txt').read().splitlines())\n"
+                       "open('Tables/count.txt', 'w').write(str(n))\n",
+           "sum.py": "total = int(open('Tables/count.txt').read()) + int(open('Tables/copy.txt').read())\n"
+                     "open('Tables/sum.txt', 'w').write(str(total))\n",
+           "copy.py": "open('Tables/copy.txt', 'w').write(open('Tables/number.txt').read())\n"}
+STAGES = [{"name": "source", "script": "source.py", "inputs": [], "outputs": ["lines.txt"], "external": True},
+          {"name": "count", "script": "count.py", "inputs": ["lines.txt"], "outputs": ["count.txt"]},
+          {"name": "copy", "script": "copy.py", "inputs": ["number.txt"], "outputs": ["copy.txt"]},
+          {"name": "sum", "script": "sum.py", "inputs": ["count.txt", "copy.txt"], "outputs": ["sum.txt"]}]
+
+
+def write(file, text):
+    with open(str(file), "w") as f:
+        f.write(text)
+
+
+def run(root, **kwargs):
+    """
+    Status of each stage after a run
+    """
+    return {record["stage"]: record["status"] for record in Pipeline.run_pipeline(str(root), STAGES, **kwargs)}
+
+
+def test_stale_stages(tmp_path):
+    tables = tmp_path / "Tables"
+    tables.mkdir()
+    for script, code in SCRIPTS.items():
+        write(tmp_path / script, code)
+    write(tables / "lines.txt", "a\nb\n")
+    write(tables / "number.txt", "10")
+    assert run(tmp_path) == {"source": "fresh", "count": "ran", "copy": "ran", "sum": "ran"}
+    assert (tables / "sum.txt").read_text() == "12"
+    assert set(run(tmp_path).values()) == {"fresh"}
+    # same content, new modification time: nothing to run
+    os.utime(str(tables / "lines.txt"), ns=(0, 0))
+    assert set(run(tmp_path).values()) == {"fresh"}
+    # new content, same count: the sum is not stale
+    write(tables / "lines.txt", "c\nd\n")
+    assert run(tmp_path, dry_run=True) == {"source": "fresh", "count": "stale", "copy": "fresh", "sum": "stale"}
+    assert run(tmp_path) == {"source": "fresh", "count": "ran", "copy": "fresh", "sum": "fresh"}
+    write(tables / "lines.txt", "c\nd\ne\n")
+    assert run(tmp_path, targets=["count"]) == {"source": "fresh", "count": "ran"}
+    assert run(tmp_path) == {"source": "fresh", "count": "fresh", "copy": "fresh", "sum": "ran"}
+    assert (tables / "sum.txt").read_text() == "13"
+    # script changed, output modified or deleted, forced
+    write(tmp_path / "copy.py", SCRIPTS["copy.py"] + "\n")
+    write(tables / "sum.txt", "0")
+    assert run(tmp_path) == {"source": "fresh", "count": "fresh", "copy": "ran", "sum": "ran"}
+    os.remove(str(tables / "count.txt"))
+    assert run(tmp_path, force=["copy"]) == {"source": "fresh", "count": "ran", "copy": "ran", "sum": "fresh"}
+    # the external stage only runs when its outputs are missing
+    os.remove(str(tables / "lines.txt"))
+    write(tmp_path / "source.py", "open('Tables/lines.txt', 'w').write('a\\n')\n")
+    assert run(tmp_path) == {"source": "ran", "count": "ran", "copy": "fresh", "sum": "ran"}
+    assert (tables / "sum.txt").read_text() == "11"
+
+
+def test_failed_stage_blocks_the_following_ones(tmp_path):
+    tables = tmp_path / "Tables"
+    tables.mkdir()
+    for script, code in SCRIPTS.items():
+        write(tmp_path / script, code)
+    write(tables / "lines.txt", "a\n")
+    write(tables / "number.txt", "ten")
+    assert run(tmp_path) == {"source": "fresh", "count": "ran", "copy": "ran", "sum": "failed"}
+    assert "ValueError" in (tables / "logs" / "sum.log").read_text()
+    write(tmp_path / "copy.py", "raise SystemExit(3)\n")
+    assert run(tmp_path) == {"source": "fresh", "count": "fresh", "copy": "failed", "sum": "blocked"}
+    # the failed stages have no fingerprint, they run again once fixed
+    write(tmp_path / "copy.py", SCRIPTS["copy.py"])
+    write(tables / "number.txt", "9")
+    assert run(tmp_path) == {"source": "fresh", "count": "fresh", "copy": "ran", "sum": "ran"}
+    assert (tables / "sum.txt").read_text() == "10"
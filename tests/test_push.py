@@ -0,0 +1,37 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Local forward push personalized PageRank against the global solver"""
+
+import numpy as np
+import pytest
+from CitNet import PageRank
+
+
+@pytest.mark.parametrize("seeds", [[2999], [1500, 2000, 2500], [0]])
+def test_push_within_its_error_bound(citation_graph, seeds):
+    n = citation_graph.shape[0]
+    h_mat = PageRank.get_hmat(citation_graph)
+    personalization = np.zeros(n)
+    personalization[seeds] = 1
+    pr_vec = PageRank.get_pagerank(citation_graph, epsilon=1e-13, max_iter=1000, personalization=personalization)
+    for epsilon in (1e-04, 1e-06):
+        nodes, scores, residual = PageRank.push_pagerank(h_mat, seeds, epsilon=epsilon)
+        approx = np.zeros(n)
+        approx[nodes] = scores
+        assert np.abs(approx - pr_vec).sum() <= residual + 1e-12
+        # every residual left is below epsilon times the out-degree of its node (1 if dangling)
+        assert residual <= epsilon * (citation_graph.nnz + n)
+
+
+def test_push_is_local(citation_graph):
+    # an article only reaches the articles it cites, directly or not
+    h_mat = PageRank.get_hmat(citation_graph)
+    nodes, scores, residual = PageRank.push_pagerank(h_mat, [10], epsilon=1e-08)
+    assert set(nodes) <= {0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10}
+    assert set(nodes) >= set(citation_graph[10].indices)
+
+
+def test_push_rejects_empty_seeds(citation_graph):
+    with pytest.raises(ValueError):
+        PageRank.push_pagerank(PageRank.get_hmat(citation_graph), [])
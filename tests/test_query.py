@@ -0,0 +1,70 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Vectorized subgraph expansion against the networkx implementation"""
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+from CitNet import Query
+
+
+@pytest.fixture(scope="module")
+def citation_digraph(citation_graph):
+    return nx.from_scipy_sparse_array(citation_graph, create_using=nx.DiGraph)
+
+
+@pytest.fixture(scope="module")
+def attrs(citation_graph):
+    rng = np.random.default_rng(0)
+    titles = np.where(rng.random(citation_graph.shape[0]) < .01, "Informed trading", "Monetary policy")
+    keywords = np.where(rng.random(citation_graph.shape[0]) < .5, titles, "")
+    return pd.DataFrame({"title": titles, "keywords": keywords}, index=np.arange(citation_graph.shape[0]))
+
+
+def test_gather_neighbours(citation_graph, citation_digraph):
+    nodes = np.array([0, 3, 17, 2999])
+    adj_csc = citation_graph.tocsc()
+    successors, owners = Query.gather_neighbours(citation_graph.indptr, citation_graph.indices, nodes)
+    predecessors, pred_owners = Query.gather_neighbours(adj_csc.indptr, adj_csc.indices, nodes)
+    for node in nodes:
+        assert sorted(successors[owners == node]) == sorted(citation_digraph.successors(node))
+        assert sorted(predecessors[pred_owners == node]) == sorted(citation_digraph.predecessors(node))
+    assert len(Query.gather_neighbours(citation_graph.indptr, citation_graph.indices,
+                                       np.empty(0, dtype=np.int64))[0]) == 0
+
+
+def test_expand_root_sparse(citation_graph, citation_digraph):
+    root_nodes = [0, 5, 42, 1000, 2999, 3000, -1]
+    # d above every in-degree: no sampling, the same nodes as networkx
+    d = int(citation_graph.sum(axis=0).max()) + 1
+    nodes, sub_mat = Query.expand_root_sparse(root_nodes, citation_graph, d, seed=0)
+    assert list(nodes) == sorted(set(Query.expand_root(root_nodes, citation_digraph, d, seed=0)))
+    subgraph = citation_digraph.subgraph(nodes)
+    assert (sub_mat != nx.to_scipy_sparse_array(subgraph, nodelist=nodes)).nnz == 0
+    # sampled: every successor, d predecessors per root at most, depending on the seed only
+    sampled, _ = Query.expand_root_sparse(root_nodes, citation_graph, 3, seed=1)
+    assert set(sampled) <= set(nodes)
+    for root in root_nodes[:5]:
+        assert set(citation_digraph.successors(root)) <= set(sampled)
+        predecessors = set(citation_digraph.predecessors(root))
+        assert len(predecessors & set(sampled)) >= min(3, len(predecessors))
+    assert list(Query.expand_root_sparse(root_nodes, citation_graph, 3, seed=1)[0]) == list(sampled)
+
+
+def test_query_submatrices(citation_graph, citation_digraph, attrs):
+    d = int(citation_graph.sum(axis=0).max()) + 1
+    for how in ("union", "inter"):
+        nodes, sub_mat = Query.topic_query_submatrix(citation_graph, d, attrs, ["trading"],
+                                                     how=how, seed=0)
+        subgraph = Query.topic_query_subgraph(citation_digraph, d, attrs, ["trading"], how=how, seed=0)
+        assert len(nodes) > 0
+        assert list(nodes) == sorted(subgraph.nodes())
+        assert (sub_mat != nx.to_scipy_sparse_array(subgraph, nodelist=nodes)).nnz == 0
+    nodes_list = [3, 17, 250]
+    nodes, sub_mat = Query.similarity_query_submatrix(nodes_list + [3000, -1], citation_graph, d, seed=0)
+    subgraph = Query.similarity_query_subgraph(nodes_list, citation_digraph, d, seed=0)
+    assert list(nodes) == sorted(subgraph.nodes())
+    assert (sub_mat != nx.to_scipy_sparse_array(subgraph, nodelist=nodes)).nnz == 0
+    assert len(Query.similarity_query_submatrix([3000, -1], citation_graph, d)[0]) == 0
@@ -0,0 +1,170 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Fetching layer of the scraper against a local stand-in server"""
+
+import email.utils
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import pytest
+from CitNet import ScrapIR
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """
+    /page: 200 with an ETag, 304 when the request carries it
+    /limited: 429 with Retry-After: 1 on the first request, 200 then
+    /dated: same with Retry-After: an HTTP date 2 seconds ahead
+    /deferred: always 429 with Retry-After: 3600
+    /broken: always 500
+    /missing: always 404
+    /a/ed/journ/same.html: like /page, /a/ed/journ/new.html: a new ETag at each request
+    """
+    requests = defaultdict(list)
+
+    def do_GET(self):
+        StandIn.requests[self.path].append((time.monotonic(), self.headers.get("If-None-Match")))
+        if self.path in ("/page", "/a/ed/journ/same.html"):
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.reply(304)
+            else:
+                self.reply(200, b"<html>page v1</html>", {"ETag": '"v1"'})
+        elif self.path == "/limited" and len(StandIn.requests[self.path]) == 1:
+            self.reply(429, headers={"Retry-After": "1"})
+        elif self.path == "/dated" and len(StandIn.requests[self.path]) == 1:
+            self.reply(429, headers={"Retry-After": email.utils.formatdate(time.time() + 2, usegmt=True)})
+        elif self.path in ("/limited", "/dated"):
+            self.reply(200, b"<html>limited</html>")
+        elif self.path == "/deferred":
+            self.reply(429, headers={"Retry-After": "3600"})
+        elif self.path == "/a/ed/journ/new.html":
+            etag = '"v{0}"'.format(len(StandIn.requests[self.path]))
+            self.reply(200, b"<html>" + etag.encode() + b"</html>", {"ETag": etag})
+        elif self.path == "/broken":
+            self.reply(500)
+        else:
+            self.reply(404)
+
+    def reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def stand_in(tmp_path):
+    StandIn.requests.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    thread = threading.Thread(target=server.serve_forever, args=(.05, ), daemon=True)
+    thread.start()
+    config = dict(ScrapIR.CONFIG)
+    ScrapIR.configure(store_dir=str(tmp_path / "pages"), rate=1000., burst=100, retries=3, backoff=.001,
+                      max_backoff=5., timeout=5.)
+    yield "http://127.0.0.1:{0}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+    ScrapIR.CONFIG.clear()
+    ScrapIR.CONFIG.update(config)
+    ScrapIR.BUCKETS.clear()
+
+
+def test_not_modified_reuses_stored_page(stand_in):
+    assert ScrapIR.fetch(stand_in + "/page") == b"<html>page v1</html>"
+    assert ScrapIR.fetch(stand_in + "/page") == b"<html>page v1</html>"
+    assert [etag for _, etag in StandIn.requests["/page"]] == [None, '"v1"']
+
+
+def test_rate_limited_honors_retry_after(stand_in):
+    assert ScrapIR.fetch(stand_in + "/limited") == b"<html>limited</html>"
+    (first, _), (second, _) = StandIn.requests["/limited"]
+    assert second - first >= .9
+
+
+def test_retry_after_date_and_beyond_max_backoff(stand_in):
+    assert ScrapIR.fetch(stand_in + "/dated") == b"<html>limited</html>"
+    (first, _), (second, _) = StandIn.requests["/dated"]
+    # the date has a 1 second resolution
+    assert second - first >= .9
+    # the full Retry-After is waited for, whatever max_backoff
+    assert ScrapIR.backoff_delay(0, "30") >= 30 > ScrapIR.CONFIG["max_backoff"]
+    assert ScrapIR.retry_after_seconds(email.utils.formatdate(time.time() + 100, usegmt=True)) > 98
+    assert ScrapIR.retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.
+    assert ScrapIR.retry_after_seconds("soon") is None
+
+
+def test_retry_after_too_long_gives_up(stand_in):
+    start = time.monotonic()
+    assert ScrapIR.fetch(stand_in + "/deferred") is None
+    assert len(StandIn.requests["/deferred"]) == 1
+    assert time.monotonic() - start < 1
+
+
+def test_server_error_retried_until_limit(stand_in):
+    assert ScrapIR.fetch(stand_in + "/broken") is None
+    assert len(StandIn.requests["/broken"]) == ScrapIR.CONFIG["retries"] + 1
+
+
+def test_not_found_not_retried(stand_in):
+    assert ScrapIR.fetch(stand_in + "/missing") is None
+    assert len(StandIn.requests["/missing"]) == 1
+
+
+def test_recheck_returns_modified_articles(stand_in):
+    known = ["ed/journ/same.html", "ed/journ/new.html", "ed/journ/gone.html", "ed/other/art.html"]
+    for eja in known[:2]:
+        ScrapIR.fetch(stand_in + "/a/" + eja)
+    modified, stats = ScrapIR.recheck_articles(["ed/journ"], known, root=stand_in + "/a/")
+    assert list(modified) == ["ed/journ/new.html"]
+    assert stats == {"checked": 3, "modified": 1, "not_modified": 1, "baselined": 0, "failed": 1}
+    assert "/a/ed/other/art.html" not in StandIn.requests
+    # validators kept by the re-check
+    assert ScrapIR.fetch_status(stand_in + "/a/ed/journ/same.html")[1] == 304
+
+
+def test_recheck_baselines_articles_without_validators(stand_in):
+    # crawl made before the store existed: nothing to compare with, nothing to parse again
+    known = ["ed/journ/same.html", "ed/journ/new.html", "ed/journ/gone.html"]
+    modified, stats = ScrapIR.recheck_articles(["ed/journ"], known, root=stand_in + "/a/")
+    assert list(modified) == []
+    assert stats == {"checked": 3, "modified": 0, "not_modified": 0, "baselined": 2, "failed": 1}
+    modified, stats = ScrapIR.recheck_articles(["ed/journ"], known, root=stand_in + "/a/")
+    assert list(modified) == ["ed/journ/new.html"]
+    assert stats == {"checked": 3, "modified": 1, "not_modified": 1, "baselined": 0, "failed": 1}
+
+
+def test_drop_article_rows(tmp_path):
+    rows = [["ed/journ/a.html", "ed/journ/b.html"], ["ed/journ/a.html", "ed/other/c.html"],
+            ["ed/journ/b.html", "ed/journ/a.html"], ["ed/other/c.html", "ed/journ/a.html"]]
+    stack = np.empty(len(rows), dtype=object)
+    stack[:] = rows
+    file = str(tmp_path / "refs.csv")
+    pd.DataFrame(stack).to_csv(file, index=False, header=False)
+    kept = open(file).read().splitlines()[2:]
+    assert ScrapIR.drop_article_rows(file, {"ed/journ/a.html", "ed/journ/d.html"}, chunksize=3) == 2
+    assert open(file).read().splitlines() == kept
+    # modified articles parsed again: their rows replace the old ones
+    stack = np.empty(1, dtype=object)
+    stack[:] = [["ed/journ/a.html", "ed/journ/b.html"]]
+    pd.DataFrame(stack).to_csv(file, mode="a", index=False, header=False)
+    assert ScrapIR.drop_article_rows(file, []) == 0
+    assert len(open(file).read().splitlines()) == 3
+    assert ScrapIR.drop_article_rows(str(tmp_path / "cits.csv"), ["ed/journ/a.html"]) == 0
+
+
+def test_token_bucket_spaces_requests():
+    bucket = ScrapIR.TokenBucket(rate=20., burst=2)
+    start = time.monotonic()
+    for i in range(6):
+        bucket.acquire()
+    # 2 requests at once, then one every 1/20 s
+    assert time.monotonic() - start >= (6 - 2) / 20. * .9
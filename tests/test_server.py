@@ -0,0 +1,95 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Query server on Tables written from the fixture graph"""
+
+import asyncio
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from CitNet import GraphCN, PageRank, Server
+
+
+@pytest.fixture()
+def query_server(citation_graph, tmp_path):
+    n = citation_graph.shape[0]
+    referring, referred_to = citation_graph.nonzero()
+    pd.DataFrame({"title": ["article {0}".format(i) for i in range(n)], "keywords": "", "jel_code": ""},
+                 index=np.arange(n)).to_csv(str(tmp_path / "attrs_nos.csv"))
+    edges_df = pd.DataFrame({"referring": referring, "referred_to": referred_to})
+    edges_df.iloc[::2].to_csv(str(tmp_path / "cits_edges.csv"), index=False)
+    edges_df.iloc[1::2].to_csv(str(tmp_path / "refs_edges.csv"), index=False)
+    query_server = Server.QueryServer(str(tmp_path), workers=1)
+    yield query_server
+    query_server.executor.shutdown()
+    Server.STATE.clear()
+
+
+def test_edges_matrix_is_float64():
+    adj_mat = GraphCN.edgesdf_to_csr(pd.DataFrame({"referring": [0, 1, 1], "referred_to": [1, 2, 2]}))
+    assert adj_mat.dtype == np.float64
+    assert adj_mat.nnz == 2
+
+
+def test_push_pagerank_rejects_empty_seeds(citation_graph):
+    with pytest.raises(ValueError):
+        PageRank.push_pagerank(PageRank.get_hmat(citation_graph), [])
+
+
+def test_similarity_unknown_nodes(query_server):
+    n = Server.STATE["adj_mat"].shape[0]
+    assert Server.STATE["pagerank"].dtype == np.float64
+    # none of the seeds is in the graph: empty answer, not a server error
+    for nodes in ("{0},{1}".format(n, n + 10), "-1"):
+        assert asyncio.run(query_server.dispatch("/similarity?nodes=" + nodes)) == (200, {"results": []})
+    status, answer = asyncio.run(query_server.dispatch("/similarity?nodes={0},5".format(n)))
+    assert status == 200 and len(answer["results"]) == 10
+    assert asyncio.run(query_server.dispatch("/similarity"))[0] == 400
+
+
+async def http_get(host, port, target, method="GET"):
+    """
+    Status, headers and JSON body of one HTTP request
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write("{0} {1} HTTP/1.1\r\nHost: {2}\r\n\r\n".format(method, target, host).encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b"\r\n\r\n", 1)
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in header_lines)
+    assert int(headers["Content-Length"]) == len(body)
+    return int(status_line.split()[1]), headers, json.loads(body)
+
+
+def test_http_status_codes(query_server):
+    n = Server.STATE["adj_mat"].shape[0]
+
+    async def run():
+        host, port = await query_server.start(port=0)
+        try:
+            return [await http_get(host, port, target, method) for target, method in
+                    (("/pagerank?k=3", "GET"),
+                     ("/pagerank?k=3&seeds=-1,{0}".format(n), "GET"),
+                     ("/pagerank?k=3&seeds=-1,5,{0}".format(n), "GET"),
+                     ("/pagerank?k=3&seeds=x", "GET"),
+                     ("/similarity?nodes={0}".format(n), "GET"),
+                     ("/similarity", "GET"),
+                     ("/unknown", "GET"),
+                     ("/pagerank", "POST"))]
+        finally:
+            await query_server.stop()
+
+    answers = asyncio.run(run())
+    assert [status for status, _, _ in answers] == [200, 200, 200, 400, 200, 400, 404, 405]
+    assert all(headers["Content-Type"] == "application/json" for _, headers, _ in answers)
+    assert [result["node"] for result in answers[0][2]["results"]] == \
+        list(np.argsort(-Server.STATE["pagerank"])[:3])
+    # seeds out of the graph are ignored, as by /similarity
+    assert answers[1][2] == answers[4][2] == {"results": []}
+    personalization = np.zeros(n)
+    personalization[5] = 1
+    scores = PageRank.get_pagerank(Server.STATE["adj_mat"], personalization=personalization)
+    assert [result["node"] for result in answers[2][2]["results"]] == list(np.argsort(-scores)[:3])
@@ -0,0 +1,45 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Blocked top k similarity index against the dense products"""
+
+import numpy as np
+import pytest
+from CitNet import Similarity
+
+
+def brute_topk(sim_mat, k):
+    """
+    Top k of each row of a dense similarity matrix, diagonal excluded, ties broken by id
+    """
+    ids = np.full((sim_mat.shape[0], k), -1)
+    scores = np.zeros((sim_mat.shape[0], k))
+    for row in range(sim_mat.shape[0]):
+        row_ids = np.flatnonzero(sim_mat[row])
+        row_ids = row_ids[row_ids != row]
+        order = np.lexsort((row_ids, -sim_mat[row, row_ids]))[:k]
+        ids[row, :len(order)] = row_ids[order]
+        scores[row, :len(order)] = sim_mat[row, row_ids[order]]
+    return ids, scores
+
+
+@pytest.mark.parametrize("kind", ["cocitation", "coupling"])
+def test_topk_matches_dense_products(citation_graph, kind):
+    adj_mat = citation_graph[:1000][:, :1000].toarray()
+    sim_mat = adj_mat.T.dot(adj_mat) if kind == "cocitation" else adj_mat.dot(adj_mat.T)
+    expected_ids, expected_scores = brute_topk(sim_mat, 10)
+    for block_size, n_jobs in ((1000, 1), (96, 1), (128, 2)):
+        ids, scores = Similarity.topk_similarity(citation_graph[:1000][:, :1000], kind, k=10,
+                                                 block_size=block_size, n_jobs=n_jobs)
+        assert np.array_equal(ids, expected_ids)
+        assert np.array_equal(scores, expected_scores)
+    # cosine: counts over the geometric mean of the degrees
+    degrees = adj_mat.sum(axis=0) if kind == "cocitation" else adj_mat.sum(axis=1)
+    norms = np.sqrt(np.maximum(degrees, 1))
+    expected_ids, expected_scores = brute_topk(sim_mat / np.outer(norms, norms), 10)
+    ids, scores = Similarity.topk_similarity(citation_graph[:1000][:, :1000], kind, k=10, n_jobs=1, cosine=True)
+    assert np.allclose(scores, expected_scores, rtol=1e-06)
+    # float32 rounding may swap (near) ties
+    assert (ids == expected_ids).mean() > .99
+    node = int(np.argmax((ids >= 0).sum(axis=1)))
+    assert list(Similarity.get_similar(ids, scores, node)[0]) == list(ids[node][ids[node] >= 0])
@@ -0,0 +1,37 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""PageRank solvers against networkx"""
+
+import networkx as nx
+import numpy as np
+import pytest
+from CitNet import PageRank
+
+
+def nx_pagerank(adj_mat, theta):
+    graph = nx.from_scipy_sparse_array(adj_mat, create_using=nx.DiGraph)
+    pr_dict = nx.pagerank(graph, alpha=theta, tol=1e-14, max_iter=2000)
+    return np.array([pr_dict[i] for i in range(adj_mat.shape[0])])
+
+
+@pytest.mark.parametrize("solver", sorted(PageRank.SOLVERS))
+@pytest.mark.parametrize("theta", [.85, .99])
+def test_solver_matches_networkx(citation_graph, solver, theta):
+    pr_vec, info = PageRank.get_pagerank(citation_graph, theta, epsilon=1e-10, max_iter=1000, solver=solver,
+                                         return_info=True)
+    assert info["converged"]
+    assert np.abs(pr_vec - nx_pagerank(citation_graph, theta)).sum() < 1e-08
+
+
+def test_extrapolation_accelerates(citation_graph):
+    # the symmetrized graph converges slowly (co-authorship like), the citation graph fast
+    slow = PageRank.symmetrize(citation_graph)
+    for adj_mat, faster in ((slow, True), (citation_graph, False)):
+        iterations = {info["solver"]: info["iterations"]
+                      for info in PageRank.compare_solvers(adj_mat, ["power", "aitken", "quadratic"], theta=.95)}
+        for solver in ("aitken", "quadratic"):
+            if faster:
+                assert iterations[solver] < .8 * iterations["power"]
+            else:
+                assert iterations[solver] <= iterations["power"]
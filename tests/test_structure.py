@@ -0,0 +1,49 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Structural statistics of the sparse co-authorship matrix against networkx"""
+
+import networkx as nx
+import numpy as np
+import pytest
+import scipy.sparse as sparse
+from CitNet import Structure
+
+
+@pytest.fixture(scope="module")
+def coauthorship(citation_graph):
+    """
+    Weighted undirected graph with self loops and isolated nodes, stored on both triangles
+    """
+    n = citation_graph.shape[0] + 20
+    upper = sparse.triu(citation_graph + citation_graph.T, k=1).tocoo()
+    weights = np.random.default_rng(0).integers(1, 5, size=upper.nnz)
+    upper = sparse.csr_matrix((weights, (upper.row, upper.col)), shape=(n, n))
+    loops = sparse.diags(np.arange(n) % 3, format="csr", dtype=np.int64)
+    graph = nx.Graph()
+    graph.add_nodes_from(range(n))
+    graph.add_weighted_edges_from(zip(upper.tocoo().row, upper.tocoo().col, weights))
+    return upper, (upper + upper.T + loops).tocsr(), graph
+
+
+@pytest.mark.parametrize("stored", ["upper", "both"])
+def test_structure_matches_networkx(coauthorship, stored):
+    upper, full, graph = coauthorship
+    adj_mat = upper if stored == "upper" else full
+    nodes = range(len(graph))
+    triangles, clustering, transitivity = Structure.get_triangles(adj_mat)
+    nx_triangles, nx_clustering, nx_core = nx.triangles(graph), nx.clustering(graph), nx.core_number(graph)
+    assert list(triangles) == [nx_triangles[i] for i in nodes]
+    assert np.allclose(clustering, [nx_clustering[i] for i in nodes])
+    assert np.isclose(transitivity, nx.transitivity(graph))
+    assert list(Structure.get_core_numbers(adj_mat)) == [nx_core[i] for i in nodes]
+    labels, sizes = Structure.get_components(adj_mat)
+    assert sorted(sizes) == sorted(len(component) for component in nx.connected_components(graph))
+    hists = Structure.get_histograms(adj_mat)
+    degrees = nx.degree_histogram(graph)
+    assert list(hists["degree"][:len(degrees)]) == degrees and hists["degree"][len(degrees):].sum() == 0
+    strengths = np.bincount([strength for node, strength in graph.degree(weight="weight")])
+    assert list(hists["strength"][:len(strengths)]) == list(strengths)
+    summary = Structure.structure_report(adj_mat)[0]
+    assert summary["edges"] == graph.number_of_edges() and summary["isolated"] == nx.number_of_isolates(graph)
+    assert summary["triangles"] == sum(nx_triangles.values()) // 3
@@ -0,0 +1,70 @@
+#!python
+# -*-coding:utf-8 -*
+
+"""Year snapshots of the time indexed graph against the filtered adjacency matrix"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from CitNet import PageRank, TimeGraph
+
+
+@pytest.fixture(scope="module")
+def dated_graph(citation_graph):
+    """
+    Fixture graph with publication years following the article numbers, a few articles
+    published later than the ones citing them and a few without a date
+    """
+    n = citation_graph.shape[0]
+    rng = np.random.default_rng(0)
+    years = 1990 + np.arange(n) * 20 // n + rng.integers(0, 3, size=n) * (rng.random(n) < .05)
+    years = years.astype(np.float64)
+    years[rng.random(n) < .01] = np.nan
+    referring, referred_to = citation_graph.nonzero()
+    edges_df = pd.DataFrame({"referring": referring, "referred_to": referred_to})
+    return edges_df, years
+
+
+def filtered(citation_graph, years, year, late=True):
+    """
+    Adjacency matrix of the articles published up to year, in the order of nodes
+    """
+    nodes = np.flatnonzero(years <= year)
+    nodes = nodes[np.argsort(years[nodes], kind="stable")]
+    adj_mat = citation_graph[nodes][:, nodes]
+    if not late:
+        adj_mat = adj_mat.multiply(years[nodes][:, None] >= years[nodes][None, :]).tocsr()
+    return adj_mat, nodes
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_snapshots_match_filtered_matrix(citation_graph, dated_graph, compact, tmp_path):
+    edges_df, years = dated_graph
+    time_graph = TimeGraph.build_time_graph(pd.concat([edges_df, edges_df.iloc[:10]]), years, compact=compact)
+    assert len(time_graph["late_rows"]) > 0
+    file = str(tmp_path / "TimeGraph.npz")
+    TimeGraph.save_time_graph(time_graph, file)
+    for graph in (time_graph, TimeGraph.load_time_graph(file)):
+        for year in (1989, 1990, 1995, 2003, 2009, 2030):
+            for late in (True, False):
+                adj_mat, nodes = TimeGraph.snapshot(graph, year, late=late)
+                expected, expected_nodes = filtered(citation_graph, years, year, late)
+                assert list(nodes) == list(expected_nodes)
+                assert (adj_mat != expected).nnz == 0
+
+
+def test_rank_by_year(citation_graph, dated_graph):
+    edges_df, years = dated_graph
+    time_graph = TimeGraph.build_time_graph(edges_df, years)
+    results, info = TimeGraph.rank_by_year(time_graph, epsilon=1e-10, max_iter=1000)
+    assert list(results) == list(range(1990, 2012))
+    for year in (1990, 2000, 2011):
+        adj_mat, nodes = filtered(citation_graph, years, year)
+        ranks = results[year]
+        assert list(ranks.index) == list(nodes)
+        assert np.array_equal(ranks["in_degree"].values, np.asarray(adj_mat.sum(axis=0)).ravel())
+        pr_vec = PageRank.get_pagerank(adj_mat, epsilon=1e-10, max_iter=1000)
+        assert np.abs(ranks["pr_score"].values - pr_vec).sum() < 1e-08
+    # warm starts save iterations
+    cold = TimeGraph.rank_by_year(time_graph, epsilon=1e-10, max_iter=1000, warm_start=False)[1]
+    assert info["pr_iterations"].sum() < cold["pr_iterations"].sum()